@@ -39,8 +39,17 @@ import inspect
 import threading
 import signal
 import json
+import collections
+import heapq
+import struct
+import zlib
+from fractions import Fraction
+import mmap
+from multiprocessing import shared_memory
+from multiprocessing.managers import SyncManager
 import subprocess
 import psutil
+import numpy as np
 
 from gpiozero import DiskUsage, CPUTemperature
 
@@ -48,7 +57,7 @@ import PIL.Image
 import PIL.ExifTags
 
 from PyQt5.QtCore import Qt, QEvent, QSize, QObject, pyqtSignal, QThread
-from PyQt5.QtGui import QIcon, QMouseEvent, QWheelEvent, QPixmap
+from PyQt5.QtGui import QIcon, QMouseEvent, QWheelEvent, QPixmap, QImage
 from PyQt5.QtWidgets import QGestureRecognizer, QApplication, QLabel, QPushButton, QMainWindow, \
     QWidget, QSwipeGesture, QHBoxLayout, QVBoxLayout, QGestureEvent
 
@@ -59,8 +68,10 @@ from pijuice import PiJuice
 import gi
 gi.require_version('Gst', '1.0')
 gi.require_version('GstVideo', '1.0')
-from gi.repository import Gst, GstVideo, GLib
+gi.require_version('GstApp', '1.0')
+from gi.repository import Gst, GstVideo, GstApp, GLib # pylint: disable=unused-import
 from version import __version__
+from tiles import FrameStacker, process_tile, combine_tile, demosaic_tile, measure_stars_tile
 
 
 
@@ -403,6 +414,12 @@ class Display(QLabel):
         elif swipe_gesture.horizontalDirection() == QSwipeGesture.Right:
             self.__parent.resolution_down()
             result = True
+        elif swipe_gesture.verticalDirection() == QSwipeGesture.Up:
+            self.__parent.capture_mode_up()
+            result = True
+        elif swipe_gesture.verticalDirection() == QSwipeGesture.Down:
+            self.__parent.capture_mode_down()
+            result = True
         else:
             result = False
 
@@ -428,7 +445,11 @@ class Display(QLabel):
         log = function_name + ': event.type=' + str(event.type())
         logging.info(log)
 
-        if event.type() == QMouseEvent.MouseButtonDblClick:
+        if event.type() == QMouseEvent.MouseButtonDblClick and \
+            self.__parent.parameters['capture_mode'] in CameraScreen.ROI_MODES:
+            self.__parent.select_roi(event.pos().x(), event.pos().y())
+            result = True
+        elif event.type() == QMouseEvent.MouseButtonDblClick:
             annotation_mode = self.__parent.source.get_property('annotation-mode')
             if annotation_mode == 0x00000000:
                 self.__parent.source.set_property('annotation-mode', 0x0000065D)
@@ -463,8 +484,7 @@ class Display(QLabel):
         swipe_gesture = event.gesture(Qt.SwipeGesture)
 
         if self.__zoom:
-            pixmap = QPixmap(
-                self.__parent.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
+            pixmap = self.__parent.gallery_pixmap(self.__index, True)
             if pixmap.width() < 640:
                 pixmap = pixmap.scaled(640,480)
             else:
@@ -495,6 +515,12 @@ class Display(QLabel):
                 if pixmap.height() - y < 480:
                     y = pixmap.height() - 480
             self.setPixmap(pixmap.copy(x, y, 640, 480))
+        elif swipe_gesture.horizontalDirection() == QSwipeGesture.NoDirection and \
+            swipe_gesture.verticalDirection() == QSwipeGesture.Up:
+            self.__parent.stack_images(self.__index)
+        elif swipe_gesture.horizontalDirection() == QSwipeGesture.NoDirection and \
+            swipe_gesture.verticalDirection() == QSwipeGesture.Down:
+            self.__parent.build_timelapse(self.__index)
         else:
             images = glob.glob(self.__parent.parameters['media'] + 'DSCF????.JPG')
             images.sort()
@@ -512,8 +538,7 @@ class Display(QLabel):
                     index = index - 1
             self.__index = int(re.search(r'\d+',images[index]).group())
             self.__parent.panel_control_file_info_label_set_text(self.__index)
-            pixmap = QPixmap(
-                self.__parent.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
+            pixmap = self.__parent.gallery_pixmap(self.__index)
             self.setPixmap(pixmap.scaled(640,480))
 
         log = function_name + ': result=True'
@@ -539,8 +564,7 @@ class Display(QLabel):
         logging.info(log)
 
         if event.type() == QMouseEvent.MouseButtonDblClick:
-            pixmap = QPixmap(
-                self.__parent.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
+            pixmap = self.__parent.gallery_pixmap(self.__index, not self.__zoom)
             if not self.__zoom:
                 self.__zoom = True
                 if pixmap.width() < 640:
@@ -565,7 +589,8 @@ class Display(QLabel):
                 self.__zoom = False
                 self.setPixmap(pixmap.scaled(640,480))
                 self.__parent.panel_display.setToolTip('Swipe left or right ' + \
-                    'to select an image or double tap to zoom in')
+                    'to select an image, swipe up to stack a sequence, down to build ' + \
+                    'a timelapse or double tap to zoom in')
             result = True
         else:
             result = False
@@ -629,526 +654,383 @@ class HardwareButtonMonitor(QObject):
 
 
 
-class CameraScreen(QMainWindow):
-    """Camera Screen
+class Frame:
+    """Video frame mapped directly from Gst.Buffer memory
+
+    Planes are exposed as read-only NumPy views of the mapped buffer and are valid only
+    inside the with block. Copy the data if it has to outlive the block.
     """
 
 
-    def __init__(self, parent, params):
-        """Initialize Camera Screen
+    def __init__(self, sample):
+        """Initializes Frame
 
         Args:
-            parent (QApplication): application
-            params (dict): parameters
+            sample (Gst.Sample): sample pulled from the appsink
         """
 
-        super().__init__(None)
-
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
         log = function_name + ': entry'
-        logging.info(log)
+        logging.debug(log)
+
+        self.__buffer = sample.get_buffer()
+        self.__map_info = None
+        self.__video_info = GstVideo.VideoInfo()
+        self.__video_info.from_caps(sample.get_caps())
+        self.format = self.__video_info.finfo.name
+        self.width = self.__video_info.width
+        self.height = self.__video_info.height
+        self.pts = self.__buffer.pts
+        self.planes = []
 
-        self.__parent = parent
-        self.parameters = params
+        log = function_name + ': exit'
+        logging.debug(log)
 
-        signal.signal(signal.SIGTERM, self.__on_terminate)
-        signal.signal(signal.SIGINT, self.__on_terminate)
-        signal.signal(signal.SIGABRT, self.__on_terminate)
 
-        self.setGeometry(0,36,800,564)
-        self.setWindowTitle('AstroBerry')
-        self.setWindowFlags(Qt.Window | Qt.FramelessWindowHint)
-        self.setWindowIcon(QIcon(self.parameters['icons'] + self.parameters['logo_icon']))
+    def __enter__(self):
+        """Maps buffer memory into NumPy views
 
-        self.window = QWidget()
+        Returns:
+            Frame: mapped frame
+        """
 
-        self.panel = QWidget()
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        self.panel_display = Display(self)
-        self.panel_display.setFixedSize(640,480)
-        self.panel_display.setToolTip(
-            'Swipe left or right to change resolution or double tap to toggle debug mode')
-        self.__win_id = self.panel_display.winId()
+        log = function_name + ': format=' + self.format + ', width=' + str(self.width) + \
+            ', height=' + str(self.height)
+        logging.debug(log)
+
+        result, self.__map_info = self.__buffer.map(Gst.MapFlags.READ)
+        if not result:
+            raise RuntimeError('Failed to map the buffer')
+
+        if self.format in ('I420', 'YV12'):
+            heights = (self.height, (self.height + 1)//2, (self.height + 1)//2)
+            widths = (self.width, (self.width + 1)//2, (self.width + 1)//2)
+            channels = 1
+        elif self.format in ('RGB', 'BGR'):
+            heights = (self.height,)
+            widths = (self.width,)
+            channels = 3
+        elif self.format in ('RGBx', 'BGRx', 'RGBA', 'BGRA'):
+            heights = (self.height,)
+            widths = (self.width,)
+            channels = 4
+        else:
+            heights = (self.height,)
+            widths = (self.width,)
+            channels = 1
+
+        for plane, (height, width) in enumerate(zip(heights, widths)):
+            if channels == 1:
+                shape = (height, width)
+                strides = (self.__video_info.stride[plane], 1)
+            else:
+                shape = (height, width, channels)
+                strides = (self.__video_info.stride[plane], channels, 1)
+            array = np.ndarray(
+                shape, dtype=np.uint8, buffer=self.__map_info.data,
+                offset=self.__video_info.offset[plane], strides=strides)
+            array.flags.writeable = False
+            self.planes.append(array)
 
-        self.panel_control = QWidget()
+        log = function_name + ': planes=' + str(len(self.planes))
+        logging.debug(log)
 
-        self.control = QWidget()
-        self.control_menu = QWidget()
-        self.control_sharpness = QWidget()
-        self.control_sharpness_button = QWidget()
-        self.control_exposure = QWidget()
-        self.control_exposure_shutter_speed = QWidget()
-        self.control_exposure_iso = QWidget()
+        return self
 
-        window_h_layout = QHBoxLayout()
-        window_h_layout.setContentsMargins(0,4,0,0)
-        window_h_layout.setSpacing(0)
 
-        panel_v_layout = QVBoxLayout()
-        panel_v_layout.setContentsMargins(0,0,0,0)
-        panel_v_layout.setSpacing(0)
+    def __exit__(self, *_):
+        """Releases NumPy views and unmaps buffer memory
 
-        panel_control_h_layout = QHBoxLayout()
-        panel_control_h_layout.setContentsMargins(0,0,0,0)
-        panel_control_h_layout.setSpacing(0)
+        Args:
+            _ (type): exception type
+            _ (Exception): exception
+            _ (traceback): traceback
+        """
 
-        control_v_layout = QVBoxLayout()
-        control_v_layout.setContentsMargins(0,0,0,0)
-        control_v_layout.setSpacing(0)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        control_menu_h_layout = QHBoxLayout()
-        control_menu_h_layout.setContentsMargins(0,0,0,0)
-        control_menu_h_layout.setSpacing(0)
+        log = function_name + ': entry'
+        logging.debug(log)
 
-        control_sharpness_v_layout = QVBoxLayout()
-        control_sharpness_v_layout.setContentsMargins(0,0,0,0)
-        control_sharpness_v_layout.setSpacing(0)
+        self.planes = []
+        if self.__map_info is not None:
+            self.__buffer.unmap(self.__map_info)
+            self.__map_info = None
+        self.__buffer = None
 
-        control_sharpness_button_h_layout = QHBoxLayout()
-        control_sharpness_button_h_layout.setContentsMargins(0,0,0,0)
-        control_sharpness_button_h_layout.setSpacing(0)
+        log = function_name + ': exit'
+        logging.debug(log)
 
-        control_exposure_h_layout = QHBoxLayout()
-        control_exposure_h_layout.setContentsMargins(0,0,0,0)
-        control_exposure_h_layout.setSpacing(0)
 
-        control_exposure_shutter_speed_v_layout = QVBoxLayout()
-        control_exposure_shutter_speed_v_layout.setContentsMargins(0,0,0,0)
-        control_exposure_shutter_speed_v_layout.setSpacing(0)
+    def luminance(self):
+        """Gets luminance plane of the frame without copying
 
-        control_exposure_iso_v_layout = QVBoxLayout()
-        control_exposure_iso_v_layout.setContentsMargins(0,0,0,0)
-        control_exposure_iso_v_layout.setSpacing(0)
+        For RGB formats green channel is used as an approximation of luminance.
 
-        self.panel_control_contrast_button_down = QPushButton()
-        self.panel_control_contrast_button_down.setFixedSize(80,80)
-        self.panel_control_contrast_button_down.setToolTip('Decrease contrast')
-        self.panel_control_contrast_button_down.setIcon(QIcon(
-            self.parameters['icons'] + 'do_not_disturb_on_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.panel_control_contrast_button_down.setIconSize(QSize(80,80))
-        self.panel_control_contrast_button_down.clicked.connect(
-            self.__on_panel_control_contrast_button_down_clicked)
-        if self.parameters['contrast'] == -100:
-            self.panel_control_contrast_button_down.setEnabled(False)
+        Returns:
+            numpy.ndarray: read-only luminance view
+        """
 
-        self.panel_control_contrast_label = QLabel(str(self.parameters['contrast']))
-        self.panel_control_contrast_label.setFixedSize(40,80)
-        self.panel_control_contrast_label.setToolTip('Current contrast')
-        font = self.panel_control_contrast_label.font()
-        font.setPointSize(12)
-        self.panel_control_contrast_label.setFont(font)
-        self.panel_control_contrast_label.setAlignment(Qt.AlignCenter)
+        if len(self.planes[0].shape) == 2:
+            return self.planes[0]
+        return self.planes[0][:, :, 1]
 
-        self.panel_control_contrast_button_up = QPushButton()
-        self.panel_control_contrast_button_up.setFixedSize(80,80)
-        self.panel_control_contrast_button_up.setToolTip('Increase contrast')
-        self.panel_control_contrast_button_up.setIcon(QIcon(
-            self.parameters['icons'] + 'add_circle_FILL1_wght400_GRAD0_opsz48.svg'))
-        self.panel_control_contrast_button_up.setIconSize(QSize(80,80))
-        self.panel_control_contrast_button_up.clicked.connect(
-            self.__on_panel_control_contrast_button_up_clicked)
-        if self.parameters['contrast'] == 100:
-            self.panel_control_contrast_button_up.setEnabled(False)
 
-        self.panel_control_white_balance_button = QPushButton()
-        self.panel_control_white_balance_button.setFixedSize(80,80)
-        self.panel_control_white_balance_button.setToolTip('Auto white balance mode')
-        self.panel_control_white_balance_button.setIcon(QIcon(
-            self.parameters['icons'] + 'wb_auto_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.panel_control_white_balance_button.setIconSize(QSize(80,80))
-        self.panel_control_white_balance_button.clicked.connect(
-            self.__on_panel_control_white_balance_button_clicked)
 
-        self.panel_control_saturation_button_down = QPushButton()
-        self.panel_control_saturation_button_down.setFixedSize(80,80)
-        self.panel_control_saturation_button_down.setToolTip('Decrease saturation')
-        self.panel_control_saturation_button_down.setIcon(QIcon(
-            self.parameters['icons'] + 'do_not_disturb_on_FILL1_wght400_GRAD0_opsz48.svg'))
-        self.panel_control_saturation_button_down.setIconSize(QSize(80,80))
-        self.panel_control_saturation_button_down.clicked.connect(
-            self.__on_panel_control_saturation_button_down_clicked)
-        if self.parameters['saturation'] == -100:
-            self.panel_control_saturation_button_down.setEnabled(False)
+class FrameTap(QObject):
+    """Frame Tap
 
-        self.panel_control_saturation_label = QLabel(str(self.parameters['saturation']))
-        self.panel_control_saturation_label.setFixedSize(40,80)
-        self.panel_control_saturation_label.setToolTip('Current saturation')
-        font = self.panel_control_saturation_label.font()
-        font.setPointSize(12)
-        self.panel_control_saturation_label.setFont(font)
-        self.panel_control_saturation_label.setAlignment(Qt.AlignCenter)
+    Pulls frames from the appsink branch of the pipeline and hands them over to the
+    subscribers.
+    """
 
-        self.panel_control_saturation_button_up = QPushButton()
-        self.panel_control_saturation_button_up.setFixedSize(80,80)
-        self.panel_control_saturation_button_up.setToolTip('Increase saturation')
-        self.panel_control_saturation_button_up.setIcon(QIcon(
-            self.parameters['icons'] + 'add_circle_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.panel_control_saturation_button_up.setIconSize(QSize(80,80))
-        self.panel_control_saturation_button_up.clicked.connect(
-            self.__on_panel_control_saturation_button_up_clicked)
-        if self.parameters['saturation'] == 100:
-            self.panel_control_saturation_button_up.setEnabled(False)
 
-        self.panel_control_info_label = QLabel()
-        self.panel_control_info_label.setFixedSize(160,80)
-        self.panel_control_info_label.setToolTip('Image information')
-        font = self.panel_control_info_label.font()
-        font.setPointSize(12)
-        self.panel_control_info_label.setFont(font)
-        self.panel_control_info_label.setAlignment(Qt.AlignCenter)
+    def __init__(self):
+        """Initializes Frame Tap
+        """
 
-        panel_control_h_layout.addWidget(self.panel_control_contrast_button_down)
-        panel_control_h_layout.addWidget(self.panel_control_contrast_label)
-        panel_control_h_layout.addWidget(self.panel_control_contrast_button_up)
-        panel_control_h_layout.addWidget(self.panel_control_white_balance_button)
-        panel_control_h_layout.addWidget(self.panel_control_saturation_button_down)
-        panel_control_h_layout.addWidget(self.panel_control_saturation_label)
-        panel_control_h_layout.addWidget(self.panel_control_saturation_button_up)
-        panel_control_h_layout.addWidget(self.panel_control_info_label)
+        super().__init__()
 
-        self.panel_control.setLayout(panel_control_h_layout)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        panel_v_layout.addWidget(self.panel_display)
-        panel_v_layout.addWidget(self.panel_control)
+        log = function_name + ': entry'
+        logging.info(log)
 
-        self.panel.setLayout(panel_v_layout)
+        self.__lock = threading.Lock()
+        self.__sink = None
+        self.__subscribers = []
 
-        if self.parameters['exit_action'] == 'NONE':
-            exit_handler = self.__on_control_menu_debug_mode_button_clicked
-            tooltip = 'Toggle debug mode'
-        elif self.parameters['exit_action'] == 'QUIT':
-            exit_handler = self.__on_control_menu_quit_button_clicked
-            tooltip = 'Quit AstroBerry'
-        elif self.parameters['exit_action'] == 'SHUTDOWN':
-            exit_handler = self.__on_control_menu_shutdown_button_clicked
-            tooltip = 'Shutdown AstroBerry'
+        log = function_name + ': exit'
+        logging.info(log)
 
-        self.control_menu_exit_button = QPushButton()
-        self.control_menu_exit_button.setFixedSize(80,80)
-        self.control_menu_exit_button.setToolTip(tooltip)
-        self.control_menu_exit_button.setIcon(
-            QIcon(self.parameters['icons'] + self.parameters['exit_icon']))
-        self.control_menu_exit_button.setIconSize(QSize(80,80))
-        self.control_menu_exit_button.clicked.connect(exit_handler)
 
-        self.control_menu_photo_gallery_button = QPushButton()
-        self.control_menu_photo_gallery_button.setFixedSize(80,80)
-        self.control_menu_photo_gallery_button.setToolTip('Photo gallery')
-        self.control_menu_photo_gallery_button.setIcon(QIcon(
-            self.parameters['icons'] + 'photo_library_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_menu_photo_gallery_button.setIconSize(QSize(80,80))
-        self.control_menu_photo_gallery_button.clicked.connect(
-            self.__on_control_menu_photo_gallery_button_clicked)
+    def set_sink(self, sink):
+        """Sets appsink frames are pulled from
 
-        control_menu_h_layout.addWidget(self.control_menu_photo_gallery_button)
-        control_menu_h_layout.addWidget(self.control_menu_exit_button)
+        Args:
+            sink (GstApp.AppSink): appsink
+        """
 
-        self.control_menu.setLayout(control_menu_h_layout)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        self.control_sharpness_label = QLabel(str(self.parameters['sharpness']))
-        self.control_sharpness_label.setFixedSize(160,40)
-        self.control_sharpness_label.setToolTip('Current sharpness')
-        font = self.control_sharpness_label.font()
-        font.setPointSize(12)
-        self.control_sharpness_label.setFont(font)
-        self.control_sharpness_label.setAlignment(Qt.AlignCenter)
+        log = function_name + ': sink=' + str(sink)
+        logging.info(log)
 
-        self.control_sharpness_button_down = QPushButton()
-        self.control_sharpness_button_down.setFixedSize(80,80)
-        self.control_sharpness_button_down.setToolTip('Decrease sharpness')
-        self.control_sharpness_button_down.setIcon(QIcon(
-            self.parameters['icons'] + 'do_not_disturb_on_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_sharpness_button_down.setIconSize(QSize(80,80))
-        self.control_sharpness_button_down.clicked.connect(
-            self.__on_control_sharpness_button_down_clicked)
-        if self.parameters['sharpness'] == -100:
-            self.control_sharpness_button_down.setEnabled(False)
+        with self.__lock:
+            self.__sink = sink
 
-        self.control_sharpness_button_up = QPushButton()
-        self.control_sharpness_button_up.setFixedSize(80,80)
-        self.control_sharpness_button_up.setToolTip('Increase sharpness')
-        self.control_sharpness_button_up.setIcon(QIcon(
-            self.parameters['icons'] + 'add_circle_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_sharpness_button_up.setIconSize(QSize(80,80))
-        self.control_sharpness_button_up.clicked.connect(
-            self.__on_control_sharpness_button_up_clicked)
-        if self.parameters['sharpness'] == 100:
-            self.control_sharpness_button_up.setEnabled(False)
+        log = function_name + ': exit'
+        logging.info(log)
 
-        control_sharpness_button_h_layout.addWidget(self.control_sharpness_button_down)
-        control_sharpness_button_h_layout.addWidget(self.control_sharpness_button_up)
 
-        self.control_sharpness_button.setLayout(control_sharpness_button_h_layout)
+    def subscribe(self, subscriber):
+        """Subscribes to frames
 
-        control_sharpness_v_layout.addWidget(self.control_sharpness_label)
+        Subscriber is called from the tap thread with mapped Frame and must not keep
+        references to its planes after it returns.
 
-        control_sharpness_v_layout.addWidget(self.control_sharpness_button)
+        Args:
+            subscriber (method): subscriber
+        """
 
-        self.control_sharpness.setLayout(control_sharpness_v_layout)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        self.control_exposure_shutter_speed_button_down = QPushButton()
-        self.control_exposure_shutter_speed_button_down.setFixedSize(80,80)
-        self.control_exposure_shutter_speed_button_down.setToolTip(
-            'Decrease shutter speed')
-        self.control_exposure_shutter_speed_button_down.setIcon(QIcon(
-            self.parameters['icons'] + 'indeterminate_check_box_FILL1_wght400_GRAD0_opsz48.svg'))
-        self.control_exposure_shutter_speed_button_down.setIconSize(QSize(80,80))
-        self.control_exposure_shutter_speed_button_down.clicked.connect(
-            self.__on_control_exposure_shutter_speed_button_down_clicked)
-
-        if parameters['shutter_speed'] == 0:
-            shutter_speed = 'Auto'
-            self.control_exposure_shutter_speed_button_down.setEnabled(False)
-        else:
-            exposure_time = parameters['shutter_speed'] / 1000000
-            if int(exposure_time) == 0:
-                shutter_speed = '1/'+str(int(1/exposure_time))
-            else:
-                shutter_speed = str(int(exposure_time)) + '/1'
-
-        self.control_exposure_shutter_speed_label = QLabel(shutter_speed + '"')
-        self.control_exposure_shutter_speed_label.setFixedSize(80,40)
-        self.control_exposure_shutter_speed_label.setToolTip('Current shutter speed')
-        font = self.control_exposure_shutter_speed_label.font()
-        font.setPointSize(12)
-        self.control_exposure_shutter_speed_label.setFont(font)
-        self.control_exposure_shutter_speed_label.setAlignment(Qt.AlignCenter)
-
-        self.control_exposure_shutter_speed_button_up = QPushButton()
-        self.control_exposure_shutter_speed_button_up.setFixedSize(80, 80)
-        self.control_exposure_shutter_speed_button_up.setToolTip(
-            'Increase shutter speed')
-        self.control_exposure_shutter_speed_button_up.setIcon(QIcon(
-            self.parameters['icons'] + 'add_box_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_exposure_shutter_speed_button_up.setIconSize(QSize(80,80))
-        self.control_exposure_shutter_speed_button_up.clicked.connect(
-            self.__on_control_exposure_shutter_speed_button_up_clicked)
-        if parameters['shutter_speed'] == 22000000:
-            self.control_exposure_shutter_speed_button_up.setEnabled(False)
+        log = function_name + ': subscriber=' + str(subscriber)
+        logging.info(log)
 
-        control_exposure_shutter_speed_v_layout.addWidget(
-            self.control_exposure_shutter_speed_button_up)
-        control_exposure_shutter_speed_v_layout.addWidget(
-            self.control_exposure_shutter_speed_label)
-        control_exposure_shutter_speed_v_layout.addWidget(
-            self.control_exposure_shutter_speed_button_down)
+        with self.__lock:
+            if subscriber not in self.__subscribers:
+                self.__subscribers.append(subscriber)
 
-        self.control_exposure_shutter_speed.setLayout(
-            control_exposure_shutter_speed_v_layout)
+        log = function_name + ': exit'
+        logging.info(log)
 
-        self.control_exposure_iso_button_down = QPushButton()
-        self.control_exposure_iso_button_down.setFixedSize(80,80)
-        self.control_exposure_iso_button_down.setToolTip('Decrease ISO')
-        self.control_exposure_iso_button_down.setIcon(QIcon(
-            self.parameters['icons'] + 'indeterminate_check_box_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_exposure_iso_button_down.setIconSize(QSize(90,90))
-        self.control_exposure_iso_button_down.clicked.connect(
-            self.__on_control_exposure_iso_button_down_clicked)
 
-        if parameters['iso'] == 0:
-            iso = 'Auto'
-            self.control_exposure_iso_button_down.setEnabled(False)
-        else:
-            iso = str(int(parameters['iso']*100/256))
+    def unsubscribe(self, subscriber):
+        """Unsubscribes from frames
 
-        self.control_exposure_iso_label = QLabel('ISO ' + iso)
-        self.control_exposure_iso_label.setFixedSize(80,40)
-        self.control_exposure_iso_label.setToolTip('Current ISO')
-        font = self.control_exposure_iso_label.font()
-        font.setPointSize(12)
-        self.control_exposure_iso_label.setFont(font)
-        self.control_exposure_iso_label.setAlignment(Qt.AlignCenter)
+        Args:
+            subscriber (method): subscriber
+        """
 
-        self.control_exposure_iso_button_up = QPushButton()
-        self.control_exposure_iso_button_up.setFixedSize(80,80)
-        self.control_exposure_iso_button_up.setToolTip('Increase ISO')
-        self.control_exposure_iso_button_up.setIcon(QIcon(
-            self.parameters['icons'] + 'add_box_FILL1_wght400_GRAD0_opsz48.svg'))
-        self.control_exposure_iso_button_up.setIconSize(QSize(80,80))
-        self.control_exposure_iso_button_up.clicked.connect(
-            self.__on_control_exposure_iso_button_up_clicked)
-        if parameters['iso'] == 4096:
-            self.control_exposure_iso_button_up.setEnabled(False)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_button_up)
-        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_label)
-        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_button_down)
+        log = function_name + ': subscriber=' + str(subscriber)
+        logging.info(log)
 
-        self.control_exposure_iso.setLayout(control_exposure_iso_v_layout)
+        with self.__lock:
+            if subscriber in self.__subscribers:
+                self.__subscribers.remove(subscriber)
 
-        control_exposure_h_layout.addWidget(self.control_exposure_shutter_speed)
-        control_exposure_h_layout.addWidget(self.control_exposure_iso)
+        log = function_name + ': exit'
+        logging.info(log)
 
-        self.control_exposure.setLayout(control_exposure_h_layout)
 
-        control_v_layout.addWidget(self.control_menu)
-        control_v_layout.addWidget(self.control_sharpness)
-        control_v_layout.addWidget(self.control_exposure)
+    def run(self):
+        """Pulls frames and dispatches them to the subscribers
+        """
 
-        self.control_shutter_button = QPushButton()
-        self.control_shutter_button.setFixedSize(160,160)
-        self.control_shutter_button.setToolTip('Take a picture')
-        self.control_shutter_button.setIcon(
-            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
-        self.control_shutter_button.setIconSize(QSize(160,160))
-        self.control_shutter_button.clicked.connect(self.__on_control_shutter_button_clicked)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        self.__shutter_clicked = False
+        log = function_name + ': loop'
+        logging.info(log)
 
-        control_v_layout.addWidget(self.control_shutter_button)
+        while True:
+            with self.__lock:
+                sink = self.__sink
+                subscribers = list(self.__subscribers)
+            if sink is None or len(subscribers) == 0:
+                time.sleep(0.1)
+                continue
+            sample = sink.try_pull_sample(Gst.SECOND)
+            if sample is None:
+                time.sleep(0.1)
+                continue
+            with Frame(sample) as frame:
+                for subscriber in subscribers:
+                    try:
+                        subscriber(frame)
+                    except Exception: # pylint: disable=broad-except
+                        log = function_name + ': subscriber=' + str(subscriber)
+                        logging.exception(log)
+
+
+
+class BurstRing(QObject):
+    """Burst Ring
+
+    Keeps the most recent frames of the frame tap in a ring of slots allocated once for the
+    memory budget. When triggered it keeps recording the configured share of frames after
+    the trigger, freezes and saves all frames to the media folder.
+    """
 
-        self.control.setLayout(control_v_layout)
+    ready = pyqtSignal()
+    saved = pyqtSignal(int, dict)
+    flushed = pyqtSignal(int, int)
 
-        window_h_layout.addWidget(self.panel)
-        window_h_layout.addWidget(self.control)
 
-        self.window.setLayout(window_h_layout)
-        self.setCentralWidget(self.window)
+    def __init__(self, media, budget, post_ratio=0.5):
+        """Initializes Burst Ring
 
-        images = glob.glob(self.parameters['media'] + 'DSCF????.JPG')
-        images.sort()
-        if len(images) == 0:
-            self.__index = -1
-            self.control_menu_photo_gallery_button.setEnabled(False)
-        else:
-            self.__index = int(re.search(r'\d+',images[len(images)-1]).group())
-            self.panel_display.set_index(self.__index)
+        Args:
+            media (str): media folder
+            budget (int): memory budget of the ring in bytes
+            post_ratio (float, optional): share of frames recorded after the trigger.
+                Defaults to 0.5.
+        """
 
-        cat = subprocess.Popen(['cat', '/boot/config.txt'], stdout=subprocess.PIPE)
-        self.__gpu_mem = int(subprocess.check_output(
-            ['grep', '-a', 'gpu_mem'],
-            stdin=cat.stdout).decode('utf-8').replace('gpu_mem=','').strip())
+        super().__init__()
 
-        self.__sv_mem = round(psutil.virtual_memory().total/1024/1024)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        self.__pijuice = PiJuice()
-        if self.__pijuice.config.GetFirmwareVersion() == {}:
-            self.__pijuice = None
-        else:
-            self.__thread = QThread()
-            monitor = HardwareButtonMonitor(self.__pijuice)
-            monitor.moveToThread(self.__thread)
-            self.__thread.started.connect(monitor.run)
-            monitor.clicked.connect(self.__on_control_shutter_button_clicked)
-            self.__thread.start()
+        log = function_name + ': budget=' + str(budget) + ', post_ratio=' + str(post_ratio)
+        logging.info(log)
 
-        self.__capturing_contrast = None
-        self.__capturing_white_balance = None
-        self.__capturing_saturation = None
-        self.__capturing_sharpness = None
-        self.__capturing_shutter_speed = None
-        self.__pipeline = None
-        self.source = None
-        self.__source_caps = None
-        self.__exif = None
-        self.__filesink = None
+        self.__media = media
+        self.__budget = budget
+        self.__post_ratio = post_ratio
+        self.__lock = threading.Lock()
+        self.__geometry = None
+        self.__buffer = None
+        self.__views = []
+        self.__timestamps = None
+        self.__head = 0
+        self.__count = 0
+        self.__post = -1
+        self.__frozen = False
+        self.__metadata = None
+        self.ready.connect(self.flush)
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def setup(self):
-        """Setups streaming pipeline
+    def __allocate(self, geometry):
+        """Allocates slots for frames of given geometry
+
+        Args:
+            geometry (tuple): format and shapes of the planes of the frame
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': geometry=' + str(geometry)
         logging.info(log)
 
-        if self.parameters['contrast'] == 0:
-            self.__capturing_contrast = 'normal'
-        elif self.parameters['contrast'] < 0:
-            self.__capturing_contrast = 'soft'
-        elif self.parameters['contrast'] > 0:
-            self.__capturing_contrast = 'hard'
-        if self.parameters['white_balance'] == 1:
-            self.__capturing_white_balance = 'daylight'
-        elif self.parameters['white_balance'] == 2:
-            self.__capturing_white_balance = 'cloudy'
-        elif self.parameters['white_balance'] == 3:
-            self.__capturing_white_balance = 'manual'
-        elif self.parameters['white_balance'] == 4:
-            self.__capturing_white_balance = 'tungsten'
-        elif self.parameters['white_balance'] == 5:
-            self.__capturing_white_balance = 'fluorescent'
-        elif self.parameters['white_balance'] == 6:
-            self.__capturing_white_balance = '"fluorescent h"'
-        elif self.parameters['white_balance'] == 7:
-            self.__capturing_white_balance = 'flash'
-        elif self.parameters['white_balance'] == 8:
-            self.__capturing_white_balance = 'manual'
-        elif self.parameters['white_balance'] == 9:
-            self.__capturing_white_balance = 'auto'
-        if self.parameters['saturation'] == 0:
-            self.__capturing_saturation = 'normal'
-        elif self.parameters['saturation'] < 0:
-            self.__capturing_saturation = 'low-saturation'
-        elif self.parameters['saturation'] > 0:
-            self.__capturing_saturation = 'high-saturation'
-        if self.parameters['sharpness'] == 0:
-            self.__capturing_sharpness = 'normal'
-        elif self.parameters['sharpness'] < 0:
-            self.__capturing_sharpness = 'soft'
-        elif self.parameters['sharpness'] > 0:
-            self.__capturing_sharpness = 'hard'
-        if parameters['shutter_speed'] == 0:
-            self.__capturing_shutter_speed = '0/1'
-        else:
-            exposure_time = parameters['shutter_speed'] / 1000000
-            if int(exposure_time) == 0:
-                self.__capturing_shutter_speed = '1/'+str(int(1/exposure_time))
-            else:
-                self.__capturing_shutter_speed = str(int(exposure_time)) + '/1'
+        sizes = [int(np.prod(shape)) for shape in geometry[1]]
+        slots = max(2, self.__budget//sum(sizes))
+        self.__buffer = None
+        self.__views = []
+        self.__buffer = np.empty((slots, sum(sizes)), dtype=np.uint8)
+        # touch every page now so that no memory is committed while recording
+        self.__buffer.fill(0)
+        for slot in self.__buffer:
+            views = []
+            offset = 0
+            for shape, size in zip(geometry[1], sizes):
+                views.append(slot[offset:offset + size].reshape(shape))
+                offset = offset + size
+            self.__views.append(views)
+        self.__timestamps = np.zeros(slots, dtype=np.float64)
+        self.__geometry = geometry
+        self.__head = 0
+        self.__count = 0
+        self.__post = -1
+
+        log = function_name + ': slots=' + str(slots)
+        logging.info(log)
 
-        self.__pipeline = Gst.parse_launch(
-            'rpicamsrc name=source preview=false fullscreen=false sensor-mode=3' +
-            ' annotation-text-size=' + str(self.parameters['annotation_text_size']) +
-            ' annotation-mode=' + str(self.parameters['annotation_mode']) +
-            ' sharpness=' + str(self.parameters['sharpness']) +
-            ' shutter-speed=' + str(self.parameters['shutter_speed']) +
-            ' analog-gain=' + str(self.parameters['iso']) +
-            ' contrast=' + str(self.parameters['contrast']) +
-            ' awb-mode=' + str(self.parameters['white_balance']) +
-            ' saturation=' + str(self.parameters['saturation']) +
-            ' ! capsfilter name=source-caps caps=video/x-raw' +
-            ',width=' + str(self.parameters['width']) +
-            ',height=' + str(self.parameters['height']) +
-            ' ! tee name=t ! queue ! videoconvert ! videoscale' +
-            ' ! video/x-raw,width=640,height=480' +
-            ' ! autovideosink sync=false t. ! queue ! jpegenc quality=100' +
-            ' ! taginject name=exif tags="capturing-source=dsc' +
-            ',capturing-contrast=' + self.__capturing_contrast +
-            ',capturing-white-balance=' + self.__capturing_white_balance +
-            ',capturing-sharpness=' + self.__capturing_sharpness +
-            ',capturing-saturation=' + self.__capturing_saturation +
-            ',capturing-shutter-speed=' + self.__capturing_shutter_speed +
-            ',capturing-iso-speed=0" ! jifmux name=setter' +
-            ' ! multifilesink name=filesink post-messages=true sync=false ' +
-            'max-files=1 location=' + tempfile.gettempdir() + '/DSCFTEMP.JPG')
-        self.source = self.__pipeline.get_by_name('source')
-        self.__source_caps = self.__pipeline.get_by_name('source-caps')
-        self.__exif = self.__pipeline.get_by_name('exif')
-        Gst.TagSetter.set_tag_merge_mode(
-            self.__pipeline.get_by_name('setter'), Gst.TagMergeMode.REPLACE)
-        self.__filesink = self.__pipeline.get_by_name('filesink')
 
-        bus =  self.__pipeline.get_bus()
-        bus.add_signal_watch()
-        bus.enable_sync_message_emission()
-        bus.connect('sync-message::element', self.__on_sync_message)
+    def on_frame(self, frame):
+        """Copies frame of the frame tap into the next slot
 
-        self.__panel_control_stream_info_label_set_text()
+        Args:
+            frame (Frame): mapped frame
+        """
 
-        log = function_name + ': exit'
-        logging.info(log)
+        geometry = (frame.format, tuple(plane.shape for plane in frame.planes))
+        frozen = False
+        with self.__lock:
+            if self.__frozen:
+                return
+            if geometry != self.__geometry:
+                self.__allocate(geometry)
+            for view, plane in zip(self.__views[self.__head], frame.planes):
+                np.copyto(view, plane)
+            self.__timestamps[self.__head] = time.time()
+            self.__head = (self.__head + 1) % len(self.__views)
+            self.__count = min(self.__count + 1, len(self.__views))
+            if self.__post > 0:
+                self.__post = self.__post - 1
+                if self.__post == 0:
+                    self.__frozen = True
+                    frozen = True
+        if frozen:
+            self.ready.emit()
+
+
+    def trigger(self, metadata):
+        """Triggers the burst
 
+        Args:
+            metadata (dict): capture metadata of the burst
 
-    def start(self):
-        """Start the video stream from the camera
+        Returns:
+            bool: True if the burst has been triggered, False if the ring is empty or
+                another burst is in progress
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1157,160 +1039,220 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        self.__pipeline.set_state(Gst.State.PLAYING)
+        result = False
+        with self.__lock:
+            if self.__buffer is not None and self.__post < 0 and not self.__frozen:
+                self.__metadata = metadata
+                self.__post = int(len(self.__views)*self.__post_ratio)
+                self.__frozen = self.__post == 0
+                result = True
+        if result and self.__frozen:
+            self.ready.emit()
 
-        GLib.timeout_add_seconds(1, self.__on_stats)
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
 
-        parameters['photo_camera'] = not parameters['photo_camera']
-        self.__on_control_menu_photo_gallery_button_clicked()
+        return result
 
-        awb_mode = self.source.get_property('awb-mode') - 1
-        if awb_mode <= 0:
-            awb_mode = 9
-        self.source.set_property('awb-mode', awb_mode)
-        self.__on_panel_control_white_balance_button_clicked()
 
-        log = function_name + ': exit'
-        logging.info(log)
+    def flush(self):
+        """Saves frames of the frozen ring to the media folder in chronological order and
+        emits every saved image file with its capture metadata
+        """
 
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-    def panel_control_file_info_label_set_text(self, index):
-        """Sets File Info Label based on meta information of the image file selected by index
+        log = function_name + ': count=' + str(self.__count)
+        logging.info(log)
 
-        Args:
-            index (int): index of the image file
-        """
+        first = next_image_index(self.__media)
+        slots = len(self.__views)
+        frame_format = self.__geometry[0]
+        saved = []
+        for i in range(self.__count):
+            slot = (self.__head - self.__count + i) % slots
+            image = PIL.Image.fromarray(frame_to_rgb(frame_format, self.__views[slot]))
+            metadata = dict(
+                self.__metadata, timestamp=float(self.__timestamps[slot]),
+                width=image.width, height=image.height)
+            exif = image.getexif()
+            exif[0x0132] = time.strftime(
+                '%Y:%m:%d %H:%M:%S', time.localtime(metadata['timestamp']))
+            exif.get_ifd(0x8769).update({
+                0x829A: metadata['shutter_speed']/1000000, 0x8827: metadata['iso']})
+            index = (first + i) % 10000
+            image.save(
+                self.__media + 'DSCF' + str(index).zfill(4) + '.JPG',
+                quality=95, exif=tag_exif(exif.tobytes(), 'burst'))
+            saved.append((index, metadata))
+        os.sync()
+        for index, metadata in saved:
+            self.saved.emit(index, metadata)
+        count = self.__count
+        with self.__lock:
+            self.__count = 0
+            self.__post = -1
+            self.__frozen = False
 
-        function_name = "'" + threading.currentThread().name + "'." + \
-            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+        self.flushed.emit(first, count)
 
-        log = function_name + ': index=' + str(index)
+        log = function_name + ': exit'
         logging.info(log)
 
-        image = PIL.Image.open(self.parameters['media'] + 'DSCF'+str(index).zfill(4)+'.JPG')
 
-        if image._getexif() is None:
-            exif = {}
-        else:
-            exif = {
-                PIL.ExifTags.TAGS[k]: v
-                for k, v in image._getexif().items()
-                if k in PIL.ExifTags.TAGS
-            }
+    def release(self):
+        """Releases slots of the ring
+        """
 
-        log = function_name + ': exif=' + str(exif)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
         logging.info(log)
 
-        if 'ExposureTime' in exif:
-            if str(exif['ExposureTime']) == '0.0':
-                shutter_speed = 'Auto"'
-            elif int(exif['ExposureTime']) == 0:
-                shutter_speed = '1/'+str(int(1/exif['ExposureTime']))+'"'
-            else:
-                shutter_speed = str(int(exif['ExposureTime'])) + '/1"'
-        else:
-            shutter_speed = ''
-        if 'ISOSpeedRatings' in exif:
-            iso = 'ISO '+str(exif['ISOSpeedRatings'])
-            if iso == 'ISO 0':
-                iso = 'ISO Auto'
-        else:
-            iso = ''
-        self.panel_control_info_label.setText(
-            'DSCF'+str(index).zfill(4) + '.JPG\n'+str(image.width) + 'x' + str(image.height) +
-            '\n'+shutter_speed+'\n' + iso)
+        with self.__lock:
+            if not self.__frozen:
+                self.__views = []
+                self.__buffer = None
+                self.__timestamps = None
+                self.__geometry = None
+                self.__count = 0
+                self.__post = -1
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def resolution_up(self):
-        """Handles Resolution increase
 
-        160x120 QQVGA -> 160x128
-        320x240 QVGA
-        640x480 VGA
-        800x600 SVGA -> 800x608
-        1024x768 XGA
-        1280x960 SXGA
-        1600x1200 UXGA
-        2048x1536 QXGA
-        3200x2400 QUXGA
-        4056x3040 MAX
+class PlanetaryCapture(QObject):
+    """Planetary Capture
+
+    Scores sharpness of a region following the planet in every frame of the frame tap and
+    keeps only the best frames in a bounded min-heap of slots allocated once per capture.
+    """
+
+    progress = pyqtSignal(int, float)
+    stopped = pyqtSignal()
+    finished = pyqtSignal(str, int)
 
+
+    def __init__(self, media, size=256, keep=50, frames=1000):
+        """Initializes Planetary Capture
+
+        Args:
+            media (str): media folder
+            size (int, optional): size of the region in pixels. Defaults to 256.
+            keep (int, optional): number of the best frames to keep. Defaults to 50.
+            frames (int, optional): number of frames to score. Defaults to 1000.
         """
 
+        super().__init__()
+
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': size=' + str(size) + ', keep=' + str(keep) + \
+            ', frames=' + str(frames)
         logging.info(log)
 
-        structure = self.__source_caps.get_property('caps').get_structure(0)
-        width = structure.get_value('width')
-        height = structure.get_value('height')
+        self.__media = media
+        self.__size = size
+        self.__region = size
+        self.__keep = keep
+        self.__frames = frames
+        self.__lock = threading.Lock()
+        self.__format = None
+        self.__slots = []
+        self.__heap = []
+        self.__origin = None
+        self.__count = 0
+        self.active = False
+        self.stopped.connect(self.save)
 
-        if (
-            (width < 4056 and self.__gpu_mem >= 512 and self.__sv_mem >= 2048-512-256) or
-            (width < 3200 and self.__gpu_mem >= 256 and self.__sv_mem >= 1024-256-128) or
-            (width < 2048 and self.__gpu_mem >= 128 and self.__sv_mem >= 512-128-64)):
-            if width == 3200:
-                width = 4056
-                height = 3040
-            elif width == 2048:
-                width = 3200
-                height = 2400
-            elif width == 1600:
-                width = 2048
-                height = 1536
-            elif width == 1280:
-                width = 1600
-                height = 1200
-            elif width == 1024:
-                width = 1280
-                height = 960
-            elif width == 800:
-                width = 1024
-                height = 768
-            elif width == 640:
-                width = 800
-                height = 608 # rounded to multiple of 16
-            elif width == 320:
-                width = 640
-                height = 480
-            elif width == 160:
-                width = 320
-                height = 240
+        log = function_name + ': exit'
+        logging.info(log)
 
-            log = function_name + ': width=' + str(width) + ', height=' + str(height)
-            logging.info(log)
 
-            self.__pipeline.set_state(Gst.State.NULL)
-            caps = Gst.Caps.new_empty_simple('video/x-raw')
-            caps.set_value('width', width)
-            caps.set_value('height', height)
-            self.__source_caps.set_property('caps', caps)
-            self.source.set_property('annotation-text-size', int(height/16))
-            self.__pipeline.set_state(Gst.State.PLAYING)
-            self.__panel_control_stream_info_label_set_text()
+    @staticmethod
+    def sharpness(luma):
+        """Scores sharpness as variance of the Laplacian
 
-        log = function_name + ': entry'
-        logging.info(log)
+        Args:
+            luma (numpy.ndarray): luminance
 
+        Returns:
+            float: sharpness
+        """
 
-    def resolution_down(self):
-        """Handles resolution decrease
+        luma = luma.astype(np.float32)
+        laplacian = 4*luma[1:-1, 1:-1]
+        laplacian -= luma[:-2, 1:-1]
+        laplacian -= luma[2:, 1:-1]
+        laplacian -= luma[1:-1, :-2]
+        laplacian -= luma[1:-1, 2:]
+        return float(laplacian.var())
 
-        160x120 QQVGA -> 160x128
-        320x240 QVGA
-        640x480 VGA
-        800x608 SVGA -> 800x608
-        1024x768 XGA
-        1280x960 SXGA
-        1600x1200 UXGA
-        2048x1536 QXGA
-        3200x2400 QUXGA
-        4056x3040 MAX
+
+    @staticmethod
+    def __centroid(luma):
+        """Gets centroid of the bright part of the image
+
+        Args:
+            luma (numpy.ndarray): luminance
+
+        Returns:
+            tuple: row and column of the centroid or None if the image is flat
+        """
+
+        threshold = (float(luma.max()) + float(luma.mean()))/2
+        mask = luma > threshold
+        if not mask.any():
+            return None
+        rows, columns = np.nonzero(mask)
+        return rows.mean(), columns.mean()
+
+
+    def __place(self, center, height, width):
+        """Places the region around center
+
+        Args:
+            center (tuple): row and column of the center
+            height (int): height of the frame
+            width (int): width of the frame
+
+        Returns:
+            tuple: even row and column of the top left corner of the region
+        """
+
+        y = int(center[0] - self.__region/2)//2*2
+        x = int(center[1] - self.__region/2)//2*2
+        return min(max(y, 0), height - self.__region), min(max(x, 0), width - self.__region)
+
+
+    def __crop(self, planes, origin):
+        """Crops region from the planes of the frame
+
+        Args:
+            planes (list): planes of the frame
+            origin (tuple): row and column of the top left corner of the region
+
+        Returns:
+            list: cropped views of the planes
+        """
+
+        y, x = origin
+        height = planes[0].shape[0]
+        result = []
+        for plane in planes:
+            scale = height//plane.shape[0]
+            result.append(plane[
+                y//scale:(y + self.__region)//scale, x//scale:(x + self.__region)//scale])
+        return result
+
+
+    def start(self):
+        """Starts scoring frames
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1319,57 +1261,19 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        structure = self.__source_caps.get_property('caps').get_structure(0)
-        width = structure.get_value('width')
-        height = structure.get_value('height')
-
-        if width > 160:
-            if width == 320:
-                width = 160
-                height = 128 # rounded to multiple of 16
-            elif width == 640:
-                width = 320
-                height = 240
-            elif width == 800:
-                width = 640
-                height = 480
-            elif width == 1024:
-                width = 800
-                height = 608 # rounded to multiple of 16
-            elif width == 1280:
-                width = 1024
-                height = 768
-            elif width == 1600:
-                width = 1280
-                height = 960
-            elif width == 2048:
-                width = 1600
-                height = 1200
-            elif width == 3200:
-                width = 2048
-                height = 1536
-            elif width == 4056:
-                width = 3200
-                height = 2400
-
-            log = function_name + ': width=' + str(width) + ', height=' + str(height)
-            logging.info(log)
-
-            self.__pipeline.set_state(Gst.State.NULL)
-            caps = Gst.Caps.new_empty_simple('video/x-raw')
-            caps.set_value('width', width)
-            caps.set_value('height', height)
-            self.__source_caps.set_property('caps', caps)
-            self.source.set_property('annotation-text-size', int(height/16))
-            self.__pipeline.set_state(Gst.State.PLAYING)
-            self.__panel_control_stream_info_label_set_text()
+        with self.__lock:
+            self.__heap = []
+            self.__slots = []
+            self.__origin = None
+            self.__count = 0
+            self.active = True
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_panel_control_contrast_button_down_clicked(self):
-        """Handles contrast decrease
+    def stop(self):
+        """Stops scoring frames and saves the best frames in the background
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1378,182 +1282,208 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        contrast = int(self.source.get_property('contrast')) - 10
+        with self.__lock:
+            active = self.active
+            self.active = False
+        if active:
+            self.stopped.emit()
 
-        log = function_name + ': contrast=' + str(contrast)
+        log = function_name + ': exit'
         logging.info(log)
 
-        if contrast > -110:
-            self.panel_control_contrast_button_up.setEnabled(True)
-            if contrast == -100:
-                self.panel_control_contrast_button_down.setEnabled(False)
-            self.panel_control_contrast_label.setText(str(contrast))
-            self.source.set_property('contrast', contrast)
-            if contrast == 0:
-                self.__capturing_contrast = 'normal'
-            elif contrast < 0:
-                self.__capturing_contrast = 'soft'
-            elif contrast > 0:
-                self.__capturing_contrast = 'hard'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
 
-        log = function_name + ': exit'
-        logging.info(log)
+    def on_frame(self, frame):
+        """Scores frame of the frame tap and keeps it if it is among the best frames
 
+        Args:
+            frame (Frame): mapped frame
+        """
 
-    def __on_panel_control_contrast_button_up_clicked(self):
-        """Handles contrast increase
+        stop = False
+        with self.__lock:
+            if not self.active:
+                return
+            luma = frame.luminance()
+            height, width = luma.shape
+            if self.__origin is None:
+                # region of this capture fits the stream, the configured size is kept
+                self.__region = min(self.__size, height, width)//2*2
+                center = PlanetaryCapture.__centroid(luma[::4, ::4])
+                if center is None:
+                    center = (height/8, width/8)
+                self.__origin = self.__place((center[0]*4, center[1]*4), height, width)
+                self.__format = frame.format
+                # slots hold planes of the region only, allocated once per capture
+                self.__slots = [
+                    [np.empty(view.shape, dtype=np.uint8)
+                     for view in self.__crop(frame.planes, self.__origin)]
+                    for _ in range(self.__keep)]
+            crop = self.__crop(frame.planes, self.__origin)
+            region = crop[0] if crop[0].ndim == 2 else crop[0][:, :, 1]
+            score = PlanetaryCapture.sharpness(region)
+            self.__count = self.__count + 1
+            slot = None
+            if len(self.__heap) < self.__keep:
+                slot = len(self.__heap)
+                heapq.heappush(self.__heap, (score, self.__count, slot))
+            elif score > self.__heap[0][0]:
+                slot = self.__heap[0][2]
+                heapq.heapreplace(self.__heap, (score, self.__count, slot))
+            if slot is not None:
+                for view, plane in zip(self.__slots[slot], crop):
+                    np.copyto(view, plane)
+            # follow the planet drifting across the frame
+            center = PlanetaryCapture.__centroid(region)
+            if center is not None:
+                self.__origin = self.__place(
+                    (self.__origin[0] + center[0], self.__origin[1] + center[1]),
+                    height, width)
+            count = self.__count
+            best = self.__heap[0][0]
+            if count >= self.__frames:
+                stop = True
+        if count % 25 == 0:
+            self.progress.emit(count, best)
+        if stop:
+            self.stop()
+
+
+    def save(self):
+        """Saves the best frames ranked by sharpness to PLANnnnn folder and the sharpest
+        frame as the next image file
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': count=' + str(self.__count) + ', kept=' + str(len(self.__heap))
         logging.info(log)
 
-        contrast = int(self.source.get_property('contrast')) + 10
-
-        log = function_name + ': contrast=' + str(contrast)
-        logging.info(log)
+        index = -1
+        folder = ''
+        ranked = sorted(self.__heap, reverse=True)
+        if len(ranked) > 0:
+            index = next_image_index(self.__media)
+            folder = self.__media + 'PLAN' + str(index).zfill(4) + '/'
+            os.makedirs(folder, exist_ok=True)
+            for rank, (score, _, slot) in enumerate(ranked):
+                image = PIL.Image.fromarray(frame_to_rgb(self.__format, self.__slots[slot]))
+                image.save(folder + str(rank).zfill(4) + '.PNG', compress_level=1)
+                if rank == 0:
+                    image.save(
+                        self.__media + 'DSCF' + str(index).zfill(4) + '.JPG', quality=100,
+                        exif=tag_exif(b'', 'planetary'))
+                log = function_name + ': rank=' + str(rank) + ', score=' + str(score)
+                logging.info(log)
+            os.sync()
+        self.__slots = []
+        self.__heap = []
 
-        if contrast < 110:
-            self.panel_control_contrast_button_down.setEnabled(True)
-            if contrast == 100:
-                self.panel_control_contrast_button_up.setEnabled(False)
-            self.panel_control_contrast_label.setText(str(contrast))
-            self.source.set_property('contrast', contrast)
-            if contrast == 0:
-                self.__capturing_contrast = 'normal'
-            elif contrast < 0:
-                self.__capturing_contrast = 'soft'
-            elif contrast > 0:
-                self.__capturing_contrast = 'hard'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        self.finished.emit(folder, index)
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_panel_control_white_balance_button_clicked(self):
-        """Handles white balance control
+
+class SerWriter(QObject):
+    """SER Writer
+
+    Records frames of the frame tap into a SER video file. Frames are copied into slots
+    allocated once per recording and written sequentially on the writer thread into a file
+    preallocated in chunks ahead of the write position on file systems with native
+    fallocate. Frames arriving while all slots wait to be written or after the frame limit has
+    been queued are dropped and counted.
+    """
+
+    HEADER_SIZE = 178
+    PREALLOCATION = 256*1024*1024
+    # glibc emulates fallocate on other file systems by writing every block
+    NATIVE_FALLOCATE = ('ext4', 'xfs', 'btrfs', 'f2fs', 'tmpfs')
+    # offset of 0001-01-01 from the Unix epoch in seconds
+    EPOCH = 62135596800
+
+    # path is empty if no frame has been written
+    finished = pyqtSignal(str, int, int)
+
+
+    def __init__(self, budget=64*1024*1024, color=False, limit=3000):
+        """Initializes SER Writer
+
+        Args:
+            budget (int, optional): memory budget of the slots in bytes. Defaults to 64MiB.
+            color (bool, optional): records RGB if True, luminance otherwise. Defaults to False.
+            limit (int, optional): maximum number of frames. Defaults to 3000.
         """
 
+        super().__init__()
+
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': budget=' + str(budget) + ', color=' + str(color) + \
+            ', limit=' + str(limit)
         logging.info(log)
 
-        awb_mode = self.source.get_property('awb-mode')
-
-        log = function_name + ': awb_mode=' + str(awb_mode)
-        logging.info(log)
-
-        if awb_mode == 1:
-            self.panel_control_white_balance_button.setToolTip(
-                'Sunlight white balance mode')
-            self.panel_control_white_balance_button.setIcon(
-                QIcon(self.parameters['icons'] + 'wb_sunny_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 2)
-            self.__capturing_white_balance = 'daylight'
-        elif awb_mode == 2:
-            self.panel_control_white_balance_button.setToolTip(
-                'Cloudy white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'cloudy_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 3)
-            self.__capturing_white_balance = 'cloudy'
-        elif awb_mode == 3:
-            self.panel_control_white_balance_button.setToolTip(
-                'Shade white balance mode')
-            self.panel_control_white_balance_button.setIcon(
-                QIcon(self.parameters['icons'] + 'wb_shade_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 4)
-            self.__capturing_white_balance = 'manual'
-        elif awb_mode == 4:
-            self.panel_control_white_balance_button.setToolTip(
-                'Tungsten white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'emoji_objects_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 5)
-            self.__capturing_white_balance = 'tungsten'
-        elif awb_mode == 5:
-            self.panel_control_white_balance_button.setToolTip(
-                'Fluorescent white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'fluorescent_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 6)
-            self.__capturing_white_balance = 'fluorescent'
-        elif awb_mode == 6:
-            self.panel_control_white_balance_button.setToolTip(
-                'Incadescent white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'wb_incandescent_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 7)
-            self.__capturing_white_balance = '"fluorescent h"'
-        elif awb_mode == 7:
-            self.panel_control_white_balance_button.setToolTip(
-                'Flash white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'flash_on_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 8)
-            self.__capturing_white_balance = 'flash'
-        elif awb_mode == 8:
-            self.panel_control_white_balance_button.setToolTip(
-                'Horizon white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'wb_twilight_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 9)
-            self.__capturing_white_balance = 'manual'
-        elif awb_mode == 9:
-            self.panel_control_white_balance_button.setToolTip(
-                'Auto white balance mode')
-            self.panel_control_white_balance_button.setIcon(QIcon(
-                self.parameters['icons'] + 'wb_auto_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.source.set_property('awb-mode', 1)
-            self.__capturing_white_balance = 'auto'
-
-        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        self.__budget = budget
+        self.__color = color
+        self.__limit = limit
+        self.__condition = threading.Condition()
+        self.__file = None
+        self.__path = None
+        self.__frame_size = 0
+        self.__size = 0
+        self.__allocated = 0
+        self.__preallocate = False
+        self.__instrument = ''
+        self.__format = None
+        self.__shape = None
+        self.__slots = None
+        self.__times = None
+        self.__free = collections.deque()
+        self.__queue = collections.deque()
+        self.__copying = 0
+        self.__timestamps = None
+        self.__closing = False
+        self.active = False
+        self.received = 0
+        self.dropped = 0
+        self.written = 0
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_panel_control_saturation_button_down_clicked(self):
-        """Handles sturation decrease
+    def start(self, file, instrument):
+        """Starts recording
+
+        Args:
+            file (str): path of the SER file
+            instrument (str): camera model
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
-        logging.info(log)
-
-        saturation = self.source.get_property('saturation') - 10
-
-        log = function_name + ': saturation=' + str(saturation)
+        log = function_name + ': file=' + file
         logging.info(log)
 
-        if saturation > -110:
-            self.panel_control_saturation_button_up.setEnabled(True)
-            if saturation == -100:
-                self.panel_control_saturation_button_down.setEnabled(False)
-            self.panel_control_saturation_label.setText(str(saturation))
-            self.source.set_property('saturation', saturation)
-            if saturation == 0:
-                self.__capturing_saturation = 'normal'
-            elif saturation < 0:
-                self.__capturing_saturation = 'low-saturation'
-            elif saturation > 0:
-                self.__capturing_saturation = 'high-saturation'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        with self.__condition:
+            self.__path = file
+            self.__instrument = instrument
+            self.__slots = None
+            self.__timestamps = np.zeros(self.__limit, dtype='<i8')
+            self.received = 0
+            self.dropped = 0
+            self.written = 0
+            self.active = True
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_panel_control_saturation_button_up_clicked(self):
-        """Handles saturation increase
+    def stop(self):
+        """Stops recording and lets the writer thread finalize the file
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1562,224 +1492,324 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        saturation = self.source.get_property('saturation') + 10
-
-        log = function_name + ': saturation=' + str(saturation)
-        logging.info(log)
-
-        if saturation < 110:
-            self.panel_control_saturation_button_down.setEnabled(True)
-            if saturation == 100:
-                self.panel_control_saturation_button_up.setEnabled(False)
-            self.panel_control_saturation_label.setText(str(saturation))
-            self.source.set_property('saturation', saturation)
-            if saturation == 0:
-                self.__capturing_saturation = 'normal'
-            elif saturation < 0:
-                self.__capturing_saturation = 'low-saturation'
-            elif saturation > 0:
-                self.__capturing_saturation = 'high-saturation'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        with self.__condition:
+            if self.active:
+                self.active = False
+                self.__closing = True
+                self.__condition.notify_all()
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_panel_control_delete_button_clicked(self):
-        """Handles images delete
+    def __allocate(self, frame):
+        """Allocates slots for frames of the recording
+
+        Args:
+            frame (Frame): first mapped frame
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        self.__format = frame.format
+        self.__shape = frame.luminance().shape
+        planes = frame.planes if self.__color else [frame.luminance()]
+        size = sum(plane.size for plane in planes)
+        count = max(2, self.__budget//size)
+        self.__slots = [
+            [np.zeros(plane.shape, dtype=np.uint8) for plane in planes] for _ in range(count)]
+        self.__times = np.zeros(count, dtype=np.float64)
+        self.__free = collections.deque(range(count), count)
+        self.__queue = collections.deque((), count)
+
+        log = function_name + ': slots=' + str(count)
         logging.info(log)
 
-        if not self.parameters['photo_camera']:
-            self.__index = self.panel_display.get_index()
-        images = glob.glob(self.parameters['media'] + 'DSCF????.JPG')
-        images.sort()
-        index = images.index(self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
-        if path.exists(self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG'):
-            os.remove(self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
-        if len(images) == 1:
-            self.__index = -1
-            if not self.parameters['photo_camera']:
-                self.panel_display.set_index(self.__index)
-                self.__on_control_menu_photo_gallery_button_clicked()
-            self.control_menu_photo_gallery_button.setEnabled(False)
-        else:
-            if index + 1 == len(images):
-                index = len(images) - 2
-            else:
-                index = index + 1
-            self.__index = int(re.search(r'\d+', images[index]).group())
-            if not self.parameters['photo_camera']:
-                self.panel_display.setPixmap(QPixmap(
-                    self.parameters['media'] + 'DSCF' + str(self.__index).zfill(4) +
-                    '.JPG').scaled(640,480))
-                self.panel_display.set_index(self.__index)
-                self.panel_display.set_zoom(False)
-            self.panel_control_file_info_label_set_text(self.__index)
 
-        log = function_name + ': exit'
-        logging.info(log)
+    def on_frame(self, frame):
+        """Queues frame of the frame tap for writing
 
+        Args:
+            frame (Frame): mapped frame
+        """
 
-    def __on_control_menu_photo_gallery_button_clicked(self):
-        """Toggles between Photo Gallery and Photo Camera
+        with self.__condition:
+            if not self.active:
+                return
+            if self.__slots is None:
+                self.__allocate(frame)
+            self.received = self.received + 1
+            if len(self.__free) == 0 or self.received - self.dropped > self.__limit:
+                self.dropped = self.dropped + 1
+                return
+            slot = self.__free.popleft()
+            views = self.__slots[slot]
+            times = self.__times
+            # the writer does not close the file while a frame is being copied
+            self.__copying = self.__copying + 1
+        planes = frame.planes if self.__color else [frame.luminance()]
+        for view, plane in zip(views, planes):
+            np.copyto(view, plane)
+        times[slot] = time.time()
+        with self.__condition:
+            self.__copying = self.__copying - 1
+            self.__queue.append(slot)
+            self.__condition.notify_all()
+
+
+    def __header(self, frames):
+        """Builds header
+
+        Args:
+            frames (int): number of frames
+
+        Returns:
+            bytes: header
         """
 
-        function_name = "'" + threading.currentThread().name + "'." + \
-            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+        height, width = self.__shape
+        timestamp = self.__timestamps[0] if frames > 0 else \
+            int((time.time() + SerWriter.EPOCH)*10000000)
+        local = timestamp + time.localtime().tm_gmtoff*10000000
+        return b'LUCAM-RECORDER' + struct.pack(
+            '<iiiiiii40s40s40sqq', 0, 100 if self.__color else 0, 0, width, height, 8, frames,
+            b'', self.__instrument.encode('ascii', 'replace')[:40], b'', local, timestamp)
 
-        log = function_name + ': entry'
-        logging.info(log)
 
-        if self.parameters['photo_camera']:
-            self.parameters['photo_camera'] = False
-            self.__pipeline.set_state(Gst.State.NULL)
-            self.panel_display.setToolTip(
-                'Swipe left or right to select an image or double tap to zoom in')
-            self.control_menu_photo_gallery_button.setToolTip('Photo camera')
-            self.control_menu_photo_gallery_button.setIcon(
-                QIcon(self.parameters['icons'] + 'photo_camera_FILL0_wght400_GRAD0_opsz48.svg'))
+    @staticmethod
+    def __file_system(file):
+        """Gets type of the file system the file is stored on
 
-            self.panel_display.setPixmap(
-                QPixmap(self.parameters['media'] + 'DSCF' + str(self.__index).zfill(4) +
-                '.JPG').scaled(640,480))
-            self.panel_display.set_index(self.__index)
-            self.panel_display.set_zoom(False)
-            self.control_shutter_button.setIcon(
-                QIcon(self.parameters['icons'] + 'delete_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.control_shutter_button.setToolTip('Delete a image')
-            CameraScreen.reconnect(
-                self.control_shutter_button.clicked,
-                self.__on_control_shutter_button_clicked,
-                self.__on_panel_control_delete_button_clicked)
-            self.panel_control_file_info_label_set_text(self.__index)
-        else:
-            self.parameters['photo_camera'] = True
-            self.__pipeline.set_state(Gst.State.PLAYING)
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
-            self.panel_display.setToolTip(
-                'Swipe left or right to change resolution or double tap to toggle debug mode')
-            self.control_menu_photo_gallery_button.setToolTip('Photo gallery')
-            self.control_menu_photo_gallery_button.setIcon(
-                QIcon(self.parameters['icons'] + 'photo_library_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.__index = self.panel_display.get_index()
-            self.control_shutter_button.setIcon(
-                QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.control_shutter_button.setToolTip('Take a picture')
-            CameraScreen.reconnect(
-                self.control_shutter_button.clicked,
-                self.__on_panel_control_delete_button_clicked,
-                self.__on_control_shutter_button_clicked)
-            self.__panel_control_stream_info_label_set_text()
+        Args:
+            file (str): path of the file
 
-        log = function_name + ': exit'
-        logging.info(log)
+        Returns:
+            str: type of the file system or empty string if it is unknown
+        """
 
+        folder = path.realpath(path.dirname(path.abspath(file)))
+        result = ''
+        length = -1
+        for partition in psutil.disk_partitions(all=True):
+            mountpoint = partition.mountpoint
+            if (folder == mountpoint or folder.startswith(mountpoint.rstrip('/') + '/')) and \
+                len(mountpoint) > length:
+                result = partition.fstype
+                length = len(mountpoint)
+        return result
 
-    def __on_control_menu_debug_mode_button_clicked(self):
-        """Toggles between Photo Gallery and Photo Camera
+
+    def __open(self):
+        """Creates SER file
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
-        logging.info(log)
-
-        annotation_mode = self.source.get_property('annotation-mode')
+        height, width = self.__shape
+        self.__file = open(self.__path, 'wb', buffering=4*1024*1024)
+        self.__frame_size = height*width*(3 if self.__color else 1)
+        self.__size = SerWriter.HEADER_SIZE + self.__frame_size*self.__limit
+        self.__allocated = 0
+        file_system = SerWriter.__file_system(self.__path)
+        self.__preallocate = file_system in SerWriter.NATIVE_FALLOCATE
+        self.__file.write(self.__header(0))
 
-        log = function_name + ': annotation_mode=' + str(annotation_mode)
+        log = function_name + ': file=' + self.__path + ', file_system=' + file_system
         logging.info(log)
 
-        if annotation_mode == 0x00000000:
-            self.source.set_property('annotation-mode', 0x0000065D)
-            self.control_menu_exit_button.setIcon(
-                QIcon(self.parameters['icons'] + 'analytics_FILL1_wght400_GRAD0_opsz48.svg'))
-        else:
-            self.source.set_property('annotation-mode', 0x00000000)
-            self.control_menu_exit_button.setIcon(
-                QIcon(self.parameters['icons'] + 'analytics_FILL0_wght400_GRAD0_opsz48.svg'))
-
-        log = function_name + ': exit'
-        logging.info(log)
 
+    def __extend(self, end):
+        """Preallocates next chunk of the SER file, bounded by the free space, once the
+        write position is about to pass the preallocated part
 
-    def __write_parameters(self):
-        """Saves parameters to the config file
+        Args:
+            end (int): offset of the end of the next write
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
-        logging.info(log)
+        if not self.__preallocate or end <= self.__allocated:
+            return
+        length = min(
+            SerWriter.PREALLOCATION, self.__size - self.__allocated,
+            shutil.disk_usage(path.dirname(path.abspath(self.__path))).free)
+        try:
+            if length <= 0:
+                raise OSError('no space left to preallocate')
+            os.posix_fallocate(self.__file.fileno(), self.__allocated, length)
+            self.__allocated = self.__allocated + length
+        except OSError as exception:
+            self.__preallocate = False
+            log = function_name + ': exception=' + str(exception)
+            logging.warning(log)
+
+
+    def __close(self):
+        """Truncates SER file to the written frames, appends timestamps and updates header
+        """
 
-        if self.source is not None and self.__source_caps is not None:
-            structure = self.__source_caps.get_property('caps').get_structure(0)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-            self.parameters['width'] = structure.get_value('width')
-            self.parameters['height'] = structure.get_value('height')
-            self.parameters['sharpness'] = self.source.get_property('sharpness')
-            self.parameters['shutter_speed'] = self.source.get_property('shutter-speed')
-            self.parameters['iso'] = self.source.get_property('analog-gain')
-            self.parameters['contrast'] = self.source.get_property('contrast')
-            self.parameters['white_balance'] = self.source.get_property('awb-mode')
-            self.parameters['saturation'] = self.source.get_property('saturation')
-            self.parameters['annotation_mode'] = self.source.get_property('annotation-mode')
-            self.parameters['annotation_text_size'] = self.source.get_property(
-                'annotation-text-size')
+        log = function_name + ': written=' + str(self.written) + ', dropped=' + \
+            str(self.dropped)
+        logging.info(log)
 
-            with open(self.parameters['config'], 'w') as config:
-                config.write(json.dumps(self.parameters))
+        file = ''
+        if self.__file is not None:
+            self.__file.flush()
+            self.__file.truncate(self.__file.tell())
+            self.__file.write(self.__timestamps[:self.written].tobytes())
+            self.__file.seek(0)
+            self.__file.write(self.__header(self.written))
+            self.__file.close()
+            self.__file = None
             os.sync()
+            file = self.__path
+        with self.__condition:
+            self.__slots = None
+            self.__times = None
+            self.__free.clear()
+            self.__queue.clear()
+        self.finished.emit(file, self.written, self.dropped)
 
-        log = function_name + ': exit'
-        logging.info(log)
 
-
-    def __on_control_menu_quit_button_clicked(self):
-        """Closes the application
+    def run(self):
+        """Writes queued frames
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': loop'
         logging.info(log)
 
-        self.__write_parameters()
+        while True:
+            slot = -1
+            with self.__condition:
+                while len(self.__queue) == 0 and not (self.__closing and self.__copying == 0):
+                    self.__condition.wait()
+                if len(self.__queue) == 0:
+                    self.__closing = False
+                    close = True
+                else:
+                    close = False
+                    slot = self.__queue.popleft()
+            if close:
+                self.__close()
+                continue
+            if self.written >= self.__limit:
+                with self.__condition:
+                    self.__free.append(slot)
+                continue
+            if self.__file is None:
+                self.__open()
+            self.__extend(self.__file.tell() + self.__frame_size)
+            if self.__color:
+                self.__file.write(frame_to_rgb(self.__format, self.__slots[slot]).data)
+            else:
+                self.__file.write(self.__slots[slot][0].data)
+            self.__timestamps[self.written] = \
+                int((self.__times[slot] + SerWriter.EPOCH)*10000000)
+            self.written = self.written + 1
+            with self.__condition:
+                self.__free.append(slot)
+            if self.written >= self.__limit:
+                self.stop()
 
-        self.__parent.quit()
 
-        log = function_name + ': exit'
-        logging.info(log)
 
+class FocusAssist(QObject):
+    """Focus Assist
 
-    def __on_control_menu_shutdown_button_clicked(self):
-        """Closes the application
-        """
+    Measures half-flux radius and FWHM of the brightest stars in frames of the frame tap.
+    The tap thread only copies luminance of the latest frame, which is measured on the thread
+    the focus assist runs on. Luminance is copied into a shared array allocated once per
+    resolution and stars are found and measured in tiles of rows by the processing executor.
+    """
 
-        function_name = "'" + threading.currentThread().name + "'." + \
+    measured = pyqtSignal(float, float, float, int)
+
+
+    def __init__(self, executor, processes=3, stars=20, interval=0.2, radius=8, sigma=5.0):
+        """Initializes Focus Assist
+
+        Args:
+            executor (ProcessingExecutor): processing executor
+            processes (int, optional): number of worker processes of the executor.
+                Defaults to 3.
+            stars (int, optional): number of the brightest stars to measure. Defaults to 20.
+            interval (float, optional): minimal interval between measurements in seconds.
+                Defaults to 0.2.
+            radius (int, optional): radius of a star in pixels. Defaults to 8.
+            sigma (float, optional): threshold of stars above the background in noise
+                deviations. Defaults to 5.0.
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': stars=' + str(stars) + ', interval=' + str(interval) + \
+            ', radius=' + str(radius) + ', sigma=' + str(sigma)
         logging.info(log)
 
-        self.__write_parameters()
-
-        os.system('sudo shutdown -h now')
+        self.__executor = executor
+        self.__processes = processes
+        self.__stars = stars
+        self.__interval = interval
+        self.__radius = radius
+        self.__sigma = sigma
+        self.__condition = threading.Condition()
+        self.__memories = []
+        self.__source = None
+        self.__destination = None
+        self.__descriptors = None
+        self.__latest = None
+        self.__pending = False
+        self.__generation = 0
+        self.__deadline = 0
+        self.best = float('nan')
+        self.active = False
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_sharpness_button_down_clicked(self):
-        """Handles sharpness decrease
+    def __allocate(self, shape):
+        """Allocates shared arrays of luminance and measured stars
+
+        Args:
+            shape (tuple): shape of the luminance
+        """
+
+        self.__release()
+        source_memory, self.__source, source = ProcessingExecutor.shared_array(shape, np.uint8)
+        destination_memory, self.__destination, destination = ProcessingExecutor.shared_array(
+            (shape[0], 3), np.float32)
+        self.__memories = [source_memory, destination_memory]
+        self.__descriptors = (source, destination)
+
+
+    def __release(self):
+        """Releases shared arrays
+        """
+
+        self.__source = None
+        self.__destination = None
+        self.__descriptors = None
+        for memory in self.__memories:
+            memory.close()
+            memory.unlink()
+        self.__memories = []
+
+
+    def start(self):
+        """Starts measuring frames resetting the best half-flux radius
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1788,31 +1818,19 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        sharpness = int(self.source.get_property('sharpness')) - 10
-
-        log = function_name + ': sharpness=' + str(sharpness)
-        logging.info(log)
-
-        if sharpness > -110:
-            self.control_sharpness_button_up.setEnabled(True)
-            if sharpness == -100:
-                self.control_sharpness_button_down.setEnabled(False)
-            self.control_sharpness_label.setText(str(sharpness))
-            self.source.set_property('sharpness', sharpness)
-            if sharpness == 0:
-                self.__capturing_sharpness = 'normal'
-            elif sharpness < 0:
-                self.__capturing_sharpness = 'soft'
-            elif sharpness > 0:
-                self.__capturing_sharpness = 'hard'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        with self.__condition:
+            self.best = float('nan')
+            self.__deadline = 0
+            self.__generation = self.__generation + 1
+            self.active = True
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_sharpness_button_up_clicked(self):
-        """Handles sharpness increase
+    def stop(self):
+        """Stops measuring frames, shared arrays are released once the measurement in progress
+        has finished
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
@@ -1821,442 +1839,6663 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
-        sharpness = int(self.source.get_property('sharpness')) + 10
+        with self.__condition:
+            self.active = False
+            self.__pending = False
+            self.__condition.notify_all()
 
-        log = function_name + ': sharpness=' + str(sharpness)
+        log = function_name + ': exit'
         logging.info(log)
 
-        if sharpness < 110:
-            self.control_sharpness_button_down.setEnabled(True)
-            if sharpness == 100:
-                self.control_sharpness_button_up.setEnabled(False)
-            self.control_sharpness_label.setText(str(sharpness))
-            self.source.set_property('sharpness', sharpness)
-            if sharpness == 0:
-                self.__capturing_sharpness = 'normal'
-            elif sharpness < 0:
-                self.__capturing_sharpness = 'soft'
-            elif sharpness > 0:
-                self.__capturing_sharpness = 'hard'
-            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
 
-        log = function_name + ': exit'
-        logging.info(log)
+    def on_frame(self, frame):
+        """Copies luminance of the frame for measurement, called from the tap thread
 
+        Frames arriving before the interval has elapsed are skipped and a frame waiting for
+        measurement is replaced by the latest one.
 
-    def __panel_control_stream_info_label_set_text(self):
-        """Sets stream information
+        Args:
+            frame (Frame): mapped frame
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
-        logging.info(log)
+        log = function_name + ': pts=' + str(frame.pts)
+        logging.debug(log)
 
+        with self.__condition:
+            timestamp = time.monotonic()
+            if not self.active or timestamp < self.__deadline:
+                return
+            self.__deadline = timestamp + self.__interval
+            luminance = frame.luminance()
+            if self.__latest is None or self.__latest.shape != luminance.shape:
+                self.__latest = np.empty(luminance.shape, dtype=np.uint8)
+            np.copyto(self.__latest, luminance)
+            self.__pending = True
+            self.__condition.notify_all()
 
-        if self.parameters['photo_camera']:
-            structure = self.__source_caps.get_property('caps').get_structure(0)
 
-            exposure_time = self.source.get_property('shutter-speed')
-            if exposure_time == 0:
-                shutter_speed = 'Auto'
-            else:
-                exposure_time = exposure_time / 1000000
-                if int(exposure_time) == 0:
-                    shutter_speed = '1/' + str(int(1/exposure_time))
-                else:
-                    shutter_speed = str(int(exposure_time)) + '/1'
+    def run(self):
+        """Measures the latest copied frames
+        """
 
-            analog_gain = self.source.get_property('analog-gain')
-            if analog_gain == 0:
-                iso = 'Auto'
-            else:
-                iso = str(int(analog_gain*100/256))
-            self.panel_control_info_label.setText(
-                self.parameters['model'] + '\n' + str(structure.get_value('width')) + 'x' +
-                str(structure.get_value('height')) + '\n' + shutter_speed + '"\nISO ' + iso)
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': exit'
+        log = function_name + ': loop'
         logging.info(log)
 
+        while True:
+            with self.__condition:
+                while not self.__pending:
+                    if not self.active and self.__memories:
+                        self.__release()
+                    self.__condition.wait()
+                self.__pending = False
+                if self.__source is None or self.__source.shape != self.__latest.shape:
+                    self.__allocate(self.__latest.shape)
+                np.copyto(self.__source, self.__latest)
+                generation = self.__generation
+            self.__measure(generation)
+
+
+    def __measure(self, generation):
+        """Measures stars in the shared luminance array
 
-    def __on_control_exposure_shutter_speed_button_up_clicked(self):
-        """Handles increase of shutter speed
+        Args:
+            generation (int): number of starts of the focus assist when the frame was copied
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
-        logging.info(log)
+        self.__executor.map_tiles(
+            measure_stars_tile, self.__descriptors[0], self.__descriptors[1],
+            -(-self.__source.shape[0]//(2*self.__processes)), (self.__radius, self.__sigma))
+        stars = self.__destination[~np.isnan(self.__destination[:, 0])]
+        stars = stars[np.argsort(stars[:, 0])[::-1][:self.__stars]]
+        hfr = float('nan')
+        fwhm = float('nan')
+        if len(stars) > 0:
+            hfr = float(np.median(stars[:, 1]))
+            fwhm = float(np.median(stars[:, 2]))
+        with self.__condition:
+            # measurement of a frame copied before the best value was reset is dropped
+            if not self.active or generation != self.__generation:
+                return
+            if not hfr >= self.best:
+                self.best = hfr
+            best = self.best
+
+        self.measured.emit(hfr, fwhm, best, len(stars))
+
+        log = function_name + ': hfr=' + str(hfr) + ', fwhm=' + str(fwhm) + \
+            ', stars=' + str(len(stars))
+        logging.debug(log)
+
+
+
+class HistogramMonitor(QObject):
+    """Histogram Monitor
+
+    Gets background level and clipping of every channel from frames of the frame tap. Frames
+    are subsampled with a stride chosen for a fixed number of samples, so the cost does not
+    depend on the resolution.
+    """
 
-        shutter_speed = self.source.get_property('shutter-speed')
-        if shutter_speed < 100:
-            shutter_speed = 100
-            self.__capturing_shutter_speed = '1/10000'
-        elif shutter_speed < 111:
-            shutter_speed = 111
-            self.__capturing_shutter_speed = '1/9000'
-        elif shutter_speed < 125:
-            shutter_speed = 125
-            self.__capturing_shutter_speed = '1/8000'
-        elif shutter_speed < 143:
-            shutter_speed = 143
-            self.__capturing_shutter_speed = '1/7000'
-        elif shutter_speed < 167:
-            shutter_speed = 167
-            self.__capturing_shutter_speed = '1/6000'
-        elif shutter_speed < 200:
-            shutter_speed = 200
-            self.__capturing_shutter_speed = '1/5000'
-        elif shutter_speed < 250:
-            shutter_speed = 250
-            self.__capturing_shutter_speed = '1/4000'
-        elif shutter_speed < 333:
-            shutter_speed = 333
-            self.__capturing_shutter_speed = '1/3000'
-        elif shutter_speed < 500:
-            shutter_speed = 500
-            self.__capturing_shutter_speed = '1/2000'
-        elif shutter_speed < 1000:
-            shutter_speed = 1000
-            self.__capturing_shutter_speed = '1/1000'
-        elif shutter_speed < 1111:
-            shutter_speed = 1111
-            self.__capturing_shutter_speed = '1/900'
-        elif shutter_speed < 1250:
-            shutter_speed = 1250
-            self.__capturing_shutter_speed = '1/800'
-        elif shutter_speed < 1429:
-            shutter_speed = 1429
-            self.__capturing_shutter_speed = '1/700'
-        elif shutter_speed < 1667:
-            shutter_speed = 1667
-            self.__capturing_shutter_speed = '1/600'
-        elif shutter_speed < 2000:
-            shutter_speed = 2000
-            self.__capturing_shutter_speed = '1/500'
-        elif shutter_speed < 2500:
-            shutter_speed = 2500
-            self.__capturing_shutter_speed = '1/400'
-        elif shutter_speed < 3333:
-            shutter_speed = 3333
-            self.__capturing_shutter_speed = '1/300'
-        elif shutter_speed < 5000:
-            shutter_speed = 5000
-            self.__capturing_shutter_speed = '1/200'
-        elif shutter_speed < 10000:
-            shutter_speed = 10000
-            self.__capturing_shutter_speed = '1/100'
-        elif shutter_speed < 11111:
-            shutter_speed = 11111
-            self.__capturing_shutter_speed = '1/90'
-        elif shutter_speed < 12500:
-            shutter_speed = 12500
-            self.__capturing_shutter_speed = '1/80'
-        elif shutter_speed < 14286:
-            shutter_speed = 14286
-            self.__capturing_shutter_speed = '1/70'
-        elif shutter_speed < 16667:
-            shutter_speed = 16667
-            self.__capturing_shutter_speed = '1/60'
-        elif shutter_speed < 20000:
-            shutter_speed = 20000
-            self.__capturing_shutter_speed = '1/50'
-        elif shutter_speed < 25000:
-            shutter_speed = 25000
-            self.__capturing_shutter_speed = '1/40'
-        elif shutter_speed < 33333:
-            shutter_speed = 33333
-            self.__capturing_shutter_speed = '1/30'
-        elif shutter_speed < 50000:
-            shutter_speed = 50000
-            self.__capturing_shutter_speed = '1/20'
-        elif shutter_speed < 100000:
-            shutter_speed = 100000
-            self.__capturing_shutter_speed = '1/10'
-        elif shutter_speed < 111111:
-            shutter_speed = 111111
-            self.__capturing_shutter_speed = '1/9'
-            if self.parameters['photo_camera']:
-                self.__pipeline.set_state(Gst.State.NULL)
-                self.__pipeline.set_state(Gst.State.PLAYING)
-        elif shutter_speed < 125000:
-            shutter_speed = 125000
-            self.__capturing_shutter_speed = '1/8'
-        elif shutter_speed < 142857:
-            shutter_speed = 142857
-            self.__capturing_shutter_speed = '1/7'
-        elif shutter_speed < 166667:
-            shutter_speed = 166667
-            self.__capturing_shutter_speed = '1/6'
-        elif shutter_speed < 200000:
-            shutter_speed = 200000
-            self.__capturing_shutter_speed = '1/5'
-        elif shutter_speed < 250000:
-            shutter_speed = 250000
-            self.__capturing_shutter_speed = '1/4'
-        elif shutter_speed < 333333:
-            shutter_speed = 333333
-            self.__capturing_shutter_speed = '1/3'
-        elif shutter_speed < 500000:
-            shutter_speed = 500000
-            self.__capturing_shutter_speed = '1/2'
-        elif shutter_speed < 1000000:
-            shutter_speed = 1000000
-            self.__capturing_shutter_speed = '1/1'
-        elif shutter_speed < 22000000:
-            shutter_speed = shutter_speed + 1000000
-            self.__capturing_shutter_speed = \
-                str(int(shutter_speed/1000000)) + '/1'
-            if shutter_speed in (2000000, 7000000) and self.parameters['photo_camera']:
-                self.__pipeline.set_state(Gst.State.NULL)
-                self.__pipeline.set_state(Gst.State.PLAYING)
-        else:
-            self.control_exposure_shutter_speed_button_up.setEnabled(False)
+    updated = pyqtSignal(list, list, list)
 
-        log = function_name + ': shutter_speed=' + str(shutter_speed)
+
+    def __init__(self, samples=65536):
+        """Initializes Histogram Monitor
+
+        Args:
+            samples (int, optional): number of pixels sampled from a frame. Defaults to 65536.
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': samples=' + str(samples)
         logging.info(log)
 
-        self.source.set_property('shutter-speed', shutter_speed)
-        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
-        self.control_exposure_shutter_speed_label.setText(
-            self.__capturing_shutter_speed + '"')
-        self.__panel_control_stream_info_label_set_text()
-        self.control_exposure_shutter_speed_button_down.setEnabled(True)
+        self.__samples = samples
+        self.__offsets = np.array([0, 256, 512], dtype=np.uint16)
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_exposure_shutter_speed_button_down_clicked(self):
-        """Handles decrease of shutter speed
+    def histogram(self, frame_format, planes):
+        """Gets histograms of the channels of subsampled frame
+
+        Args:
+            frame_format (str): format of the frame
+            planes (list): planes of the frame
+
+        Returns:
+            numpy.ndarray: 3 x 256 counts of the red, green and blue values
+        """
+
+        height, width = planes[0].shape[:2]
+        step = max(1, int(np.sqrt(width*height/self.__samples)))
+        if frame_format in ('I420', 'YV12'):
+            # chroma is sampled at the same points as luma
+            step = max(2, step//2*2)
+            luma = planes[0][::step, ::step]
+            planes = [luma] + [
+                plane[::step//2, ::step//2][:luma.shape[0], :luma.shape[1]]
+                for plane in planes[1:]]
+        else:
+            planes = [plane[::step, ::step] for plane in planes]
+        image = frame_to_rgb(frame_format, planes)
+        return np.bincount(
+            (image + self.__offsets).ravel(), minlength=768).reshape(3, 256)
+
+
+    def on_frame(self, frame):
+        """Measures the frame, called from the tap thread
+
+        Args:
+            frame (Frame): mapped frame
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': pts=' + str(frame.pts)
+        logging.debug(log)
+
+        counts = self.histogram(frame.format, frame.planes)
+        total = counts[0].sum()
+        cumulative = np.cumsum(counts, axis=1)
+        backgrounds = [int(np.searchsorted(channel, total/2)) for channel in cumulative]
+        saturated = (counts[:, 255]*100/total).tolist()
+        black = (counts[:, 0]*100/total).tolist()
+        self.updated.emit(backgrounds, saturated, black)
+
+        log = function_name + ': backgrounds=' + str(backgrounds) + \
+            ', saturated=' + str(saturated) + ', black=' + str(black)
+        logging.debug(log)
+
+
+
+class AutoExposure(QObject):
+    """Auto Exposure
+
+    Solves shutter speed and analog gain which bring the sky background to the target level
+    while keeping stars below saturation. Levels above the black level scale with the
+    product of shutter speed and gain, so every test frame gives the correction directly.
+    """
+
+    MIN_SHUTTER_SPEED = 100
+    MIN_ANALOG_GAIN = 256
+    MAX_ANALOG_GAIN = 4096
+
+    solved = pyqtSignal(int, int, bool)
+
+
+    def __init__(self, background=40, peak=240, black=16, max_shutter_speed=10000000,
+        trials=3, quantile=0.9999):
+        """Initializes Auto Exposure
+
+        Args:
+            background (int, optional): target level of the background. Defaults to 40.
+            peak (int, optional): highest level of stars. Defaults to 240.
+            black (int, optional): black level. Defaults to 16.
+            max_shutter_speed (int, optional): longest shutter speed in microseconds, gain
+                is raised beyond it. Defaults to 10000000.
+            trials (int, optional): highest number of test frames. Defaults to 3.
+            quantile (float, optional): quantile of levels taken as the peak of stars.
+                Defaults to 0.9999.
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': background=' + str(background) + ', peak=' + str(peak) + \
+            ', black=' + str(black) + ', max_shutter_speed=' + str(max_shutter_speed) + \
+            ', trials=' + str(trials)
+        logging.info(log)
+
+        self.__background = background
+        self.__peak = peak
+        self.__black = black
+        self.__max_shutter_speed = max_shutter_speed
+        self.__trials = trials
+        self.__quantile = quantile
+        self.__lock = threading.Lock()
+        self.__shutter_speed = 0
+        self.__analog_gain = 0
+        self.__skip = 0
+        self.trial = 0
+        self.active = False
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def start(self, shutter_speed, analog_gain, skip=2):
+        """Starts measuring test frames from the first trial
+
+        Args:
+            shutter_speed (int): shutter speed of the test frames in microseconds
+            analog_gain (int): analog gain of the test frames
+            skip (int, optional): number of frames captured with previous settings.
+                Defaults to 2.
+        """
+
+        with self.__lock:
+            self.trial = 0
+        self.resume(shutter_speed, analog_gain, skip)
+
+
+    def resume(self, shutter_speed, analog_gain, skip=2):
+        """Resumes measuring test frames with settings of the next trial
+
+        Args:
+            shutter_speed (int): shutter speed of the test frames in microseconds
+            analog_gain (int): analog gain of the test frames
+            skip (int, optional): number of frames captured with previous settings.
+                Defaults to 2.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shutter_speed=' + str(shutter_speed) + \
+            ', analog_gain=' + str(analog_gain) + ', skip=' + str(skip)
+        logging.info(log)
+
+        with self.__lock:
+            self.__shutter_speed = shutter_speed
+            self.__analog_gain = analog_gain
+            self.__skip = skip
+            self.active = True
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def stop(self):
+        """Stops measuring test frames
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        with self.__lock:
+            self.active = False
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def solve(self, shutter_speed, analog_gain, background, peak):
+        """Solves exposure from levels of the test frame
+
+        Args:
+            shutter_speed (int): shutter speed of the test frame in microseconds
+            analog_gain (int): analog gain of the test frame
+            background (int): median level of the test frame
+            peak (int): level of stars of the test frame
+
+        Returns:
+            tuple: shutter speed, analog gain and True if the test frame was already close
+                to the solution
+        """
+
+        level = background - self.__black
+        if level < 2:
+            # background is lost in the black level and only its upper bound is known
+            factor = 8.0
+        else:
+            factor = (self.__background - self.__black)/level
+        if peak >= 250:
+            factor = min(factor, 0.5)
+        else:
+            factor = min(factor, (self.__peak - self.__black)/max(peak - self.__black, 1))
+        exposure = shutter_speed*analog_gain*factor
+        shutter_speed = min(
+            max(exposure/AutoExposure.MIN_ANALOG_GAIN, AutoExposure.MIN_SHUTTER_SPEED),
+            self.__max_shutter_speed)
+        # gain follows the steps of the ISO buttons and shutter speed compensates rounding
+        analog_gain = min(max(
+            int(np.ceil(exposure/shutter_speed/256))*256, AutoExposure.MIN_ANALOG_GAIN),
+            AutoExposure.MAX_ANALOG_GAIN)
+        shutter_speed = int(min(max(
+            exposure/analog_gain, AutoExposure.MIN_SHUTTER_SPEED), self.__max_shutter_speed))
+        return shutter_speed, analog_gain, 0.8 <= factor <= 1.25
+
+
+    def on_frame(self, frame):
+        """Measures test frame and solves exposure, called from the tap thread
+
+        Args:
+            frame (Frame): mapped frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': pts=' + str(frame.pts)
+        logging.debug(log)
+
+        with self.__lock:
+            if not self.active:
+                return
+            if self.__skip > 0:
+                self.__skip = self.__skip - 1
+                return
+            counts = np.cumsum(np.bincount(np.ravel(frame.luminance()), minlength=256))
+            background = int(np.searchsorted(counts, counts[-1]/2))
+            peak = int(np.searchsorted(counts, counts[-1]*self.__quantile))
+            shutter_speed, analog_gain, converged = self.solve(
+                self.__shutter_speed, self.__analog_gain, background, peak)
+            self.trial = self.trial + 1
+            done = converged or self.trial >= self.__trials
+            # settings of the next test frame are applied by the main thread
+            self.active = False
+
+        self.solved.emit(shutter_speed, analog_gain, done)
+
+        log = function_name + ': background=' + str(background) + ', peak=' + str(peak) + \
+            ', shutter_speed=' + str(shutter_speed) + ', analog_gain=' + str(analog_gain) + \
+            ', done=' + str(done)
+        logging.info(log)
+
+
+
+class ProcessingExecutor:
+    """Processing Executor
+
+    Splits images into horizontal tiles and processes them in a pool of worker processes
+    running functions of the tiles module. The pool is served by the tiles module started as a
+    separate program, so the workers never import the user interface. Pixel data is never
+    pickled: workers attach to the source and destination arrays through shared memory blocks
+    or memory-mapped files described by name, shape and type.
+    Workers run with lower priority so that the camera preview stays responsive.
+    """
+
+
+    def __init__(self, processes=3, niceness=10):
+        """Initializes Processing Executor
+
+        Args:
+            processes (int, optional): number of worker processes. Defaults to 3.
+            niceness (int, optional): niceness of worker processes. Defaults to 10.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': processes=' + str(processes) + ', niceness=' + str(niceness)
+        logging.info(log)
+
+        self.__processes = processes
+        self.__niceness = niceness
+        self.__lock = threading.Lock()
+        self.__pool = None
+        self.__server = None
+        self.__directory = None
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __get_pool(self):
+        """Gets pool of worker processes creating it on first use
+
+        Returns:
+            multiprocessing.managers.PoolProxy: proxy of the pool of worker processes
+        """
+
+        with self.__lock:
+            if self.__pool is None:
+                # fork is not safe with Qt and GStreamer threads running in the parent and
+                # workers spawned from here would re-import the main module, loading Qt,
+                # GStreamer and the camera, so the pool runs in a server started from the
+                # tiles module
+                self.__directory = tempfile.mkdtemp()
+                address = path.join(self.__directory, 'tiles')
+                authkey = os.urandom(32)
+                self.__server = subprocess.Popen( # pylint: disable=consider-using-with
+                    [sys.executable, path.join(path.dirname(path.abspath(__file__)), 'tiles.py'),
+                    address], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    env=dict(os.environ, ASTROBERRY_TILES_AUTHKEY=authkey.hex()),
+                    start_new_session=True)
+                if not self.__server.stdout.readline():
+                    self.__server.wait()
+                    shutil.rmtree(self.__directory, ignore_errors=True)
+                    raise RuntimeError('Failed to start the tiles server')
+                manager = SyncManager(address, authkey)
+                manager.connect() # pylint: disable=no-member
+                self.__pool = manager.Pool(self.__processes, os.nice, (self.__niceness,))
+            return self.__pool
+
+
+    @staticmethod
+    def shared_array(shape, dtype):
+        """Allocates array in a shared memory block
+
+        Args:
+            shape (tuple): shape of the array
+            dtype (numpy.dtype): type of the array
+
+        Returns:
+            tuple: shared memory block, array and its descriptor
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(shape) + ', dtype=' + str(dtype)
+        logging.info(log)
+
+        dtype = np.dtype(dtype)
+        memory = shared_memory.SharedMemory(
+            create=True, size=max(int(np.prod(shape))*dtype.itemsize, 1))
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        descriptor = ('shm', memory.name, tuple(shape), dtype.str)
+
+        log = function_name + ': name=' + memory.name
+        logging.info(log)
+
+        return memory, array, descriptor
+
+
+    @staticmethod
+    def file_array(file, shape, dtype):
+        """Describes array stored in a memory-mapped file
+
+        Args:
+            file (str): path of the file
+            shape (tuple): shape of the array
+            dtype (numpy.dtype): type of the array
+
+        Returns:
+            tuple: descriptor of the array
+        """
+
+        return ('file', file, tuple(shape), np.dtype(dtype).str)
+
+
+    def map_tiles(self, function, source, destination, rows, arguments=(), progress=None,
+        cancelled=None):
+        """Processes source array in tiles of rows in the pool of worker processes
+
+        Args:
+            function (function): function of the tiles module called as function(source,
+                destination, start, end, *arguments) in the worker process
+            source (tuple): descriptor of the source array
+            destination (tuple): descriptor of the destination array
+            rows (int): number of rows per tile
+            arguments (tuple, optional): additional arguments. Defaults to ().
+            progress (method, optional): called with number of processed and total rows.
+                Defaults to None.
+            cancelled (threading.Event, optional): cancels processing when set.
+                Defaults to None.
+
+        Returns:
+            bool: True if all tiles were processed, False if processing was cancelled
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        height = destination[2][0]
+
+        log = function_name + ': function=' + function.__name__ + ', height=' + \
+            str(height) + ', rows=' + str(rows)
+        logging.info(log)
+
+        rows = max(1, rows)
+        tasks = [
+            (function, source, destination, start, min(start + rows, height), arguments)
+            for start in range(0, height, rows)]
+        done = 0
+        result = True
+        pool = self.__get_pool()
+        # the pool is shared by several threads, so cancelling only stops submitting tiles
+        # of this call: tiles in flight are waited for as they may use the caller's buffers
+        pending = collections.deque(tasks)
+        running = collections.deque()
+        error = None
+        while True:
+            while pending and len(running) < self.__processes and result and error is None:
+                running.append(pool.apply_async(process_tile, (pending.popleft(),)))
+            if not running:
+                break
+            try:
+                processed = running.popleft().get()
+            except Exception as exception: # pylint: disable=broad-except
+                error = exception
+                continue
+            done = done + processed
+            if progress is not None:
+                progress(done, height)
+            if cancelled is not None and cancelled.is_set():
+                result = False
+        if error is not None:
+            raise error
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    def shutdown(self):
+        """Terminates worker processes
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.terminate()
+                self.__pool.join()
+                self.__pool = None
+                self.__server.stdin.close()
+                self.__server.wait()
+                shutil.rmtree(self.__directory, ignore_errors=True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class BayerDecoder:
+    """Bayer Decoder
+
+    Extracts 12-bit Bayer data the HQ camera appends to JPEG files captured with
+    bayer=True and develops it with bilinear or Malvar-He-Cutler interpolation in the pool of
+    worker processes.
+    """
+
+    RAW_SIZE = 18711040
+    HEADER_SIZE = 32768
+    WIDTH = 4056
+    HEIGHT = 3040
+    STRIDE = 6112
+
+    @staticmethod
+    def contains(file):
+        """Checks if Bayer data is appended to the JPEG file
+
+        Args:
+            file (str): path of the image file
+
+        Returns:
+            bool: True if the file contains Bayer data, False otherwise
+        """
+
+        if os.stat(file).st_size <= BayerDecoder.RAW_SIZE:
+            return False
+        with open(file, 'rb') as image:
+            image.seek(-BayerDecoder.RAW_SIZE, os.SEEK_END)
+            return image.read(4) == b'BRCM'
+
+
+    @staticmethod
+    def read(file):
+        """Reads Bayer data appended to the JPEG file
+
+        Args:
+            file (str): path of the image file
+
+        Returns:
+            numpy.ndarray: 12-bit Bayer mosaic or None if the file has no Bayer data
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        result = None
+        if BayerDecoder.contains(file):
+            with open(file, 'rb') as image:
+                image.seek(-BayerDecoder.RAW_SIZE, os.SEEK_END)
+                result = BayerDecoder.unpack(image.read())
+
+        log = function_name + ': result=' + str(result is not None)
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def unpack(block):
+        """Unpacks 12-bit packed Bayer data
+
+        Every 3 bytes hold 2 pixels: upper 8 bits of each pixel followed by a byte with
+        their lower 4 bits.
+
+        Args:
+            block (bytes): raw block including BRCM header
+
+        Returns:
+            numpy.ndarray: 12-bit Bayer mosaic
+        """
+
+        data = np.frombuffer(block, dtype=np.uint8, offset=BayerDecoder.HEADER_SIZE)
+        data = data.reshape(-1, BayerDecoder.STRIDE)[
+            :BayerDecoder.HEIGHT, :BayerDecoder.WIDTH*3//2].reshape(
+            BayerDecoder.HEIGHT, BayerDecoder.WIDTH//2, 3)
+        result = np.empty((BayerDecoder.HEIGHT, BayerDecoder.WIDTH), dtype=np.uint16)
+        low = data[:, :, 2]
+        np.left_shift(data[:, :, 0], 4, out=result[:, 0::2], dtype=np.uint16)
+        np.left_shift(data[:, :, 1], 4, out=result[:, 1::2], dtype=np.uint16)
+        result[:, 0::2] |= low & 0x0F
+        result[:, 1::2] |= low >> 4
+        return result
+
+
+    @staticmethod
+    def develop(file, destination, order, method, executor, rows, hot_pixels=None):
+        """Demosaics Bayer data of the image file into a memory-mapped file
+
+        Args:
+            file (str): path of the image file
+            destination (str): path of the memory-mapped file for 12-bit RGB data
+            order (str): colours of the top-left 2x2 block
+            method (str): bilinear or malvar
+            executor (ProcessingExecutor): processing executor
+            rows (int): number of rows per tile
+            hot_pixels (HotPixelMap, optional): hot pixel map whose map of the sensor is
+                corrected in the mosaic before demosaicing. Defaults to None.
+
+        Returns:
+            numpy.memmap: 12-bit RGB image or None if the file has no Bayer data
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', method=' + method
+        logging.info(log)
+
+        mosaic = BayerDecoder.read(file)
+        result = None
+        if mosaic is not None:
+            memory, source, source_descriptor = ProcessingExecutor.shared_array(
+                mosaic.shape, np.uint16)
+            source[:] = mosaic
+            mosaic = None
+            if hot_pixels is not None:
+                hot_pixels.correct(source, 2, True)
+            shape = source.shape + (3,)
+            os.makedirs(path.dirname(destination), exist_ok=True)
+            np.memmap(destination, dtype=np.uint16, mode='w+', shape=shape).flush()
+            executor.map_tiles(
+                demosaic_tile, source_descriptor,
+                ProcessingExecutor.file_array(destination, shape, np.uint16), rows,
+                (order, method))
+            del source
+            memory.close()
+            memory.unlink()
+            result = np.memmap(destination, dtype=np.uint16, mode='r', shape=shape)
+
+        log = function_name + ': result=' + str(result is not None)
+        logging.info(log)
+
+        return result
+
+
+
+class FrameStore:
+    """Frame Store
+
+    Stores frames of the same shape in a numpy.memmap file so that multi-frame operations
+    can process them in horizontal strips with bounded memory. Frames are written one
+    after another and every strip is read frame by frame, so access to the storage stays
+    sequential within each frame. Pages are released once a frame or strip is done.
+    """
+
+
+    def __init__(self, file, shape, capacity, dtype=np.uint8):
+        """Initializes Frame Store
+
+        Args:
+            file (str): path of the backing file
+            shape (tuple): shape of a frame
+            capacity (int): maximum number of frames
+            dtype (numpy.dtype, optional): type of the pixels. Defaults to numpy.uint8.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', shape=' + str(shape) + ', capacity=' + \
+            str(capacity)
+        logging.info(log)
+
+        os.makedirs(path.dirname(file), exist_ok=True)
+        self.__file = file
+        self.frames = np.memmap(file, dtype=dtype, mode='w+', shape=(capacity,) + tuple(shape))
+        self.count = 0
+        self.__row_size = self.frames[0, 0].nbytes
+        self.__frame_size = self.frames[0].nbytes
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __release(self, frames, start, end):
+        """Releases pages of the given rows of the given frames
+
+        Args:
+            frames (range): frames
+            start (int): first row
+            end (int): row after the last row
+        """
+
+        if not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        for frame in frames:
+            offset = frame*self.__frame_size + start*self.__row_size
+            aligned = offset - offset % mmap.PAGESIZE
+            length = (end - start)*self.__row_size + offset - aligned
+            # pylint: disable=protected-access
+            self.frames._mmap.madvise(mmap.MADV_DONTNEED, aligned, length)
+
+
+    def append(self, frame):
+        """Appends frame
+
+        Args:
+            frame (numpy.ndarray): frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': count=' + str(self.count)
+        logging.info(log)
+
+        self.frames[self.count] = frame
+        self.frames.flush()
+        self.__release(range(self.count, self.count + 1), 0, self.frames.shape[1])
+        self.count = self.count + 1
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def strips(self, budget, overhead=20):
+        """Iterates over horizontal strips of all stored frames
+
+        Args:
+            budget (int): memory budget in bytes
+            overhead (int, optional): working memory in bytes needed per pixel component
+                of a strip on top of the stored frames. Defaults to 20.
+
+        Yields:
+            tuple: first row, row after the last row and frames of the strip
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        components = self.__row_size//self.frames.itemsize
+        rows = max(1, budget//(components*(self.count*self.frames.itemsize + overhead)))
+
+        log = function_name + ': budget=' + str(budget) + ', rows=' + str(rows)
+        logging.info(log)
+
+        for start in range(0, self.frames.shape[1], rows):
+            end = min(start + rows, self.frames.shape[1])
+            yield start, end, self.frames[:self.count, start:end]
+            self.__release(range(self.count), start, end)
+
+
+    def descriptor(self):
+        """Describes stored frames for the worker processes
+
+        Returns:
+            tuple: descriptor of the stored frames
+        """
+
+        self.frames.flush()
+        return ProcessingExecutor.file_array(self.__file, self.frames.shape, self.frames.dtype)
+
+
+    def close(self):
+        """Closes and removes the backing file
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + self.__file
+        logging.info(log)
+
+        self.frames = None
+        os.remove(self.__file)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class FrameRegistration:
+    """Frame Registration
+
+    Aligns images of a sequence with the reference image. Stars are detected on the
+    luminance plane decoded at reduced resolution, matched with similar triangles and the
+    rotation and translation are solved with least squares. Phase correlation is used as
+    a fallback when there are not enough stars. Stars and transforms are cached per image
+    file.
+    """
+
+
+    def __init__(self, media, scale=4, stars=40):
+        """Initializes Frame Registration
+
+        Args:
+            media (str): media folder
+            scale (int, optional): downsampling factor of the luminance plane.
+                Defaults to 4.
+            stars (int, optional): maximum number of stars detected per image.
+                Defaults to 40.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': media=' + media + ', scale=' + str(scale) + \
+            ', stars=' + str(stars)
+        logging.info(log)
+
+        self.__media = media
+        self.__scale = scale
+        self.__stars = stars
+        self.__cache = media + '.cache/'
+        os.makedirs(self.__cache, exist_ok=True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __file(self, index):
+        """Gets path of the image file
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            str: path of the image file
+        """
+
+        return image_file(self.__media, index)
+
+
+    def __read_cache(self, index):
+        """Reads cache entry of the image file
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            dict: cache entry, empty if the image file changed since it was cached
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        stat = os.stat(self.__file(index))
+        try:
+            with open(self.__cache + 'DSCF' + str(index).zfill(4) + '.json', 'r',
+                encoding='utf-8') as cache:
+                result = json.load(cache)
+            if result.get('mtime') != stat.st_mtime or result.get('size') != stat.st_size:
+                result = {}
+        except (FileNotFoundError, ValueError):
+            result = {}
+        if len(result) == 0:
+            result = {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+        log = function_name + ': result=' + str(result.keys())
+        logging.info(log)
+
+        return result
+
+
+    def __write_cache(self, index, entry):
+        """Writes cache entry of the image file
+
+        Args:
+            index (int): index of the image file
+            entry (dict): cache entry
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        with open(self.__cache + 'DSCF' + str(index).zfill(4) + '.json', 'w',
+            encoding='utf-8') as cache:
+            cache.write(json.dumps(entry))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __luminance(self, index):
+        """Decodes luminance plane of the image file at reduced resolution
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            tuple: luminance plane and its downsampling factor
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        with PIL.Image.open(self.__file(index)) as image:
+            width = image.width
+            image.draft('L', (image.width//self.__scale, image.height//self.__scale))
+            luminance = np.asarray(image.convert('L'), dtype=np.float32)
+        scale = width/luminance.shape[1]
+
+        log = function_name + ': shape=' + str(luminance.shape) + ', scale=' + str(scale)
+        logging.info(log)
+
+        return luminance, scale
+
+
+    @staticmethod
+    def detect(luminance, count):
+        """Detects stars as local maxima above the noise and measures their centroids
+
+        Args:
+            luminance (numpy.ndarray): luminance plane
+            count (int): maximum number of stars
+
+        Returns:
+            numpy.ndarray: x, y and flux of the brightest stars
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(luminance.shape) + ', count=' + str(count)
+        logging.info(log)
+
+        sample = luminance[::4, ::4]
+        background = np.median(sample)
+        noise = max(1.4826*np.median(np.abs(sample - background)), 1.0)
+        height, width = luminance.shape
+
+        core = luminance[2:-2, 2:-2]
+        peaks = core > background + 5*noise
+        for y in (-1, 0, 1):
+            for x in (-1, 0, 1):
+                if (y, x) == (0, 0):
+                    continue
+                neighbour = luminance[2 + y:height - 2 + y, 2 + x:width - 2 + x]
+                # ties on plateaus are resolved in favour of the first pixel in raster order
+                if (y, x) < (0, 0):
+                    peaks &= core > neighbour
+                else:
+                    peaks &= core >= neighbour
+        ys, xs = np.nonzero(peaks)
+        ys = ys + 2
+        xs = xs + 2
+
+        offset_y, offset_x = np.mgrid[-2:3, -2:3]
+        patches = luminance[ys[:, None, None] + offset_y, xs[:, None, None] + offset_x]
+        patches = np.clip(patches - background, 0, None)
+        flux = patches.sum(axis=(1, 2))
+        order = np.argsort(flux)[::-1][:count]
+        patches = patches[order]
+        flux = flux[order]
+        result = np.empty((len(order), 3), dtype=np.float64)
+        result[:, 0] = xs[order] + (patches*offset_x).sum(axis=(1, 2))/flux
+        result[:, 1] = ys[order] + (patches*offset_y).sum(axis=(1, 2))/flux
+        result[:, 2] = flux
+
+        log = function_name + ': stars=' + str(len(result))
+        logging.info(log)
+
+        return result
+
+
+    def stars(self, index):
+        """Gets stars of the image file in full resolution coordinates
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            numpy.ndarray: x, y and flux of the brightest stars
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        entry = self.__read_cache(index)
+        if 'stars' not in entry:
+            luminance, scale = self.__luminance(index)
+            stars = FrameRegistration.detect(luminance, self.__stars)
+            stars[:, 0:2] = (stars[:, 0:2] + 0.5)*scale - 0.5
+            entry['stars'] = stars.tolist()
+            self.__write_cache(index, entry)
+        result = np.array(entry['stars'], dtype=np.float64).reshape(-1, 3)
+
+        log = function_name + ': stars=' + str(len(result))
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def __triangles(stars):
+        """Builds triangles of the stars with their scale invariant descriptors
+
+        Args:
+            stars (numpy.ndarray): star coordinates
+
+        Returns:
+            tuple: vertices ordered by the length of the opposite side and descriptors
+        """
+
+        count = len(stars)
+        i, j, k = np.array(
+            [(i, j, k) for i in range(count) for j in range(i + 1, count)
+            for k in range(j + 1, count)], dtype=np.intp).reshape(-1, 3).T
+        vertices = np.stack((i, j, k), axis=1)
+        # length of the side opposite to each vertex
+        sides = np.stack((
+            np.hypot(*(stars[j] - stars[k]).T),
+            np.hypot(*(stars[k] - stars[i]).T),
+            np.hypot(*(stars[i] - stars[j]).T)), axis=1)
+        order = np.argsort(sides, axis=1)
+        vertices = np.take_along_axis(vertices, order, axis=1)
+        sides = np.take_along_axis(sides, order, axis=1)
+        descriptors = sides[:, 0:2]/np.maximum(sides[:, 2:3], 1e-9)
+
+        return vertices, descriptors
+
+
+    @staticmethod
+    def fit(source, target):
+        """Fits rotation and translation mapping source points onto target points
+
+        Args:
+            source (numpy.ndarray): source points
+            target (numpy.ndarray): target points
+
+        Returns:
+            tuple: angle in radians, x and y translation
+        """
+
+        source_center = source.mean(axis=0)
+        target_center = target.mean(axis=0)
+        source = source - source_center
+        target = target - target_center
+        angle = math.atan2(
+            np.sum(source[:, 0]*target[:, 1] - source[:, 1]*target[:, 0]),
+            np.sum(source[:, 0]*target[:, 0] + source[:, 1]*target[:, 1]))
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+        x = target_center[0] - (cos*source_center[0] - sin*source_center[1])
+        y = target_center[1] - (sin*source_center[0] + cos*source_center[1])
+
+        return angle, x, y
+
+
+    @staticmethod
+    def match(reference, stars, tolerance=3.0):
+        """Matches stars with the reference stars using similar triangles
+
+        Args:
+            reference (numpy.ndarray): reference stars
+            stars (numpy.ndarray): stars
+            tolerance (float, optional): maximum residual in pixels. Defaults to 3.0.
+
+        Returns:
+            tuple: angle in radians, x and y translation or None if stars do not match
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': reference=' + str(len(reference)) + ', stars=' + \
+            str(len(stars))
+        logging.info(log)
+
+        reference = reference[:15, 0:2]
+        stars = stars[:15, 0:2]
+        if len(reference) < 3 or len(stars) < 3:
+            log = function_name + ': result=None'
+            logging.info(log)
+            return None
+
+        reference_vertices, reference_descriptors = \
+            FrameRegistration.__triangles(reference)
+        vertices, descriptors = FrameRegistration.__triangles(stars)
+        distances = np.hypot(
+            descriptors[:, None, 0] - reference_descriptors[None, :, 0],
+            descriptors[:, None, 1] - reference_descriptors[None, :, 1])
+        nearest = np.argmin(distances, axis=1)
+        similar = distances[np.arange(len(nearest)), nearest] < 0.01
+
+        votes = np.zeros((len(stars), len(reference)), dtype=np.int32)
+        np.add.at(
+            votes, (vertices[similar].ravel(), reference_vertices[nearest[similar]].ravel()), 1)
+        candidates = np.argmax(votes, axis=1)
+        pairs = np.nonzero(votes[np.arange(len(stars)), candidates] > 1)[0]
+
+        result = None
+        if len(pairs) >= 2:
+            source = stars[pairs]
+            target = reference[candidates[pairs]]
+            for _ in range(3):
+                result = FrameRegistration.fit(source, target)
+                cos = math.cos(result[0])
+                sin = math.sin(result[0])
+                projected = np.stack((
+                    cos*source[:, 0] - sin*source[:, 1] + result[1],
+                    sin*source[:, 0] + cos*source[:, 1] + result[2]), axis=1)
+                inliers = np.hypot(*(projected - target).T) < tolerance
+                if np.all(inliers):
+                    break
+                if np.count_nonzero(inliers) < 2:
+                    result = None
+                    break
+                source = source[inliers]
+                target = target[inliers]
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def phase_correlation(reference, luminance):
+        """Estimates translation between two luminance planes with phase correlation
+
+        Args:
+            reference (numpy.ndarray): reference luminance plane
+            luminance (numpy.ndarray): luminance plane
+
+        Returns:
+            tuple: x and y translation
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(luminance.shape)
+        logging.info(log)
+
+        window = np.outer(
+            np.hanning(luminance.shape[0]), np.hanning(luminance.shape[1])).astype(np.float32)
+        spectrum = np.fft.rfft2((reference - reference.mean())*window) * \
+            np.conj(np.fft.rfft2((luminance - luminance.mean())*window))
+        spectrum /= np.maximum(np.abs(spectrum), 1e-9)
+        correlation = np.fft.irfft2(spectrum, s=luminance.shape)
+        y, x = np.unravel_index(np.argmax(correlation), correlation.shape)
+        if y > luminance.shape[0]//2:
+            y = y - luminance.shape[0]
+        if x > luminance.shape[1]//2:
+            x = x - luminance.shape[1]
+
+        log = function_name + ': x=' + str(x) + ', y=' + str(y)
+        logging.info(log)
+
+        return float(x), float(y)
+
+
+    def solve(self, reference, index):
+        """Solves transform mapping the image onto the reference image
+
+        Args:
+            reference (int): index of the reference image file
+            index (int): index of the image file
+
+        Returns:
+            tuple: angle in radians, x and y translation
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': reference=' + str(reference) + ', index=' + str(index)
+        logging.info(log)
+
+        key = 'DSCF' + str(reference).zfill(4)
+        if reference == index:
+            result = (0.0, 0.0, 0.0)
+        else:
+            entry = self.__read_cache(index)
+            if key in entry.get('transforms', {}):
+                result = tuple(entry['transforms'][key])
+            else:
+                result = FrameRegistration.match(self.stars(reference), self.stars(index))
+                if result is None:
+                    reference_luminance, scale = self.__luminance(reference)
+                    luminance, scale = self.__luminance(index)
+                    x, y = FrameRegistration.phase_correlation(reference_luminance, luminance)
+                    result = (0.0, x*scale, y*scale)
+                entry = self.__read_cache(index)
+                entry.setdefault('transforms', {})[key] = list(result)
+                self.__write_cache(index, entry)
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def apply(image, transform):
+        """Resamples the image into the reference frame with bilinear interpolation
+
+        Args:
+            image (numpy.ndarray): image
+            transform (tuple): angle in radians, x and y translation
+
+        Returns:
+            numpy.ndarray: aligned image
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': transform=' + str(transform)
+        logging.info(log)
+
+        angle, x, y = transform
+        if (angle, x, y) == (0.0, 0.0, 0.0):
+            return image
+        cos = math.cos(angle)
+        sin = math.sin(angle)
+        # PIL maps output coordinates onto input coordinates so inverse transform is used
+        data = (cos, sin, -(cos*x + sin*y), -sin, cos, sin*x - cos*y)
+        size = (image.shape[1], image.shape[0])
+        if image.dtype == np.uint8:
+            result = np.asarray(PIL.Image.fromarray(image).transform(
+                size, PIL.Image.AFFINE, data, resample=PIL.Image.BILINEAR))
+        elif image.ndim == 2:
+            result = np.asarray(PIL.Image.fromarray(image.astype(np.float32), 'F').transform(
+                size, PIL.Image.AFFINE, data, resample=PIL.Image.BILINEAR))
+        else:
+            result = np.stack([
+                np.asarray(PIL.Image.fromarray(
+                    np.ascontiguousarray(image[:, :, channel], dtype=np.float32), 'F').transform(
+                    size, PIL.Image.AFFINE, data, resample=PIL.Image.BILINEAR))
+                for channel in range(image.shape[2])], axis=2)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+        return result
+
+
+
+class StackWorker(QObject):
+    """Stack Worker
+
+    Stacks sequence of images from the media folder outside of the main thread.
+    """
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int)
+
+
+    def __init__(self, parameters, index, executor, excluded=()):
+        """Initializes Stack Worker
+
+        Args:
+            parameters (dict): parameters
+            index (int): index of the last image file of the sequence to be stacked
+            executor (ProcessingExecutor): processing executor
+            excluded (collection, optional): indexes of the image files which are not
+                stacked. Defaults to ().
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        self.__parameters = parameters
+        self.__index = index
+        self.__executor = executor
+        self.__excluded = set(excluded)
+        self.__cancelled = threading.Event()
+        self.__indexes = []
+        self.__transforms = {}
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __load(self, index):
+        """Loads image file, the processed one if it has been saved
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            numpy.ndarray: image
+        """
+
+        with PIL.Image.open(image_file(self.__parameters['media'], index)) as image:
+            result = np.asarray(image.convert('RGB'))
+        if index in self.__transforms:
+            result = FrameRegistration.apply(result, self.__transforms[index])
+        return result
+
+
+    def cancel(self):
+        """Cancels stacking
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__cancelled.set()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def run(self):
+        """Stacks images and saves the result as a next image in the media folder
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__indexes = select_sequence(
+            self.__parameters['media'], self.__index, self.__excluded)
+        if len(self.__indexes) < 2:
+            log = function_name + ': nothing to stack'
+            logging.warning(log)
+            self.finished.emit(-1)
+            return
+
+        method = self.__parameters['stacking_method']
+        budget = self.__parameters['memory_budget']*1024*1024
+        # registration, loading and combining are reported as equal parts
+        total = len(self.__indexes)*3
+        done = 0
+
+        self.__transforms = {}
+        if self.__parameters['registration']:
+            registration = FrameRegistration(self.__parameters['media'])
+            for index in self.__indexes:
+                if self.__cancelled.is_set():
+                    break
+                self.__transforms[index] = registration.solve(self.__indexes[-1], index)
+                done = done + 1
+                self.progress.emit(done, total)
+        done = len(self.__indexes)
+
+        store = None
+        for index in self.__indexes:
+            if self.__cancelled.is_set():
+                break
+            image = self.__load(index)
+            if store is None:
+                store = FrameStore(
+                    self.__parameters['media'] + '.store/stack.frames', image.shape,
+                    len(self.__indexes))
+            store.append(image)
+            image = None
+            done = done + 1
+            self.progress.emit(done, total)
+
+        index = -1
+        if not self.__cancelled.is_set():
+            memory, result, descriptor = ProcessingExecutor.shared_array(
+                store.frames.shape[1:], np.uint8)
+            row_size = result[0].size*(store.count + 24)
+            completed = self.__executor.map_tiles(
+                combine_tile, store.descriptor(), descriptor,
+                budget//(self.__parameters['processes']*row_size),
+                (store.count, method, self.__parameters['stacking_kappa']),
+                lambda rows, height: self.progress.emit(
+                    2*len(self.__indexes) + rows*len(self.__indexes)//height, total),
+                self.__cancelled)
+
+            if completed:
+                with PIL.Image.open(
+                    image_file(self.__parameters['media'], self.__indexes[-1])) as image:
+                    exif = image.info.get('exif', b'')
+
+                index = next_image_index(self.__parameters['media'])
+                PIL.Image.fromarray(result).save(
+                    self.__parameters['media'] + 'DSCF' + str(index).zfill(4) + '.JPG',
+                    quality=100, exif=tag_exif(exif, 'stack'))
+                os.sync()
+            del result
+            memory.close()
+            memory.unlink()
+        if store is not None:
+            store.close()
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        self.finished.emit(index)
+
+
+
+class TimelapseWorker(QObject):
+    """Timelapse Worker
+
+    Streams sequence of images from the media folder through an encoding pipeline outside
+    of the main thread. Images are decoded one at a time at the smallest JPEG scale which
+    still covers the video, and the source queue holds at most two frames.
+    """
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+
+
+    def __init__(self, parameters, index):
+        """Initializes Timelapse Worker
+
+        Args:
+            parameters (dict): parameters
+            index (int): index of the last image file of the sequence
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        self.__parameters = parameters
+        self.__index = index
+        self.__cancelled = threading.Event()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def cancel(self):
+        """Cancels encoding
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__cancelled.set()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __load(self, index, size):
+        """Loads image file reduced by the JPEG decoder, the processed one if it has been saved
+
+        Args:
+            index (int): index of the image file
+            size (tuple): width and height the image may be reduced to
+
+        Returns:
+            numpy.ndarray: image cropped to the width aligned to 4 pixels
+        """
+
+        with PIL.Image.open(image_file(self.__parameters['media'], index)) as image:
+            image.draft('RGB', size)
+            result = np.asarray(image.convert('RGB'))
+        # rows of RGB video frames are aligned to 4 bytes
+        return result[:, :result.shape[1]//4*4]
+
+
+    @staticmethod
+    def __encoder():
+        """Gets encoder of the pipeline, hardware one if available
+
+        Returns:
+            str: encoder and its caps
+        """
+
+        if Gst.ElementFactory.find('v4l2h264enc') is not None:
+            return 'v4l2h264enc ! video/x-h264,level=(string)4'
+        return 'x264enc speed-preset=ultrafast'
+
+
+    def run(self):
+        """Encodes images and saves the video in the media folder
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        indexes = select_sequence(self.__parameters['media'], self.__index)
+        if len(indexes) < 2:
+            log = function_name + ': nothing to encode'
+            logging.warning(log)
+            self.finished.emit('')
+            return
+
+        # pipeline threads inherit niceness of this thread
+        os.setpriority(
+            os.PRIO_PROCESS, threading.get_native_id(), self.__parameters['niceness'])
+        file = self.__parameters['media'] + 'TLPS' + str(indexes[-1]).zfill(4) + '.MP4'
+        with PIL.Image.open(image_file(self.__parameters['media'], indexes[0])) as image:
+            source_width, source_height = image.size
+        width = min(self.__parameters['timelapse_width'], source_width)//2*2
+        height = round(width*source_height/source_width/2)*2
+        image = self.__load(indexes[0], (width, height))
+        framerate = self.__parameters['timelapse_framerate']
+        duration = Gst.SECOND//framerate
+        pipeline = Gst.parse_launch(
+            'appsrc name=source format=time block=true max-bytes=' + str(2*image.nbytes) +
+            ' caps=video/x-raw,format=RGB,width=' + str(image.shape[1]) +
+            ',height=' + str(image.shape[0]) + ',framerate=' + str(framerate) + '/1' +
+            ' ! videoconvert ! videoscale ! video/x-raw,format=I420,width=' + str(width) +
+            ',height=' + str(height) + ' ! ' + self.__encoder() +
+            ' ! h264parse ! mp4mux ! filesink location=' + file)
+        source = pipeline.get_by_name('source')
+        pipeline.set_state(Gst.State.PLAYING)
+
+        flow = Gst.FlowReturn.OK
+        for number, index in enumerate(indexes):
+            if self.__cancelled.is_set():
+                break
+            if number > 0:
+                image = self.__load(index, (width, height))
+            buffer = Gst.Buffer.new_wrapped(image.tobytes())
+            image = None
+            buffer.pts = number*duration
+            buffer.duration = duration
+            flow = source.emit('push-buffer', buffer)
+            if flow != Gst.FlowReturn.OK:
+                break
+            self.progress.emit(number + 1, len(indexes))
+
+        result = ''
+        if not self.__cancelled.is_set() and flow == Gst.FlowReturn.OK:
+            source.emit('end-of-stream')
+            message = pipeline.get_bus().timed_pop_filtered(
+                Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+            if message.type == Gst.MessageType.EOS:
+                result = file
+            else:
+                log = function_name + ': ' + str(message.parse_error()[0])
+                logging.error(log)
+        pipeline.set_state(Gst.State.NULL)
+        if result:
+            os.sync()
+        elif path.exists(file):
+            os.remove(file)
+
+        log = function_name + ': result=' + result
+        logging.info(log)
+
+        self.finished.emit(result)
+
+
+
+class CalibrationLibrary:
+    """Calibration Library
+
+    Records dark, flat and bias frames and builds master frames out of them. Masters are
+    stored as NumPy files keyed by capture settings and sensor temperature and are
+    memory-mapped when applied, so they are not re-loaded on every capture.
+    """
+
+
+    def __init__(self, directory, frames=10, temperature_step=5, budget=64*1024*1024):
+        """Initializes Calibration Library
+
+        Args:
+            directory (str): library directory
+            frames (int, optional): number of frames a master is built from. Defaults to 10.
+            temperature_step (int, optional): temperature bucket size in degrees Celsius.
+                Defaults to 5.
+            budget (int, optional): memory budget in bytes for building masters.
+                Defaults to 64 MiB.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': directory=' + directory + ', frames=' + str(frames) + \
+            ', temperature_step=' + str(temperature_step)
+        logging.info(log)
+
+        self.__directory = directory
+        self.__frames = frames
+        self.__temperature_step = temperature_step
+        self.__budget = budget
+        self.__masters = {}
+        os.makedirs(self.__directory + 'frames/', exist_ok=True)
+        os.makedirs(self.__directory + 'masters/', exist_ok=True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __key(self, kind, metadata, temperature=None):
+        """Gets key of the calibration frames
+
+        Darks depend on all capture settings, bias does not depend on shutter speed and
+        flats depend only on the resolution.
+
+        Args:
+            kind (str): dark, flat or bias
+            metadata (dict): capture metadata
+            temperature (int, optional): temperature bucket. Defaults to bucket of the
+                temperature from metadata.
+
+        Returns:
+            str: key
+        """
+
+        if temperature is None:
+            temperature = int(round(
+                metadata['temperature']/self.__temperature_step)*self.__temperature_step)
+        resolution = str(metadata['width']) + 'x' + str(metadata['height'])
+        if kind == 'dark':
+            result = kind + '_' + resolution + '_' + str(metadata['shutter_speed']) + 'us_' + \
+                str(metadata['analog_gain']) + 'ag_' + str(temperature) + 'C'
+        elif kind == 'bias':
+            result = kind + '_' + resolution + '_' + str(metadata['analog_gain']) + 'ag_' + \
+                str(temperature) + 'C'
+        else:
+            result = kind + '_' + resolution
+
+        return result
+
+
+    def frame_path(self, kind, metadata):
+        """Gets path for a new calibration frame
+
+        Args:
+            kind (str): dark, flat or bias
+            metadata (dict): capture metadata
+
+        Returns:
+            str: path of the calibration frame file
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': kind=' + kind
+        logging.info(log)
+
+        directory = self.__directory + 'frames/' + self.__key(kind, metadata) + '/'
+        os.makedirs(directory, exist_ok=True)
+        result = directory + str(len(os.listdir(directory))).zfill(4) + '.JPG'
+
+        log = function_name + ': result=' + result
+        logging.info(log)
+
+        return result
+
+
+    def add(self, kind, metadata):
+        """Accounts recorded calibration frame and builds the master once enough frames
+        are recorded
+
+        Args:
+            kind (str): dark, flat or bias
+            metadata (dict): capture metadata
+
+        Returns:
+            bool: indicates if master frame was built
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': kind=' + kind
+        logging.info(log)
+
+        key = self.__key(kind, metadata)
+        directory = self.__directory + 'frames/' + key + '/'
+        frames = sorted(glob.glob(directory + '????.JPG'))
+        result = len(frames) >= self.__frames
+        if result:
+            store = None
+            for frame in frames:
+                with PIL.Image.open(frame) as image:
+                    data = np.asarray(image.convert('RGB'))
+                if store is None:
+                    store = FrameStore(self.__directory + 'frames/' + key + '.frames',
+                        data.shape, len(frames))
+                store.append(data)
+            self.__masters.pop(key, None)
+            master = np.lib.format.open_memmap(
+                self.__directory + 'masters/' + key + '.npy', mode='w+', dtype=np.float32,
+                shape=store.frames.shape[1:])
+            bias = None
+            if kind == 'flat':
+                bias = self.master('bias', metadata)
+            for start, end, strip in FrameStacker.combine(store, 'sigma', 3.0, self.__budget):
+                if bias is not None and bias.shape == master.shape:
+                    np.subtract(strip, bias[start:end], out=strip)
+                master[start:end] = strip
+            store.close()
+            if kind == 'flat':
+                mean = np.zeros(master.shape[2], dtype=np.float64)
+                for start in range(0, master.shape[0], 64):
+                    mean += master[start:start + 64].sum(axis=(0, 1))
+                mean = np.maximum(mean/(master.shape[0]*master.shape[1]), 1e-6)
+                for start in range(0, master.shape[0], 64):
+                    strip = master[start:start + 64]
+                    np.divide(strip, mean, out=strip)
+                    np.maximum(strip, 1e-3, out=strip)
+            master.flush()
+            master = None
+            for frame in frames:
+                os.remove(frame)
+            os.rmdir(directory)
+            os.sync()
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    def master(self, kind, metadata):
+        """Gets memory-mapped master frame closest to the temperature from metadata
+
+        Args:
+            kind (str): dark, flat or bias
+            metadata (dict): capture metadata
+
+        Returns:
+            numpy.memmap: master frame or None if there is no matching master frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': kind=' + kind
+        logging.info(log)
+
+        key = self.__key(kind, metadata)
+        if kind != 'flat' and not path.exists(self.__directory + 'masters/' + key + '.npy'):
+            pattern = self.__key(kind, metadata, 0).replace('_0C', '_*C')
+            candidates = glob.glob(self.__directory + 'masters/' + pattern + '.npy')
+            if len(candidates) > 0:
+                key = min(candidates, key=lambda candidate: abs(
+                    int(re.search(r'_(-?\d+)C\.npy$', candidate).group(1)) -
+                    metadata['temperature']))
+                key = path.basename(key)[:-len('.npy')]
+        if key not in self.__masters and \
+            path.exists(self.__directory + 'masters/' + key + '.npy'):
+            self.__masters[key] = np.load(
+                self.__directory + 'masters/' + key + '.npy', mmap_mode='r')
+        result = self.__masters.get(key)
+
+        log = function_name + ': key=' + key + ', result=' + str(result is not None)
+        logging.info(log)
+
+        return result
+
+
+    def calibrate(self, image, metadata, start=0, height=None):
+        """Subtracts dark (or bias) and divides by flat in place
+
+        Args:
+            image (numpy.ndarray): float32 image or strip of rows of the image
+            metadata (dict): capture metadata
+            start (int, optional): first row of the strip. Defaults to 0.
+            height (int, optional): height of the image. Defaults to height of the strip.
+
+        Returns:
+            bool: indicates if any master frame was applied
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': start=' + str(start)
+        logging.info(log)
+
+        if height is None:
+            height = image.shape[0]
+        shape = (height,) + image.shape[1:]
+        end = start + image.shape[0]
+        result = False
+        offset = self.master('dark', metadata)
+        if offset is None:
+            offset = self.master('bias', metadata)
+        if offset is not None and offset.shape == shape:
+            np.subtract(image, offset[start:end], out=image)
+            np.maximum(image, 0, out=image)
+            result = True
+        flat = self.master('flat', metadata)
+        if flat is not None and flat.shape == shape:
+            np.divide(image, flat[start:end], out=image)
+            result = True
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+
+class HotPixelMap:
+    """Hot Pixel Map
+
+    Keeps sparse index of hot pixels learned from master dark frames and replaces them
+    with median of their neighbours. Maps are stored per resolution next to the
+    configuration file. Darks captured at the full sensor resolution without region of
+    interest or binning are registered with the sensor, so they also give a separate sensor
+    map applied to the Bayer mosaic of raw captures, where a hot sensel has not spread into
+    its neighbours yet.
+    """
+
+
+    def __init__(self, directory, sigma=8.0):
+        """Initializes Hot Pixel Map
+
+        Args:
+            directory (str): directory maps are stored in
+            sigma (float, optional): detection threshold in noise standard deviations.
+                Defaults to 8.0.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': directory=' + directory + ', sigma=' + str(sigma)
+        logging.info(log)
+
+        self.__directory = directory
+        self.__sigma = sigma
+        self.__indexes = {}
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __file(self, width, height, sensor=False):
+        """Gets path of the map file
+
+        Args:
+            width (int): image width
+            height (int): image height
+            sensor (bool, optional): True for the map of the sensor. Defaults to False.
+
+        Returns:
+            str: path of the map file
+        """
+
+        return self.__directory + 'hotpixels_' + ('sensor_' if sensor else '') + str(width) + \
+            'x' + str(height) + '.npy'
+
+
+    def learn(self, dark, sensor=False):
+        """Learns hot pixels from master dark frame
+
+        Args:
+            dark (numpy.ndarray): master dark frame
+            sensor (bool, optional): True if the dark is registered with the sensor, which
+                also replaces the map of the sensor. Defaults to False.
+
+        Returns:
+            int: number of hot pixels
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(dark.shape)
+        logging.info(log)
+
+        if dark.ndim == 3:
+            dark = dark.max(axis=2)
+        sample = dark[::4, ::4]
+        median = np.median(sample)
+        noise = max(1.4826*np.median(np.abs(sample - median)), 1.0)
+        index = np.flatnonzero(dark > median + self.__sigma*noise).astype(np.int32)
+        np.save(self.__file(dark.shape[1], dark.shape[0]), index)
+        self.__indexes[(dark.shape[1], dark.shape[0], False)] = index
+        if sensor:
+            np.save(self.__file(dark.shape[1], dark.shape[0], True), index)
+            self.__indexes[(dark.shape[1], dark.shape[0], True)] = index
+
+        log = function_name + ': result=' + str(len(index))
+        logging.info(log)
+
+        return len(index)
+
+
+    def index(self, width, height, sensor=False):
+        """Gets sorted flat indexes of hot pixels
+
+        Args:
+            width (int): image width
+            height (int): image height
+            sensor (bool, optional): True for the map of the sensor. Defaults to False.
+
+        Returns:
+            numpy.ndarray: flat indexes of hot pixels or None if nothing has been learned
+        """
+
+        key = (width, height, sensor)
+        if key not in self.__indexes and path.exists(self.__file(width, height, sensor)):
+            self.__indexes[key] = np.load(self.__file(width, height, sensor))
+        return self.__indexes.get(key)
+
+
+    def correct(self, image, step=1, sensor=False):
+        """Replaces hot pixels with median of their non-hot neighbours in place
+
+        Args:
+            image (numpy.ndarray): image
+            step (int, optional): distance of the neighbours, 2 keeps to sites of the same
+                colour of a Bayer mosaic. Defaults to 1.
+            sensor (bool, optional): True to apply the map of the sensor. Defaults to False.
+
+        Returns:
+            bool: indicates if any pixel was corrected
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(image.shape)
+        logging.info(log)
+
+        height, width = image.shape[0:2]
+        index = self.index(width, height, sensor)
+        result = index is not None and len(index) > 0
+        if result:
+            ys, xs = np.divmod(index, width)
+            offset_y = np.array([-1, -1, -1, 0, 0, 1, 1, 1])*step
+            offset_x = np.array([-1, 0, 1, -1, 1, -1, 0, 1])*step
+            # reflection at the edges keeps neighbours on sites of the same colour
+            neighbour_ys = np.abs(ys[:, None] + offset_y)
+            neighbour_ys = np.where(
+                neighbour_ys > height - 1, 2*(height - 1) - neighbour_ys, neighbour_ys)
+            neighbour_xs = np.abs(xs[:, None] + offset_x)
+            neighbour_xs = np.where(
+                neighbour_xs > width - 1, 2*(width - 1) - neighbour_xs, neighbour_xs)
+            neighbours = neighbour_ys*width + neighbour_xs
+            position = np.minimum(np.searchsorted(index, neighbours), len(index) - 1)
+            hot = index[position] == neighbours
+            # clusters of hot pixels fall back to median of all neighbours
+            isolated = ~np.all(hot, axis=1)
+            values = image[neighbour_ys, neighbour_xs].astype(np.float32)
+            if values.ndim == 3:
+                hot = np.broadcast_to(hot[:, :, None], values.shape)
+            values[hot] = np.nan
+            median = np.median(image[neighbour_ys, neighbour_xs], axis=1)
+            median[isolated] = np.nanmedian(values[isolated], axis=1)
+            image[ys, xs] = median
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+
+class FitsWriter:
+    """FITS Writer
+
+    Streams image rows into a single HDU FITS file with acquisition headers.
+    """
+
+    BLOCK_SIZE = 2880
+
+    IMAGE_TYPES = {
+        'light': 'Light Frame',
+        'dark': 'Dark Frame',
+        'flat': 'Flat Frame',
+        'bias': 'Bias Frame'
+    }
+
+
+    def __init__(self, file, bitpix=16):
+        """Initializes FITS Writer
+
+        Args:
+            file (str): path of the FITS file
+            bitpix (int, optional): 16 for unsigned 16-bit integers or -32 for 32-bit floats
+                normalized to 1. Defaults to 16.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', bitpix=' + str(bitpix)
+        logging.info(log)
+
+        self.__file = file
+        self.__bitpix = bitpix
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    @staticmethod
+    def __card(keyword, value, comment=''):
+        """Formats header card
+
+        Args:
+            keyword (str): keyword
+            value (bool, int, float or str): value
+            comment (str, optional): comment. Defaults to ''.
+
+        Returns:
+            bytes: 80 characters long card or no bytes if float value is not finite
+        """
+
+        if isinstance(value, bool):
+            value = ('T' if value else 'F').rjust(20)
+        elif isinstance(value, int):
+            value = str(value).rjust(20)
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                # FITS has no representation of infinity and NaN, the card is left out
+                return b''
+            # FITS requires the exponent with uppercase E and a decimal point
+            value = format(value, '.16G')
+            if '.' not in value:
+                value = value.replace('E', '.E') if 'E' in value else value + '.'
+            value = value.rjust(20)
+        else:
+            value = ("'" + str(value).replace("'", "''").ljust(8) + "'").ljust(20)
+        card = keyword.ljust(8) + '= ' + value
+        if comment:
+            card = card + ' / ' + comment
+        return card[:80].ljust(80).encode('ascii', 'replace')
+
+
+    def __header(self, shape, metadata):
+        """Builds header
+
+        Args:
+            shape (tuple): height, width and number of channels of the image
+            metadata (dict): capture metadata
+
+        Returns:
+            bytes: header padded to the block size
+        """
+
+        height, width, channels = shape
+        cards = [
+            FitsWriter.__card('SIMPLE', True, 'conforms to FITS standard'),
+            FitsWriter.__card('BITPIX', self.__bitpix, 'array data type'),
+            FitsWriter.__card('NAXIS', 3 if channels > 1 else 2, 'number of array dimensions'),
+            FitsWriter.__card('NAXIS1', width),
+            FitsWriter.__card('NAXIS2', height)
+        ]
+        if channels > 1:
+            cards.append(FitsWriter.__card('NAXIS3', channels))
+            cards.append(FitsWriter.__card('CTYPE3', 'RGB', 'colour planes'))
+        if self.__bitpix == 16:
+            cards.append(FitsWriter.__card('BZERO', 32768, 'offset for unsigned integers'))
+            cards.append(FitsWriter.__card('BSCALE', 1))
+        timestamp = metadata['timestamp']
+        cards.extend([
+            FitsWriter.__card('ROWORDER', 'TOP-DOWN', 'order of the rows'),
+            FitsWriter.__card(
+                'DATE-OBS', time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp)) +
+                '.' + str(int(timestamp % 1*1000)).zfill(3), 'UTC start of exposure'),
+            FitsWriter.__card(
+                'IMAGETYP', FitsWriter.IMAGE_TYPES.get(metadata['kind'], 'Light Frame'),
+                'type of image'),
+            FitsWriter.__card(
+                'EXPTIME', metadata['shutter_speed']/1000000, '[s] 0 for automatic exposure'),
+            FitsWriter.__card(
+                'GAIN', round(metadata['analog_gain']/256, 3), 'analog gain, 0 for automatic'),
+            FitsWriter.__card('ISOSPEED', metadata['iso'], 'ISO speed, 0 for automatic'),
+            FitsWriter.__card('WHITEBAL', metadata['white_balance'], 'white balance'),
+            FitsWriter.__card('CONTRAST', metadata['contrast']),
+            FitsWriter.__card('SHARPNES', metadata['sharpness'], 'sharpness'),
+            FitsWriter.__card('SATURATN', metadata['saturation'], 'saturation'),
+            FitsWriter.__card('CPU-TEMP', round(metadata['temperature'], 1), '[C] CPU temperature'),
+            FitsWriter.__card('INSTRUME', metadata['model'], 'camera model'),
+            FitsWriter.__card('XRESOLUT', metadata['width'], 'width of the stream'),
+            FitsWriter.__card('YRESOLUT', metadata['height'], 'height of the stream'),
+            FitsWriter.__card('SWCREATE', 'AstroBerry ' + __version__, 'software')
+        ])
+        binning = metadata.get('binning', 1)
+        cards.append(FitsWriter.__card(
+            'CALIBRAT', metadata.get('calibrated', False), 'master dark and flat applied'))
+        cards.append(FitsWriter.__card('XBINNING', binning, 'binning factor in width'))
+        cards.append(FitsWriter.__card('YBINNING', binning, 'binning factor in height'))
+        if metadata.get('roi') is not None:
+            for keyword, value in zip(('ROI-X', 'ROI-Y', 'ROI-W', 'ROI-H'), metadata['roi']):
+                cards.append(FitsWriter.__card(keyword, value, 'normalized region of interest'))
+        cards.append('END'.ljust(80).encode('ascii'))
+        header = b''.join(cards)
+        return header + b' '*(-len(header) % FitsWriter.BLOCK_SIZE)
+
+
+    def write(self, image, maximum, metadata, budget=64*1024*1024):
+        """Writes image plane by plane in strips of rows
+
+        Args:
+            image (numpy.ndarray): image of height x width or height x width x channels
+            maximum (int): white level of the image
+            metadata (dict): capture metadata
+            budget (int, optional): memory budget for a strip in bytes. Defaults to 64MiB.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(image.shape) + ', maximum=' + str(maximum)
+        logging.info(log)
+
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        height, width, channels = image.shape
+        rows = max(1, budget//(width*8))
+        size = 0
+        with open(self.__file, 'wb') as fits:
+            fits.write(self.__header(image.shape, metadata))
+            for channel in range(channels):
+                for start in range(0, height, rows):
+                    strip = image[start:start + rows, :, channel].astype(np.float32)
+                    if self.__bitpix == 16:
+                        strip *= 65535/maximum
+                        strip += 0.5
+                        # flipping the sign bit stores value - BZERO as big-endian int16
+                        data = (strip.astype(np.uint16) ^ 0x8000).astype('>u2')
+                    else:
+                        strip *= 1/maximum
+                        data = strip.astype('>f4')
+                    fits.write(data.tobytes())
+                    size = size + data.nbytes
+            fits.write(b'\0'*(-size % FitsWriter.BLOCK_SIZE))
+        os.sync()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class PngWriter:
+    """PNG Writer
+
+    Streams image rows into a 16-bit PNG file compressed with zlib.
+    """
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+    def __init__(self, file, level=6):
+        """Initializes PNG Writer
+
+        Args:
+            file (str): path of the PNG file
+            level (int, optional): zlib compression level. Defaults to 6.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', level=' + str(level)
+        logging.info(log)
+
+        self.__file = file
+        self.__level = level
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    @staticmethod
+    def __chunk(png, chunk_type, data):
+        """Writes chunk
+
+        Args:
+            png (file): PNG file
+            chunk_type (bytes): type of the chunk
+            data (bytes): data of the chunk
+        """
+
+        png.write(struct.pack('>I', len(data)))
+        png.write(chunk_type)
+        png.write(data)
+        png.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+    def write(self, image, maximum, metadata, budget=64*1024*1024):
+        """Writes image in strips of rows
+
+        Rows are stored with the Up filter computed for the whole strip at once.
+
+        Args:
+            image (numpy.ndarray): image of height x width or height x width x channels
+            maximum (int): white level of the image
+            metadata (dict): capture metadata
+            budget (int, optional): memory budget for a strip in bytes. Defaults to 64MiB.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(image.shape) + ', maximum=' + str(maximum)
+        logging.info(log)
+
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        height, width, channels = image.shape
+        row_size = width*channels*2
+        rows = max(1, budget//(row_size*6))
+        compressor = zlib.compressobj(self.__level)
+        previous = np.zeros(row_size, dtype=np.uint8)
+        with open(self.__file, 'wb') as png:
+            png.write(PngWriter.SIGNATURE)
+            PngWriter.__chunk(png, b'IHDR', struct.pack(
+                '>IIBBBBB', width, height, 16, 2 if channels == 3 else 0, 0, 0, 0))
+            PngWriter.__chunk(
+                png, b'tEXt', b'Software\0AstroBerry ' + __version__.encode('latin-1'))
+            PngWriter.__chunk(
+                png, b'tEXt', b'Description\0' + describe_capture(metadata).encode('latin-1'))
+            for start in range(0, height, rows):
+                strip = image[start:start + rows].astype(np.float32)
+                strip *= 65535/maximum
+                strip += 0.5
+                data = strip.astype('>u2').view(np.uint8).reshape(-1, row_size)
+                filtered = np.empty((data.shape[0], row_size + 1), dtype=np.uint8)
+                filtered[:, 0] = 2
+                np.subtract(data[1:], data[:-1], out=filtered[1:, 1:])
+                np.subtract(data[0], previous, out=filtered[0, 1:])
+                previous = data[-1].copy()
+                compressed = compressor.compress(filtered.tobytes())
+                if compressed:
+                    PngWriter.__chunk(png, b'IDAT', compressed)
+            PngWriter.__chunk(png, b'IDAT', compressor.flush())
+            PngWriter.__chunk(png, b'IEND', b'')
+        os.sync()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class TiffWriter:
+    """TIFF Writer
+
+    Streams image rows into a 16-bit baseline TIFF file, optionally compressed with deflate
+    and horizontal differencing.
+    """
+
+    STRIP_SIZE = 256*1024
+
+    SHORT = 3
+    LONG = 4
+    RATIONAL = 5
+    ASCII = 2
+
+
+    def __init__(self, file, level=6):
+        """Initializes TIFF Writer
+
+        Args:
+            file (str): path of the TIFF file
+            level (int, optional): deflate compression level, 0 disables compression.
+                Defaults to 6.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', level=' + str(level)
+        logging.info(log)
+
+        self.__file = file
+        self.__level = level
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    @staticmethod
+    def __ifd(offset, entries):
+        """Builds image file directory followed by values that do not fit in the entries
+
+        Args:
+            offset (int): offset of the directory in the file
+            entries (list): tag, type and values of the entries
+
+        Returns:
+            bytes: image file directory
+        """
+
+        formats = {
+            TiffWriter.SHORT: 'H', TiffWriter.LONG: 'I', TiffWriter.RATIONAL: 'II',
+            TiffWriter.ASCII: 's'}
+        entries = sorted(entries)
+        data_offset = offset + 2 + len(entries)*12 + 4
+        directory = struct.pack('<H', len(entries))
+        data = b''
+        for tag, value_type, values in entries:
+            if value_type == TiffWriter.ASCII:
+                value = values.encode('ascii', 'replace') + b'\0'
+                count = len(value)
+            elif value_type == TiffWriter.RATIONAL:
+                value = struct.pack('<' + formats[value_type]*len(values), *[
+                    item for rational in values for item in rational])
+                count = len(values)
+            else:
+                value = struct.pack('<' + formats[value_type]*len(values), *values)
+                count = len(values)
+            if len(value) <= 4:
+                directory = directory + struct.pack('<HHI', tag, value_type, count) + \
+                    value.ljust(4, b'\0')
+            else:
+                directory = directory + struct.pack(
+                    '<HHII', tag, value_type, count, data_offset + len(data))
+                data = data + value + b'\0'*(len(value) % 2)
+        return directory + struct.pack('<I', 0) + data
+
+
+    def write(self, image, maximum, metadata, budget=64*1024*1024):
+        """Writes image in strips of rows
+
+        Args:
+            image (numpy.ndarray): image of height x width or height x width x channels
+            maximum (int): white level of the image
+            metadata (dict): capture metadata
+            budget (int, optional): memory budget for a strip in bytes. Defaults to 64MiB.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(image.shape) + ', maximum=' + str(maximum)
+        logging.info(log)
+
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        height, width, channels = image.shape
+        row_size = width*channels*2
+        strip_rows = max(1, TiffWriter.STRIP_SIZE//row_size)
+        rows = max(strip_rows, budget//(row_size*4)//strip_rows*strip_rows)
+        offsets = []
+        counts = []
+        with open(self.__file, 'wb') as tiff:
+            tiff.write(b'II*\0' + struct.pack('<I', 0))
+            for start in range(0, height, rows):
+                strip = image[start:start + rows].astype(np.float32)
+                strip *= 65535/maximum
+                strip += 0.5
+                data = strip.astype(np.uint16)
+                if self.__level > 0:
+                    # horizontal differencing predictor
+                    data[:, 1:] -= data[:, :-1].copy()
+                for row in range(0, data.shape[0], strip_rows):
+                    block = data[row:row + strip_rows].astype('<u2').tobytes()
+                    if self.__level > 0:
+                        block = zlib.compress(block, self.__level)
+                    offsets.append(tiff.tell())
+                    counts.append(len(block))
+                    tiff.write(block)
+            if tiff.tell() % 2:
+                tiff.write(b'\0')
+            offset = tiff.tell()
+            compressed = self.__level > 0
+            tiff.write(TiffWriter.__ifd(offset, [
+                (256, TiffWriter.LONG, (width,)),
+                (257, TiffWriter.LONG, (height,)),
+                (258, TiffWriter.SHORT, (16,)*channels),
+                (259, TiffWriter.SHORT, (8 if compressed else 1,)),
+                (262, TiffWriter.SHORT, (2 if channels == 3 else 1,)),
+                (270, TiffWriter.ASCII, describe_capture(metadata)),
+                (271, TiffWriter.ASCII, 'Raspberry Pi'),
+                (272, TiffWriter.ASCII, str(metadata['model'])),
+                (273, TiffWriter.LONG, offsets),
+                (277, TiffWriter.SHORT, (channels,)),
+                (278, TiffWriter.LONG, (strip_rows,)),
+                (279, TiffWriter.LONG, counts),
+                (282, TiffWriter.RATIONAL, ((72, 1),)),
+                (283, TiffWriter.RATIONAL, ((72, 1),)),
+                (284, TiffWriter.SHORT, (1,)),
+                (296, TiffWriter.SHORT, (2,)),
+                (305, TiffWriter.ASCII, 'AstroBerry ' + __version__),
+                (306, TiffWriter.ASCII, time.strftime(
+                    '%Y:%m:%d %H:%M:%S', time.localtime(metadata['timestamp']))),
+                (317, TiffWriter.SHORT, (2 if compressed else 1,))
+            ]))
+            tiff.seek(4)
+            tiff.write(struct.pack('<I', offset))
+        os.sync()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class RawCaptureWorker(QObject):
+    """Raw Capture Worker
+
+    Captures JPEG image with appended Bayer data while the streaming pipeline is stopped.
+    """
+
+    finished = pyqtSignal(str, dict)
+
+
+    def __init__(self, file, metadata):
+        """Initializes Raw Capture Worker
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        self.__file = file
+        self.__metadata = metadata
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def run(self):
+        """Captures raw image
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        metadata = self.__metadata
+        shutter_speed = metadata['shutter_speed']
+        framerate = 30
+        if shutter_speed > 1000000//30:
+            framerate = Fraction(1000000, shutter_speed)
+        try:
+            with picamera.PiCamera(
+                resolution=(metadata['width'], metadata['height']), sensor_mode=3,
+                framerate=framerate) as camera:
+                camera.shutter_speed = shutter_speed
+                if metadata['iso'] > 0:
+                    camera.iso = metadata['iso']
+                modes = sorted(picamera.PiCamera.AWB_MODES, key=picamera.PiCamera.AWB_MODES.get)
+                camera.awb_mode = modes[metadata['awb_mode']]
+                camera.contrast = metadata['contrast']
+                camera.sharpness = metadata['sharpness']
+                camera.saturation = metadata['saturation']
+                # let the gains settle before they are fixed for the exposure
+                time.sleep(2)
+                if shutter_speed > 0 and metadata['iso'] > 0:
+                    camera.exposure_mode = 'off'
+                camera.capture(self.__file, format='jpeg', bayer=True, quality=100)
+            os.sync()
+        except Exception: # pylint: disable=broad-except
+            log = function_name + ': file=' + self.__file
+            logging.exception(log)
+            if path.exists(self.__file):
+                os.remove(self.__file)
+        finally:
+            # the pipeline is restarted and the shutter released by the finished signal
+            self.finished.emit(self.__file, metadata)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class SequenceEngine(QObject):
+    """Sequence Engine
+
+    Schedules exposures of a capture plan against monotonic deadlines on its own thread and
+    tracks how far captures drift from the plan. Each step of the plan is a dictionary with
+    number of frames and optional shutter speed, analog gain, gap between frames in seconds,
+    dithering pause in seconds taken every given number of frames and number of frames
+    already captured before the sequence was interrupted.
+    """
+
+    # frames the camera produces before new settings take effect
+    FRAMES_IN_FLIGHT = 2
+
+    progress = pyqtSignal(int, int, float)
+    finished = pyqtSignal(int)
+
+
+    def __init__(self, plan, trigger):
+        """Initializes Sequence Engine
+
+        Args:
+            plan (list): steps of the sequence
+            trigger (callable): arms given number of frames after applying settings of the step
+                if they are given and returns duration of a frame in seconds
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': plan=' + str(plan)
+        logging.info(log)
+
+        self.__plan = plan
+        self.__trigger = trigger
+        self.__condition = threading.Condition()
+        self.__captured = 0
+        self.__cancelled = False
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def cancel(self):
+        """Cancels the sequence
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        with self.__condition:
+            self.__cancelled = True
+            self.__condition.notify_all()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def notify(self):
+        """Notifies that armed frame has been captured
+        """
+
+        with self.__condition:
+            self.__captured = self.__captured + 1
+            self.__condition.notify_all()
+
+
+    def __wait(self, deadline, frame=False):
+        """Waits until deadline or until armed frame is captured
+
+        Args:
+            deadline (float): monotonic time to wait until
+            frame (bool, optional): waits for the captured frame if True. Defaults to False.
+
+        Returns:
+            bool: False if the sequence has been cancelled or the frame has not been captured
+                before deadline, True otherwise
+        """
+
+        with self.__condition:
+            while not self.__cancelled and not (frame and self.__captured > 0):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return not frame
+                self.__condition.wait(remaining)
+            if self.__cancelled:
+                return False
+            if frame:
+                self.__captured = self.__captured - 1
+            return True
+
+
+    def run(self):
+        """Runs the sequence
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        total = sum(step['frames'] for step in self.__plan)
+        done = sum(step.get('start', 0) for step in self.__plan)
+        drift = 0.0
+        maximum_drift = 0.0
+        running = True
+        for step in self.__plan:
+            settings = {
+                key: step[key] for key in ('shutter_speed', 'analog_gain') if key in step}
+            gap = step.get('gap', 0.0)
+            every = step.get('dither_every', 0)
+            # dithering keeps its phase in a resumed step
+            index = step.get('start', 0)
+            planned = time.monotonic()
+            while running and index < step['frames']:
+                if not self.__wait(planned):
+                    running = False
+                    break
+                # frames without gaps are armed together to run at the sensor frame rate
+                frames = 1
+                if gap <= 0:
+                    frames = step['frames'] - index
+                    if every > 0:
+                        frames = min(frames, every - index % every)
+                duration = self.__trigger(frames, settings)
+                if settings:
+                    planned = time.monotonic()
+                    settings = None
+                for _ in range(frames):
+                    if not self.__wait(time.monotonic() + 2*duration + 10, True):
+                        log = function_name + ': timeout or cancelled, done=' + str(done)
+                        logging.warning(log)
+                        running = False
+                        break
+                    done = done + 1
+                    index = index + 1
+                    planned = planned + duration
+                    drift = time.monotonic() - planned
+                    maximum_drift = max(maximum_drift, abs(drift))
+                    planned = planned + gap
+                    self.progress.emit(done, total, drift)
+                if running and every > 0 and index % every == 0 and index < step['frames']:
+                    log = function_name + ': dithering, done=' + str(done)
+                    logging.info(log)
+                    planned = max(planned, time.monotonic()) + step.get('dither_pause', 0.0)
+            if not running:
+                break
+        self.__trigger(0, None)
+
+        log = function_name + ': done=' + str(done) + ', drift=' + str(round(drift, 3)) + \
+            ', maximum_drift=' + str(round(maximum_drift, 3))
+        logging.info(log)
+
+        self.finished.emit(done)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class SessionJournal(QObject):
+    """Session Journal
+
+    Append-only journal of capture sessions. Every record is a single JSON line flushed to the
+    storage, so a session interrupted by power loss can be resumed from the last completed
+    exposure. Records are written in order on the thread the journal lives on, so capturing
+    does not wait for the storage, and exposures are recorded only while a session is active.
+    """
+
+    appended = pyqtSignal(dict)
+    rewritten = pyqtSignal(list)
+    saved = pyqtSignal(dict)
+
+
+    def __init__(self, file):
+        """Initializes Session Journal
+
+        Args:
+            file (str): path of the journal file
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        self.__file = file
+        self.__lock = threading.Lock()
+        self.index = -1
+        self.active = False
+        self.appended.connect(self.__append)
+        self.rewritten.connect(self.__rewrite)
+        # the caller waits until the record queued behind the pending ones is written
+        self.saved.connect(self.__append, Qt.BlockingQueuedConnection)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __append(self, record):
+        """Appends record to the journal
+
+        Args:
+            record (dict): record
+        """
+
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self.__lock:
+            descriptor = os.open(self.__file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(descriptor, line)
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+
+    def __rewrite(self, records):
+        """Atomically replaces the journal with given records
+
+        Args:
+            records (list): records
+        """
+
+        with self.__lock:
+            with open(self.__file + '.tmp', 'w', encoding='utf-8') as journal:
+                for record in records:
+                    journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(self.__file + '.tmp', self.__file)
+
+
+    def begin(self, plan, mode):
+        """Begins new session, dropping records of the previous one
+
+        Args:
+            plan (list): steps of the sequence
+            mode (str): capture mode of the session
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': plan=' + str(plan) + ', mode=' + mode
+        logging.info(log)
+
+        self.active = True
+        self.rewritten.emit([
+            {'e': 'index', 'i': self.index},
+            {'e': 'begin', 't': round(time.time(), 3), 'plan': plan, 'mode': mode}])
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def record(self, index, metadata):
+        """Records completed exposure of the active session or the index of the image file
+        captured outside of a session
+
+        Args:
+            index (int): index of the image file
+            metadata (dict): capture metadata
+        """
+
+        self.index = index
+        if not self.active:
+            # keeps the index trusted at startup, the journal is compacted by recover
+            self.appended.emit({'e': 'index', 'i': index})
+            return
+        self.appended.emit({
+            'e': 'frame', 't': round(metadata['timestamp'], 3), 'i': index,
+            's': metadata['shutter_speed'], 'g': metadata['analog_gain']})
+
+
+    def save_index(self, index):
+        """Saves index of the last image file in the media folder on the thread of the journal
+        waiting for the storage, must not be called from that thread
+
+        Args:
+            index (int): index of the last image file
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        self.index = index
+        self.saved.emit({'e': 'index', 'i': index})
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def end(self):
+        """Ends the session
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.active = False
+        self.appended.emit({'e': 'end', 't': round(time.time(), 3)})
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def recover(self):
+        """Reads the journal and compacts it if there is no interrupted session
+
+        Returns:
+            tuple: plan of the interrupted session, number of its completed exposures and its
+                capture mode or None if there is no interrupted session
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        plan = None
+        done = 0
+        mode = 'sequence'
+        try:
+            with open(self.__file, 'rb') as journal:
+                data = journal.read()
+        except FileNotFoundError:
+            data = b''
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # drop torn write of the last record so that next record starts on its own line
+            os.truncate(self.__file, end)
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record['e'] == 'index':
+                self.index = record['i']
+            elif record['e'] == 'begin':
+                plan = record['plan']
+                mode = record.get('mode', 'sequence')
+                done = 0
+            elif record['e'] == 'frame':
+                self.index = record['i']
+                done = done + 1
+            elif record['e'] == 'end':
+                plan = None
+        result = None
+        if plan is not None and done < sum(step['frames'] for step in plan):
+            result = (plan, done, mode)
+            self.active = True
+        else:
+            self.__rewrite([{'e': 'index', 'i': self.index}])
+
+        log = function_name + ': result=' + str(result) + ', index=' + str(self.index)
+        logging.info(log)
+
+        return result
+
+
+
+class StarTrailCompositor(QObject):
+    """Star Trail Compositor
+
+    Keeps running maximum of captured frames in a single accumulator updated in place, so the
+    memory does not grow with the length of the session. The accumulator holds 8.8 fixed
+    point values, so the comet-tail decay fades older trails gradually.
+    """
+
+    updated = pyqtSignal(object, int)
+    stopped = pyqtSignal()
+    finished = pyqtSignal(int)
+
+
+    def __init__(self, media, checkpoint, decay=1.0, every=10, rows=256):
+        """Initializes Star Trail Compositor
+
+        Args:
+            media (str): media folder
+            checkpoint (str): path of the checkpoint file
+            decay (float, optional): factor applied to the accumulator before every frame
+                or 1.0 to keep trails at full brightness. Defaults to 1.0.
+            every (int, optional): number of frames between checkpoints. Defaults to 10.
+            rows (int, optional): number of rows updated at once. Defaults to 256.
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': checkpoint=' + checkpoint + ', decay=' + str(decay) + \
+            ', every=' + str(every)
+        logging.info(log)
+
+        self.__media = media
+        self.__checkpoint = checkpoint
+        self.__decay = decay
+        self.__every = every
+        self.__rows = rows
+        self.__accumulator = None
+        self.__exif = b''
+        self.frames = 0
+        self.active = False
+        self.stopped.connect(self.save)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def start(self):
+        """Starts new composite dropping checkpoint of the previous one
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if path.exists(self.__checkpoint):
+            os.remove(self.__checkpoint)
+        self.__accumulator = None
+        self.__exif = b''
+        self.frames = 0
+        self.active = True
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def resume(self):
+        """Resumes composite from the checkpoint of an interrupted session
+
+        Returns:
+            bool: True if the composite has been resumed, False if there is no checkpoint
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        result = False
+        if path.exists(self.__checkpoint):
+            try:
+                with np.load(self.__checkpoint) as checkpoint:
+                    self.__accumulator = checkpoint['accumulator']
+                    self.frames = int(checkpoint['frames'])
+                self.__exif = b''
+                self.active = True
+                result = True
+            except (OSError, ValueError, KeyError) as exception:
+                log = function_name + ': ' + str(exception)
+                logging.warning(log)
+
+        log = function_name + ': result=' + str(result) + ', frames=' + str(self.frames)
+        logging.info(log)
+
+        return result
+
+
+    def stop(self):
+        """Stops compositing, the composite is saved once the pending frames are added
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.stopped.emit()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def add(self, file, metadata):
+        """Adds processed image file to the composite
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata with path of the calibrated image file if one
+                has been saved
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        if not self.active or metadata['kind'] != 'light' or metadata['mode'] != 'trails':
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        with PIL.Image.open(metadata.get('processed', file)) as image:
+            self.__exif = image.info.get('exif', b'')
+            frame = np.asarray(image.convert('RGB'))
+        if self.__accumulator is None or self.__accumulator.shape != frame.shape:
+            self.__accumulator = np.zeros(frame.shape, dtype=np.uint16)
+            self.frames = 0
+        for start in range(0, frame.shape[0], self.__rows):
+            strip = self.__accumulator[start:start + self.__rows]
+            if self.__decay < 1:
+                np.multiply(strip, self.__decay, out=strip, casting='unsafe')
+            np.maximum(
+                strip, np.left_shift(frame[start:start + self.__rows], 8, dtype=np.uint16),
+                out=strip)
+        del frame
+        self.frames = self.frames + 1
+        if self.frames % self.__every == 0:
+            self.__save_checkpoint()
+        step = -(-self.__accumulator.shape[1]//640)
+        self.updated.emit(
+            np.ascontiguousarray(np.right_shift(
+                self.__accumulator[::step, ::step], 8).astype(np.uint8)), self.frames)
+
+        log = function_name + ': frames=' + str(self.frames)
+        logging.info(log)
+
+
+    def __save_checkpoint(self):
+        """Saves the accumulator so that the composite survives power loss
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': frames=' + str(self.frames)
+        logging.info(log)
+
+        temporary = self.__checkpoint + '.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez(file, accumulator=self.__accumulator, frames=self.frames)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.__checkpoint)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def save(self):
+        """Saves the composite as the next image file and releases the accumulator
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': frames=' + str(self.frames)
+        logging.info(log)
+
+        index = -1
+        if self.active and self.__accumulator is not None and self.frames > 0:
+            index = next_image_index(self.__media)
+            image = np.empty(self.__accumulator.shape, dtype=np.uint8)
+            for start in range(0, image.shape[0], self.__rows):
+                np.right_shift(
+                    self.__accumulator[start:start + self.__rows], 8,
+                    out=image[start:start + self.__rows], casting='unsafe')
+            PIL.Image.fromarray(image).save(
+                self.__media + 'DSCF' + str(index).zfill(4) + '.JPG', quality=95,
+                exif=tag_exif(self.__exif, 'trails'))
+            os.sync()
+        if path.exists(self.__checkpoint):
+            os.remove(self.__checkpoint)
+        self.__accumulator = None
+        self.active = False
+        self.finished.emit(index)
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+
+
+class MeteorDetector(QObject):
+    """Meteor Detector
+
+    Flags streaks of meteors and satellites in captured images. Every image is decoded at a
+    reduced scale, differenced against the median of the previous images and the pixels
+    above the noise are searched for lines with a Hough transform. Flagged images are kept
+    in a JSON file of the media folder.
+    """
+
+    THETAS = 180
+    MAX_POINTS = 5000
+
+    detected = pyqtSignal(int, list)
+
+
+    def __init__(self, file, history=8, sigma=5.0, length=0.1):
+        """Initializes Meteor Detector
+
+        Args:
+            file (str): path of the file of flagged images
+            history (int, optional): number of images the background is the median of.
+                Defaults to 8.
+            sigma (float, optional): threshold above the background in noise deviations.
+                Defaults to 5.0.
+            length (float, optional): minimal length of a streak as a fraction of the image
+                diagonal. Defaults to 0.1.
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', history=' + str(history) + \
+            ', sigma=' + str(sigma) + ', length=' + str(length)
+        logging.info(log)
+
+        self.__file = file
+        self.__sigma = sigma
+        self.__length = length
+        self.__lock = threading.Lock()
+        self.__history = None
+        self.__frames = 0
+        self.__size = history
+        self.__flagged = {}
+        if path.exists(file):
+            try:
+                with open(file, 'r', encoding='utf-8') as flagged:
+                    self.__flagged = {
+                        int(index): segments for index, segments in json.load(flagged).items()}
+            except (OSError, ValueError) as exception:
+                log = function_name + ': ' + str(exception)
+                logging.warning(log)
+        theta = np.arange(MeteorDetector.THETAS)*np.pi/MeteorDetector.THETAS
+        self.__cos = np.cos(theta).astype(np.float32)
+        self.__sin = np.sin(theta).astype(np.float32)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def flagged(self):
+        """Gets indexes of the flagged image files
+
+        Returns:
+            list: sorted indexes of the image files with a streak
+        """
+
+        with self.__lock:
+            return sorted(self.__flagged)
+
+
+    def segments(self, index):
+        """Gets streaks found in the image file
+
+        Args:
+            index (int): index of the image file
+
+        Returns:
+            list: end points x0, y0, x1, y1 of the streaks or empty list
+        """
+
+        with self.__lock:
+            return list(self.__flagged.get(index, []))
+
+
+    @staticmethod
+    def __load(file):
+        """Loads luminance of the image file reduced by the JPEG decoder
+
+        Args:
+            file (str): path of the image file
+
+        Returns:
+            tuple: float32 luminance and the reduction factor
+        """
+
+        with PIL.Image.open(file) as image:
+            width, height = image.size
+            scale = min(8, max(1, width//320))
+            image.draft('L', (width//scale, height//scale))
+            result = np.asarray(image.convert('L'), dtype=np.float32)
+        return result, width/result.shape[1]
+
+
+    def __lines(self, mask):
+        """Finds line segments in the mask with a Hough transform
+
+        Args:
+            mask (numpy.ndarray): pixels above the threshold
+
+        Returns:
+            list: end points x0, y0, x1, y1 of the segments in the mask
+        """
+
+        height, width = mask.shape
+        length = self.__length*np.hypot(width, height)
+        y, x = np.nonzero(mask)
+        x = x.astype(np.float32)
+        y = y.astype(np.float32)
+        offset = int(np.ceil(np.hypot(width, height)))
+        columns = np.arange(MeteorDetector.THETAS)
+        result = []
+        while len(x) >= length/2 and len(result) < 3:
+            # distances of every point for every angle are voted at once
+            rho = np.rint(np.outer(x, self.__cos) + np.outer(y, self.__sin)).astype(np.int32)
+            votes = np.bincount(
+                ((rho + offset)*MeteorDetector.THETAS + columns).ravel(),
+                minlength=(2*offset + 1)*MeteorDetector.THETAS)
+            peak = int(np.argmax(votes))
+            if votes[peak] < length/2:
+                break
+            distance, theta = divmod(peak, MeteorDetector.THETAS)
+            on_line = np.abs(rho[:, theta] - (distance - offset)) <= 1
+            position = -x[on_line]*self.__sin[theta] + y[on_line]*self.__cos[theta]
+            first = int(np.argmin(position))
+            last = int(np.argmax(position))
+            span = float(position[last] - position[first])
+            # scattered noise may line up but does not fill the segment
+            if span >= length and np.count_nonzero(on_line) >= span/2:
+                result.append((
+                    float(x[on_line][first]), float(y[on_line][first]),
+                    float(x[on_line][last]), float(y[on_line][last])))
+            x = x[~on_line]
+            y = y[~on_line]
+        return result
+
+
+    def add(self, file, metadata):
+        """Searches processed image file for streaks and flags it if any has been found
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata with path of the calibrated image file if one
+                has been saved
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        if metadata['kind'] != 'light':
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        luma, scale = MeteorDetector.__load(metadata.get('processed', file))
+        if 'processed' in metadata:
+            # segments are flagged in coordinates of the captured image
+            scale = scale*metadata.get('binning', 1)
+        if self.__history is None or self.__history.shape[1:] != luma.shape:
+            self.__history = np.empty((self.__size,) + luma.shape, dtype=np.float32)
+            self.__frames = 0
+        segments = []
+        if self.__frames >= 3:
+            background = np.median(self.__history[:min(self.__frames, self.__size)], axis=0)
+            difference = luma - background
+            sample = difference[::4, ::4]
+            center = float(np.median(sample))
+            noise = max(1.0, 1.4826*float(np.median(np.abs(sample - center))))
+            mask = difference > center + self.__sigma*noise
+            count = np.count_nonzero(mask)
+            if count > MeteorDetector.MAX_POINTS:
+                log = function_name + ': scene has changed, points=' + str(count)
+                logging.warning(log)
+            else:
+                segments = [
+                    [round(value*scale) for value in segment]
+                    for segment in self.__lines(mask)]
+        self.__history[self.__frames % self.__size] = luma
+        self.__frames = self.__frames + 1
+
+        if segments:
+            index = int(re.search(r'\d+', path.basename(file)).group())
+            with self.__lock:
+                self.__flagged[index] = segments
+                flagged = dict(self.__flagged)
+            temporary = self.__file + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as file_object:
+                json.dump(flagged, file_object)
+            os.replace(temporary, self.__file)
+            self.detected.emit(index, segments)
+
+        log = function_name + ': segments=' + str(segments)
+        logging.info(log)
+
+
+
+class GradientExtractor:
+    """Gradient Extractor
+
+    Models background of the sky as a low order 2-D polynomial fitted to medians of a coarse
+    grid of cells with stars masked out. Coefficients are in normalized coordinates, so the
+    model is fitted once per image on a reduced copy and subtracted at any resolution.
+    """
+
+
+    def __init__(self, degree=2, cells=(32, 24), sigma=2.5):
+        """Initializes Gradient Extractor
+
+        Args:
+            degree (int, optional): degree of the polynomial. Defaults to 2.
+            cells (tuple, optional): number of columns and rows of the grid. Defaults to
+                (32, 24).
+            sigma (float, optional): threshold of stars above the median of a cell in noise
+                deviations. Defaults to 2.5.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': degree=' + str(degree) + ', cells=' + str(cells) + \
+            ', sigma=' + str(sigma)
+        logging.info(log)
+
+        self.__degree = degree
+        self.__cells = cells
+        self.__sigma = sigma
+        self.__models = {}
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __terms(self, x, y):
+        """Gets terms of the polynomial
+
+        Args:
+            x (numpy.ndarray): normalized horizontal coordinates
+            y (numpy.ndarray): normalized vertical coordinates
+
+        Returns:
+            list: terms broadcast from the coordinates
+        """
+
+        return [
+            x**i*y**j for i in range(self.__degree + 1) for j in range(self.__degree + 1 - i)]
+
+
+    def fit(self, image):
+        """Fits the model to the background of the image
+
+        Args:
+            image (numpy.ndarray): RGB image
+
+        Returns:
+            tuple: coefficients of the polynomial per channel and the median background
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(image.shape)
+        logging.info(log)
+
+        height, width = image.shape[:2]
+        columns, rows = self.__cells
+        cell_width = width//columns
+        cell_height = height//rows
+        grid = image[:cell_height*rows, :cell_width*columns].astype(np.float32).reshape(
+            rows, cell_height, columns, cell_width, 3).transpose(0, 2, 1, 3, 4).reshape(
+            rows, columns, cell_height*cell_width, 3)
+        median = np.median(grid, axis=2)[:, :, np.newaxis]
+        deviation = 1.4826*np.median(np.abs(grid - median), axis=2)[:, :, np.newaxis]
+        grid[grid > median + self.__sigma*np.maximum(deviation, 1)] = np.nan
+        samples = np.nanmedian(grid, axis=2).reshape(-1, 3)
+        del grid
+
+        y, x = np.mgrid[0:rows, 0:columns].astype(np.float32)
+        x = ((x.ravel() + 0.5)*cell_width/width)*2 - 1
+        y = ((y.ravel() + 0.5)*cell_height/height)*2 - 1
+        design = np.stack(self.__terms(x, y), axis=1)
+        # cells of nebulae, the moon or foreground are rejected from the fit
+        keep = np.ones(len(samples), dtype=bool)
+        for _ in range(3):
+            coefficients = np.linalg.lstsq(design[keep], samples[keep], rcond=None)[0]
+            residual = np.abs(samples - design @ coefficients).max(axis=1)
+            keep = residual <= 3*max(1.4826*float(np.median(residual[keep])), 0.5)
+        pedestal = np.median(samples[keep], axis=0)
+
+        log = function_name + ': cells=' + str(int(np.count_nonzero(keep))) + \
+            ', pedestal=' + str(pedestal)
+        logging.info(log)
+
+        return coefficients.astype(np.float32), pedestal.astype(np.float32)
+
+
+    def subtract(self, image, coefficients, pedestal, rows=256):
+        """Subtracts the model from the image in strips of rows keeping the median background
+
+        Args:
+            image (numpy.ndarray): RGB image
+            coefficients (numpy.ndarray): coefficients of the polynomial per channel
+            pedestal (numpy.ndarray): median background per channel
+            rows (int, optional): number of rows subtracted at once. Defaults to 256.
+
+        Returns:
+            numpy.ndarray: RGB image with the gradient removed
+        """
+
+        height, width = image.shape[:2]
+        x = (((np.arange(width, dtype=np.float32) + 0.5)/width)*2 - 1)[np.newaxis, :, np.newaxis]
+        result = np.empty(image.shape, dtype=np.uint8)
+        for start in range(0, height, rows):
+            end = min(start + rows, height)
+            y = (((np.arange(start, end, dtype=np.float32) + 0.5)/height)*2 - 1)[
+                :, np.newaxis, np.newaxis]
+            strip = image[start:end].astype(np.float32)
+            strip += pedestal
+            for term, coefficient in zip(self.__terms(x, y), coefficients):
+                strip -= term*coefficient
+            np.clip(strip, 0, 255, out=strip)
+            result[start:end] = strip
+        return result
+
+
+    def remove(self, file, size=None):
+        """Loads image file with the gradient removed, the model is fitted once per file
+
+        Args:
+            file (str): path of the image file
+            size (tuple, optional): width and height the image may be reduced to by the JPEG
+                decoder or None to load it at full resolution. Defaults to None.
+
+        Returns:
+            numpy.ndarray: RGB image
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', size=' + str(size)
+        logging.info(log)
+
+        with PIL.Image.open(file) as image:
+            if size is not None:
+                image.draft('RGB', size)
+            image = np.asarray(image.convert('RGB'))
+        modified = os.stat(file).st_mtime_ns
+        model = self.__models.get(file)
+        if model is None or model[0] != modified:
+            step = max(1, image.shape[1]//640)
+            model = (modified,) + self.fit(image[::step, ::step])
+            self.__models[file] = model
+        result = self.subtract(image, model[1], model[2])
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+        return result
+
+
+
+class CaptureProcessor(QObject):
+    """Capture Processor
+
+    Post-processes captured images outside of the main and streaming threads.
+    """
+
+    processed = pyqtSignal(str, dict)
+
+
+    def __init__(self, parameters, library, hot_pixels, executor):
+        """Initializes Capture Processor
+
+        Args:
+            parameters (dict): parameters
+            library (CalibrationLibrary): calibration library
+            hot_pixels (HotPixelMap): hot pixel map
+            executor (ProcessingExecutor): processing executor
+        """
+
+        super().__init__()
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__parameters = parameters
+        self.__library = library
+        self.__hot_pixels = hot_pixels
+        self.__executor = executor
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def process(self, file, metadata):
+        """Processes captured image file
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', kind=' + metadata['kind']
+        logging.info(log)
+
+        if metadata['kind'] in ('dark', 'flat', 'bias'):
+            if self.__library.add(metadata['kind'], metadata) and metadata['kind'] == 'dark':
+                self.__hot_pixels.learn(
+                    self.__library.master('dark', metadata),
+                    metadata.get('roi') is None and metadata.get('binning', 1) == 1 and
+                    (metadata['width'], metadata['height']) ==
+                    (BayerDecoder.WIDTH, BayerDecoder.HEIGHT))
+        image = None
+        calibrated = False
+        if metadata['kind'] == 'light' and (
+            self.__parameters['calibration'] or self.__parameters['hot_pixel_correction']):
+            image, calibrated = self.__correct(file, metadata)
+        if metadata['kind'] == 'light' and (
+            image is not None or metadata.get('binning', 1) > 1):
+            # consumers read the processed image file instead of the captured one
+            metadata = dict(
+                metadata, processed=self.__save_processed(file, image, metadata))
+        if metadata['kind'] == 'light' and self.__parameters['output_formats']:
+            self.__write_outputs(file, dict(metadata, calibrated=calibrated), image)
+        del image
+
+        self.processed.emit(file, metadata)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __correct(self, file, metadata):
+        """Calibrates the image and corrects its hot pixels
+
+        The image is calibrated in strips of rows so only the strip is held in floating point.
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+
+        Returns:
+            tuple: corrected RGB image or None if nothing was applied and True if master
+                frames were applied
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        with PIL.Image.open(file) as jpeg:
+            image = np.array(jpeg.convert('RGB'))
+        changed = False
+        calibrated = False
+        if self.__parameters['calibration']:
+            height = image.shape[0]
+            # the float32 strip and the strips of dark and flat masters
+            rows = max(1, self.__parameters['memory_budget']*1024*1024//(
+                image.shape[1]*image.shape[2]*12))
+            for start in range(0, height, rows):
+                strip = image[start:start + rows].astype(np.float32)
+                if not self.__library.calibrate(strip, metadata, start, height):
+                    break
+                changed = True
+                calibrated = True
+                np.add(strip, 0.5, out=strip)
+                np.clip(strip, 0, 255, out=strip)
+                image[start:start + rows] = strip
+        if self.__parameters['hot_pixel_correction']:
+            changed = self.__hot_pixels.correct(image) or changed
+        result = image if changed else None
+
+        log = function_name + ': result=' + str(changed) + ', calibrated=' + str(calibrated)
+        logging.info(log)
+
+        return result, calibrated
+
+
+    @staticmethod
+    def __save_processed(file, image, metadata):
+        """Saves processed image next to the captured image file keeping its EXIF
+
+        The captured image file is left untouched so processing can be repeated. The image
+        is binned if binning is set, 8-bit JPEG cannot hold sums so it is always averaged.
+
+        Args:
+            file (str): path of the captured image file
+            image (numpy.ndarray): corrected RGB image or None to use the captured image
+            metadata (dict): capture metadata
+
+        Returns:
+            str: path of the processed image file
+        """
+
+        with PIL.Image.open(file) as jpeg:
+            exif = jpeg.info.get('exif', b'')
+            if image is None:
+                image = np.asarray(jpeg.convert('RGB'))
+        if metadata.get('binning', 1) > 1:
+            image, _ = bin_image(image, metadata['binning'], 'average')
+            np.add(image, 0.5, out=image)
+            image = image.astype(np.uint8)
+        result = path.splitext(file)[0] + '.PROCESSED.JPG'
+        PIL.Image.fromarray(image).save(result, quality=100, exif=exif)
+        os.sync()
+        return result
+
+
+    def __write_outputs(self, file, metadata, image=None):
+        """Writes the image in additional output formats next to the JPEG file
+
+        Bayer data is developed if the file contains it, otherwise the corrected or the
+        captured JPEG image is used. Master frames are built from processed JPEG images, so
+        developed Bayer data is not calibrated and only its hot pixels may be corrected.
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+            image (numpy.ndarray, optional): corrected RGB image. Defaults to None.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        name = path.splitext(file)[0]
+        store = path.join(path.dirname(file), '.store', path.basename(name) + '.rgb')
+        budget = self.__parameters['memory_budget']*1024*1024
+        maximum = 255
+        developed = None
+        if metadata['mode'] == 'raw':
+            # demosaicing keeps about ten float32 planes of a tile in every process
+            developed = BayerDecoder.develop(
+                file, store, self.__parameters['bayer_order'],
+                self.__parameters['demosaic_method'], self.__executor,
+                max(16, budget//(self.__parameters['processes']*BayerDecoder.WIDTH*40)),
+                self.__hot_pixels if self.__parameters['hot_pixel_correction'] else None)
+        if developed is not None:
+            image = developed
+            developed = None
+            maximum = 4095
+            metadata = dict(metadata, calibrated=False)
+        elif image is None:
+            with PIL.Image.open(file) as jpeg:
+                image = np.asarray(jpeg.convert('RGB'))
+        if metadata.get('binning', 1) > 1:
+            image, maximum = bin_image(
+                image, metadata['binning'], self.__parameters['binning_method'], maximum,
+                max(metadata['binning'], budget//(image.shape[1]*image.shape[2]*8)))
+        for output_format in self.__parameters['output_formats']:
+            if output_format == 'fits':
+                FitsWriter(name + '.FITS', self.__parameters['fits_bitpix']).write(
+                    image, maximum, metadata, budget)
+            elif output_format == 'tiff':
+                TiffWriter(name + '.TIFF', self.__parameters['compression_level']).write(
+                    image, maximum, metadata, budget)
+            elif output_format == 'png':
+                PngWriter(name + '.PNG', self.__parameters['compression_level']).write(
+                    image, maximum, metadata, budget)
+            else:
+                log = function_name + ': output_format=' + output_format
+                logging.warning(log)
+        del image
+        if path.exists(store):
+            os.remove(store)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+
+class CameraScreen(QMainWindow):
+    """Camera Screen
+    """
+
+    CAPTURE_MODES = {
+        'photo': 'Photo',
+        'raw': 'Raw photo',
+        'sequence': 'Sequence',
+        'trails': 'Star trails',
+        'burst': 'Burst',
+        'planetary': 'Planetary',
+        'video': 'SER video',
+        'roi': 'Region of interest',
+        'focus': 'Focus assist',
+        'exposure': 'Auto exposure',
+        'dark': 'Dark frames',
+        'flat': 'Flat frames',
+        'bias': 'Bias frames'
+    }
+
+    ROI_MODES = ('roi', 'planetary', 'video')
+
+    captured = pyqtSignal(str, dict)
+    exposure_requested = pyqtSignal(int, int)
+
+
+    def __init__(self, parent, params):
+        """Initialize Camera Screen
+
+        Args:
+            parent (QApplication): application
+            params (dict): parameters
+        """
+
+        super().__init__(None)
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__parent = parent
+        self.parameters = params
+
+        signal.signal(signal.SIGTERM, self.__on_terminate)
+        signal.signal(signal.SIGINT, self.__on_terminate)
+        signal.signal(signal.SIGABRT, self.__on_terminate)
+
+        self.setGeometry(0,36,800,564)
+        self.setWindowTitle('AstroBerry')
+        self.setWindowFlags(Qt.Window | Qt.FramelessWindowHint)
+        self.setWindowIcon(QIcon(self.parameters['icons'] + self.parameters['logo_icon']))
+
+        self.window = QWidget()
+
+        self.panel = QWidget()
+
+        self.panel_display = Display(self)
+        self.panel_display.setFixedSize(640,480)
+        self.panel_display.setToolTip(
+            'Swipe left or right to change resolution, up or down to change capture mode' +
+            ' or double tap to toggle debug mode')
+        self.__win_id = self.panel_display.winId()
+
+        self.panel_control = QWidget()
+
+        self.control = QWidget()
+        self.control_menu = QWidget()
+        self.control_sharpness = QWidget()
+        self.control_sharpness_button = QWidget()
+        self.control_exposure = QWidget()
+        self.control_exposure_shutter_speed = QWidget()
+        self.control_exposure_iso = QWidget()
+
+        window_h_layout = QHBoxLayout()
+        window_h_layout.setContentsMargins(0,4,0,0)
+        window_h_layout.setSpacing(0)
+
+        panel_v_layout = QVBoxLayout()
+        panel_v_layout.setContentsMargins(0,0,0,0)
+        panel_v_layout.setSpacing(0)
+
+        panel_control_h_layout = QHBoxLayout()
+        panel_control_h_layout.setContentsMargins(0,0,0,0)
+        panel_control_h_layout.setSpacing(0)
+
+        control_v_layout = QVBoxLayout()
+        control_v_layout.setContentsMargins(0,0,0,0)
+        control_v_layout.setSpacing(0)
+
+        control_menu_h_layout = QHBoxLayout()
+        control_menu_h_layout.setContentsMargins(0,0,0,0)
+        control_menu_h_layout.setSpacing(0)
+
+        control_sharpness_v_layout = QVBoxLayout()
+        control_sharpness_v_layout.setContentsMargins(0,0,0,0)
+        control_sharpness_v_layout.setSpacing(0)
+
+        control_sharpness_button_h_layout = QHBoxLayout()
+        control_sharpness_button_h_layout.setContentsMargins(0,0,0,0)
+        control_sharpness_button_h_layout.setSpacing(0)
+
+        control_exposure_h_layout = QHBoxLayout()
+        control_exposure_h_layout.setContentsMargins(0,0,0,0)
+        control_exposure_h_layout.setSpacing(0)
+
+        control_exposure_shutter_speed_v_layout = QVBoxLayout()
+        control_exposure_shutter_speed_v_layout.setContentsMargins(0,0,0,0)
+        control_exposure_shutter_speed_v_layout.setSpacing(0)
+
+        control_exposure_iso_v_layout = QVBoxLayout()
+        control_exposure_iso_v_layout.setContentsMargins(0,0,0,0)
+        control_exposure_iso_v_layout.setSpacing(0)
+
+        self.panel_control_contrast_button_down = QPushButton()
+        self.panel_control_contrast_button_down.setFixedSize(80,80)
+        self.panel_control_contrast_button_down.setToolTip('Decrease contrast')
+        self.panel_control_contrast_button_down.setIcon(QIcon(
+            self.parameters['icons'] + 'do_not_disturb_on_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_contrast_button_down.setIconSize(QSize(80,80))
+        self.panel_control_contrast_button_down.clicked.connect(
+            self.__on_panel_control_contrast_button_down_clicked)
+        if self.parameters['contrast'] == -100:
+            self.panel_control_contrast_button_down.setEnabled(False)
+
+        self.panel_control_contrast_label = QLabel(str(self.parameters['contrast']))
+        self.panel_control_contrast_label.setFixedSize(40,80)
+        self.panel_control_contrast_label.setToolTip('Current contrast')
+        font = self.panel_control_contrast_label.font()
+        font.setPointSize(12)
+        self.panel_control_contrast_label.setFont(font)
+        self.panel_control_contrast_label.setAlignment(Qt.AlignCenter)
+
+        self.panel_control_contrast_button_up = QPushButton()
+        self.panel_control_contrast_button_up.setFixedSize(80,80)
+        self.panel_control_contrast_button_up.setToolTip('Increase contrast')
+        self.panel_control_contrast_button_up.setIcon(QIcon(
+            self.parameters['icons'] + 'add_circle_FILL1_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_contrast_button_up.setIconSize(QSize(80,80))
+        self.panel_control_contrast_button_up.clicked.connect(
+            self.__on_panel_control_contrast_button_up_clicked)
+        if self.parameters['contrast'] == 100:
+            self.panel_control_contrast_button_up.setEnabled(False)
+
+        self.panel_control_white_balance_button = QPushButton()
+        self.panel_control_white_balance_button.setFixedSize(80,80)
+        self.panel_control_white_balance_button.setToolTip('Auto white balance mode')
+        self.panel_control_white_balance_button.setIcon(QIcon(
+            self.parameters['icons'] + 'wb_auto_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_white_balance_button.setIconSize(QSize(80,80))
+        self.panel_control_white_balance_button.clicked.connect(
+            self.__on_panel_control_white_balance_button_clicked)
+
+        self.panel_control_saturation_button_down = QPushButton()
+        self.panel_control_saturation_button_down.setFixedSize(80,80)
+        self.panel_control_saturation_button_down.setToolTip('Decrease saturation')
+        self.panel_control_saturation_button_down.setIcon(QIcon(
+            self.parameters['icons'] + 'do_not_disturb_on_FILL1_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_saturation_button_down.setIconSize(QSize(80,80))
+        self.panel_control_saturation_button_down.clicked.connect(
+            self.__on_panel_control_saturation_button_down_clicked)
+        if self.parameters['saturation'] == -100:
+            self.panel_control_saturation_button_down.setEnabled(False)
+
+        self.panel_control_saturation_label = QLabel(str(self.parameters['saturation']))
+        self.panel_control_saturation_label.setFixedSize(40,80)
+        self.panel_control_saturation_label.setToolTip('Current saturation')
+        font = self.panel_control_saturation_label.font()
+        font.setPointSize(12)
+        self.panel_control_saturation_label.setFont(font)
+        self.panel_control_saturation_label.setAlignment(Qt.AlignCenter)
+
+        self.panel_control_saturation_button_up = QPushButton()
+        self.panel_control_saturation_button_up.setFixedSize(80,80)
+        self.panel_control_saturation_button_up.setToolTip('Increase saturation')
+        self.panel_control_saturation_button_up.setIcon(QIcon(
+            self.parameters['icons'] + 'add_circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_saturation_button_up.setIconSize(QSize(80,80))
+        self.panel_control_saturation_button_up.clicked.connect(
+            self.__on_panel_control_saturation_button_up_clicked)
+        if self.parameters['saturation'] == 100:
+            self.panel_control_saturation_button_up.setEnabled(False)
+
+        self.panel_control_info_label = QLabel()
+        self.panel_control_info_label.setFixedSize(160,80)
+        self.panel_control_info_label.setToolTip('Image information')
+        font = self.panel_control_info_label.font()
+        font.setPointSize(12)
+        self.panel_control_info_label.setFont(font)
+        self.panel_control_info_label.setAlignment(Qt.AlignCenter)
+
+        panel_control_h_layout.addWidget(self.panel_control_contrast_button_down)
+        panel_control_h_layout.addWidget(self.panel_control_contrast_label)
+        panel_control_h_layout.addWidget(self.panel_control_contrast_button_up)
+        panel_control_h_layout.addWidget(self.panel_control_white_balance_button)
+        panel_control_h_layout.addWidget(self.panel_control_saturation_button_down)
+        panel_control_h_layout.addWidget(self.panel_control_saturation_label)
+        panel_control_h_layout.addWidget(self.panel_control_saturation_button_up)
+        panel_control_h_layout.addWidget(self.panel_control_info_label)
+
+        self.panel_control.setLayout(panel_control_h_layout)
+
+        panel_v_layout.addWidget(self.panel_display)
+        panel_v_layout.addWidget(self.panel_control)
+
+        self.panel.setLayout(panel_v_layout)
+
+        if self.parameters['exit_action'] == 'NONE':
+            exit_handler = self.__on_control_menu_debug_mode_button_clicked
+            tooltip = 'Toggle debug mode'
+        elif self.parameters['exit_action'] == 'QUIT':
+            exit_handler = self.__on_control_menu_quit_button_clicked
+            tooltip = 'Quit AstroBerry'
+        elif self.parameters['exit_action'] == 'SHUTDOWN':
+            exit_handler = self.__on_control_menu_shutdown_button_clicked
+            tooltip = 'Shutdown AstroBerry'
+
+        self.control_menu_exit_button = QPushButton()
+        self.control_menu_exit_button.setFixedSize(80,80)
+        self.control_menu_exit_button.setToolTip(tooltip)
+        self.control_menu_exit_button.setIcon(
+            QIcon(self.parameters['icons'] + self.parameters['exit_icon']))
+        self.control_menu_exit_button.setIconSize(QSize(80,80))
+        self.control_menu_exit_button.clicked.connect(exit_handler)
+
+        self.control_menu_photo_gallery_button = QPushButton()
+        self.control_menu_photo_gallery_button.setFixedSize(80,80)
+        self.control_menu_photo_gallery_button.setToolTip('Photo gallery')
+        self.control_menu_photo_gallery_button.setIcon(QIcon(
+            self.parameters['icons'] + 'photo_library_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_menu_photo_gallery_button.setIconSize(QSize(80,80))
+        self.control_menu_photo_gallery_button.clicked.connect(
+            self.__on_control_menu_photo_gallery_button_clicked)
+
+        control_menu_h_layout.addWidget(self.control_menu_photo_gallery_button)
+        control_menu_h_layout.addWidget(self.control_menu_exit_button)
+
+        self.control_menu.setLayout(control_menu_h_layout)
+
+        self.control_sharpness_label = QLabel(str(self.parameters['sharpness']))
+        self.control_sharpness_label.setFixedSize(160,40)
+        self.control_sharpness_label.setToolTip('Current sharpness')
+        font = self.control_sharpness_label.font()
+        font.setPointSize(12)
+        self.control_sharpness_label.setFont(font)
+        self.control_sharpness_label.setAlignment(Qt.AlignCenter)
+
+        self.control_sharpness_button_down = QPushButton()
+        self.control_sharpness_button_down.setFixedSize(80,80)
+        self.control_sharpness_button_down.setToolTip('Decrease sharpness')
+        self.control_sharpness_button_down.setIcon(QIcon(
+            self.parameters['icons'] + 'do_not_disturb_on_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_sharpness_button_down.setIconSize(QSize(80,80))
+        self.control_sharpness_button_down.clicked.connect(
+            self.__on_control_sharpness_button_down_clicked)
+        if self.parameters['sharpness'] == -100:
+            self.control_sharpness_button_down.setEnabled(False)
+
+        self.control_sharpness_button_up = QPushButton()
+        self.control_sharpness_button_up.setFixedSize(80,80)
+        self.control_sharpness_button_up.setToolTip('Increase sharpness')
+        self.control_sharpness_button_up.setIcon(QIcon(
+            self.parameters['icons'] + 'add_circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_sharpness_button_up.setIconSize(QSize(80,80))
+        self.control_sharpness_button_up.clicked.connect(
+            self.__on_control_sharpness_button_up_clicked)
+        if self.parameters['sharpness'] == 100:
+            self.control_sharpness_button_up.setEnabled(False)
+
+        control_sharpness_button_h_layout.addWidget(self.control_sharpness_button_down)
+        control_sharpness_button_h_layout.addWidget(self.control_sharpness_button_up)
+
+        self.control_sharpness_button.setLayout(control_sharpness_button_h_layout)
+
+        control_sharpness_v_layout.addWidget(self.control_sharpness_label)
+
+        control_sharpness_v_layout.addWidget(self.control_sharpness_button)
+
+        self.control_sharpness.setLayout(control_sharpness_v_layout)
+
+        self.control_exposure_shutter_speed_button_down = QPushButton()
+        self.control_exposure_shutter_speed_button_down.setFixedSize(80,80)
+        self.control_exposure_shutter_speed_button_down.setToolTip(
+            'Decrease shutter speed')
+        self.control_exposure_shutter_speed_button_down.setIcon(QIcon(
+            self.parameters['icons'] + 'indeterminate_check_box_FILL1_wght400_GRAD0_opsz48.svg'))
+        self.control_exposure_shutter_speed_button_down.setIconSize(QSize(80,80))
+        self.control_exposure_shutter_speed_button_down.clicked.connect(
+            self.__on_control_exposure_shutter_speed_button_down_clicked)
+
+        if parameters['shutter_speed'] == 0:
+            shutter_speed = 'Auto'
+            self.control_exposure_shutter_speed_button_down.setEnabled(False)
+        else:
+            exposure_time = parameters['shutter_speed'] / 1000000
+            if int(exposure_time) == 0:
+                shutter_speed = '1/'+str(int(1/exposure_time))
+            else:
+                shutter_speed = str(int(exposure_time)) + '/1'
+
+        self.control_exposure_shutter_speed_label = QLabel(shutter_speed + '"')
+        self.control_exposure_shutter_speed_label.setFixedSize(80,40)
+        self.control_exposure_shutter_speed_label.setToolTip('Current shutter speed')
+        font = self.control_exposure_shutter_speed_label.font()
+        font.setPointSize(12)
+        self.control_exposure_shutter_speed_label.setFont(font)
+        self.control_exposure_shutter_speed_label.setAlignment(Qt.AlignCenter)
+
+        self.control_exposure_shutter_speed_button_up = QPushButton()
+        self.control_exposure_shutter_speed_button_up.setFixedSize(80, 80)
+        self.control_exposure_shutter_speed_button_up.setToolTip(
+            'Increase shutter speed')
+        self.control_exposure_shutter_speed_button_up.setIcon(QIcon(
+            self.parameters['icons'] + 'add_box_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_exposure_shutter_speed_button_up.setIconSize(QSize(80,80))
+        self.control_exposure_shutter_speed_button_up.clicked.connect(
+            self.__on_control_exposure_shutter_speed_button_up_clicked)
+        if parameters['shutter_speed'] == 22000000:
+            self.control_exposure_shutter_speed_button_up.setEnabled(False)
+
+        control_exposure_shutter_speed_v_layout.addWidget(
+            self.control_exposure_shutter_speed_button_up)
+        control_exposure_shutter_speed_v_layout.addWidget(
+            self.control_exposure_shutter_speed_label)
+        control_exposure_shutter_speed_v_layout.addWidget(
+            self.control_exposure_shutter_speed_button_down)
+
+        self.control_exposure_shutter_speed.setLayout(
+            control_exposure_shutter_speed_v_layout)
+
+        self.control_exposure_iso_button_down = QPushButton()
+        self.control_exposure_iso_button_down.setFixedSize(80,80)
+        self.control_exposure_iso_button_down.setToolTip('Decrease ISO')
+        self.control_exposure_iso_button_down.setIcon(QIcon(
+            self.parameters['icons'] + 'indeterminate_check_box_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_exposure_iso_button_down.setIconSize(QSize(90,90))
+        self.control_exposure_iso_button_down.clicked.connect(
+            self.__on_control_exposure_iso_button_down_clicked)
+
+        if parameters['iso'] == 0:
+            iso = 'Auto'
+            self.control_exposure_iso_button_down.setEnabled(False)
+        else:
+            iso = str(int(parameters['iso']*100/256))
+
+        self.control_exposure_iso_label = QLabel('ISO ' + iso)
+        self.control_exposure_iso_label.setFixedSize(80,40)
+        self.control_exposure_iso_label.setToolTip('Current ISO')
+        font = self.control_exposure_iso_label.font()
+        font.setPointSize(12)
+        self.control_exposure_iso_label.setFont(font)
+        self.control_exposure_iso_label.setAlignment(Qt.AlignCenter)
+
+        self.control_exposure_iso_button_up = QPushButton()
+        self.control_exposure_iso_button_up.setFixedSize(80,80)
+        self.control_exposure_iso_button_up.setToolTip('Increase ISO')
+        self.control_exposure_iso_button_up.setIcon(QIcon(
+            self.parameters['icons'] + 'add_box_FILL1_wght400_GRAD0_opsz48.svg'))
+        self.control_exposure_iso_button_up.setIconSize(QSize(80,80))
+        self.control_exposure_iso_button_up.clicked.connect(
+            self.__on_control_exposure_iso_button_up_clicked)
+        if parameters['iso'] == 4096:
+            self.control_exposure_iso_button_up.setEnabled(False)
+
+        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_button_up)
+        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_label)
+        control_exposure_iso_v_layout.addWidget(self.control_exposure_iso_button_down)
+
+        self.control_exposure_iso.setLayout(control_exposure_iso_v_layout)
+
+        control_exposure_h_layout.addWidget(self.control_exposure_shutter_speed)
+        control_exposure_h_layout.addWidget(self.control_exposure_iso)
+
+        self.control_exposure.setLayout(control_exposure_h_layout)
+
+        control_v_layout.addWidget(self.control_menu)
+        control_v_layout.addWidget(self.control_sharpness)
+        control_v_layout.addWidget(self.control_exposure)
+
+        self.control_shutter_button = QPushButton()
+        self.control_shutter_button.setFixedSize(160,160)
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.control_shutter_button.setIconSize(QSize(160,160))
+        self.control_shutter_button.clicked.connect(self.__on_control_shutter_button_clicked)
+
+        self.__shutter_clicked = False
+
+        control_v_layout.addWidget(self.control_shutter_button)
+
+        self.control.setLayout(control_v_layout)
+
+        window_h_layout.addWidget(self.panel)
+        window_h_layout.addWidget(self.control)
+
+        self.window.setLayout(window_h_layout)
+        self.setCentralWidget(self.window)
+
+        self.__journal = SessionJournal(
+            path.join(path.dirname(path.abspath(self.parameters['config'])), 'session.journal'))
+        self.__interrupted_session = self.__journal.recover()
+        index = self.__journal.index
+        media = self.parameters['media'] + 'DSCF'
+        # journal is trusted only if it points to the last image file
+        if index >= 0 and path.exists(media + str(index).zfill(4) + '.JPG') and \
+            not path.exists(media + str((index + 1) % 10000).zfill(4) + '.JPG'):
+            self.__index = index
+            self.panel_display.set_index(self.__index)
+        else:
+            images = glob.glob(self.parameters['media'] + 'DSCF????.JPG')
+            images.sort()
+            if len(images) == 0:
+                self.__index = -1
+                self.control_menu_photo_gallery_button.setEnabled(False)
+            else:
+                self.__index = int(re.search(r'\d+',images[len(images)-1]).group())
+                self.panel_display.set_index(self.__index)
+
+        cat = subprocess.Popen(['cat', '/boot/config.txt'], stdout=subprocess.PIPE)
+        self.__gpu_mem = int(subprocess.check_output(
+            ['grep', '-a', 'gpu_mem'],
+            stdin=cat.stdout).decode('utf-8').replace('gpu_mem=','').strip())
+
+        self.__sv_mem = round(psutil.virtual_memory().total/1024/1024)
+
+        self.__pijuice = PiJuice()
+        if self.__pijuice.config.GetFirmwareVersion() == {}:
+            self.__pijuice = None
+        else:
+            self.__thread = QThread()
+            monitor = HardwareButtonMonitor(self.__pijuice)
+            monitor.moveToThread(self.__thread)
+            self.__thread.started.connect(monitor.run)
+            monitor.clicked.connect(self.__on_control_shutter_button_clicked)
+            self.__thread.start()
+
+        self.__capturing_contrast = None
+        self.__capturing_white_balance = None
+        self.__capturing_saturation = None
+        self.__capturing_sharpness = None
+        self.__capturing_shutter_speed = None
+        self.__pipeline = None
+        self.source = None
+        self.__source_caps = None
+        self.__exif = None
+        self.__filesink = None
+        self.__preview = None
+        self.__tap_thread = QThread()
+        self.frame_tap = FrameTap()
+        self.frame_tap.moveToThread(self.__tap_thread)
+        self.__tap_thread.started.connect(self.frame_tap.run)
+        self.__tap_thread.start()
+        self.__stack_thread = None
+        self.__stack_worker = None
+        self.__timelapse_thread = None
+        self.__timelapse_worker = None
+        self.__raw_thread = None
+        self.__raw_worker = None
+        self.__sequence_thread = None
+        self.__sequence_engine = None
+        # scheduler thread waits until the exposure is applied on the main thread
+        self.exposure_requested.connect(self.__apply_exposure, Qt.BlockingQueuedConnection)
+        self.__burst_thread = QThread()
+        self.__burst = BurstRing(
+            self.parameters['media'], self.parameters['burst_memory']*1024*1024,
+            self.parameters['burst_post_ratio'])
+        self.__burst.moveToThread(self.__burst_thread)
+        self.__burst.saved.connect(self.__on_burst_saved)
+        self.__burst.flushed.connect(self.__on_burst_flushed)
+        self.__burst_thread.start()
+        self.__planetary_thread = QThread()
+        self.__planetary = PlanetaryCapture(
+            self.parameters['media'], self.parameters['planetary_region'],
+            self.parameters['planetary_keep'], self.parameters['planetary_frames'])
+        self.__planetary.moveToThread(self.__planetary_thread)
+        self.__planetary.progress.connect(self.__on_planetary_progress)
+        self.__planetary.finished.connect(self.__on_planetary_finished)
+        self.__planetary_thread.start()
+        self.__ser_thread = QThread()
+        self.__ser = SerWriter(
+            self.parameters['ser_memory']*1024*1024, self.parameters['ser_color'],
+            self.parameters['ser_frames'])
+        self.__ser.moveToThread(self.__ser_thread)
+        self.__ser_thread.started.connect(self.__ser.run)
+        self.__ser.finished.connect(self.__on_ser_finished)
+        self.__ser_thread.start()
+        self.__ser_frames = 0
+        self.__roi = None
+        self.__roi_resolution = None
+        self.__frame_interval = 1/30
+        self.__executor = ProcessingExecutor(
+            self.parameters['processes'], self.parameters['niceness'])
+        self.__focus = FocusAssist(
+            self.__executor, self.parameters['processes'], self.parameters['focus_stars'],
+            self.parameters['focus_interval'], self.parameters['focus_radius'],
+            self.parameters['focus_sigma'])
+        self.__focus_thread = QThread()
+        self.__focus.moveToThread(self.__focus_thread)
+        self.__focus_thread.started.connect(self.__focus.run)
+        self.__focus.measured.connect(self.__on_focus_measured)
+        self.__focus_thread.start()
+        self.__focus_text = ''
+        self.__histogram = HistogramMonitor(self.parameters['histogram_samples'])
+        self.__histogram.updated.connect(self.__on_histogram_updated)
+        self.__histogram_text = ''
+        self.__annotation_text = ''
+        self.__exposure = AutoExposure(
+            self.parameters['exposure_background'], self.parameters['exposure_peak'],
+            self.parameters['exposure_black'], self.parameters['exposure_max_shutter_speed'],
+            self.parameters['exposure_trials'])
+        self.__exposure.solved.connect(self.__on_exposure_solved)
+        self.__temperature = CPUTemperature().temperature
+        self.__capture_remaining = 0
+        self.__library = CalibrationLibrary(
+            path.join(path.dirname(path.abspath(self.parameters['config'])), 'calibration/'),
+            self.parameters['calibration_frames'],
+            self.parameters['calibration_temperature_step'],
+            self.parameters['memory_budget']*1024*1024)
+        self.__processor_thread = QThread()
+        self.__processor = CaptureProcessor(
+            self.parameters, self.__library, HotPixelMap(
+                path.dirname(path.abspath(self.parameters['config'])) + '/',
+                self.parameters['hot_pixel_sigma']), self.__executor)
+        self.__processor.moveToThread(self.__processor_thread)
+        self.captured.connect(self.__processor.process)
+        self.__processor.processed.connect(self.__on_capture_processed)
+        self.__trails = StarTrailCompositor(
+            self.parameters['media'],
+            path.join(path.dirname(path.abspath(self.parameters['config'])), 'trails.npz'),
+            self.parameters['trails_decay'], self.parameters['trails_checkpoint'])
+        # composite is updated on the processor thread after the image has been processed
+        self.__trails.moveToThread(self.__processor_thread)
+        self.__processor.processed.connect(self.__trails.add)
+        self.__trails.updated.connect(self.__on_trails_updated)
+        self.__trails.finished.connect(self.__on_trails_finished)
+        self.__meteors = MeteorDetector(
+            self.parameters['media'] + 'meteors.json', self.parameters['meteor_history'],
+            self.parameters['meteor_sigma'], self.parameters['meteor_length'])
+        self.__meteors.moveToThread(self.__processor_thread)
+        if self.parameters['meteor_detection']:
+            self.__processor.processed.connect(self.__meteors.add)
+        self.__meteors.detected.connect(self.__on_meteor_detected)
+        self.__gradients = GradientExtractor(self.parameters['gradient_degree'])
+        self.__processor_thread.start()
+        # records are flushed to the storage off the streaming thread and do not wait for
+        # processing of the captures
+        self.__journal_thread = QThread()
+        self.__journal.moveToThread(self.__journal_thread)
+        self.__journal_thread.start()
+        self.__capture_lock = threading.Lock()
+        self.__capture_frames = 0
+        self.__frames = 0
+        self.__encoded_frames = 0
+        self.__stats_frames = 0
+        self.__stats_encoded_frames = 0
+        self.__stats_timestamp = time.time()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def setup(self):
+        """Setups streaming pipeline
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.parameters['contrast'] == 0:
+            self.__capturing_contrast = 'normal'
+        elif self.parameters['contrast'] < 0:
+            self.__capturing_contrast = 'soft'
+        elif self.parameters['contrast'] > 0:
+            self.__capturing_contrast = 'hard'
+        if self.parameters['white_balance'] == 1:
+            self.__capturing_white_balance = 'daylight'
+        elif self.parameters['white_balance'] == 2:
+            self.__capturing_white_balance = 'cloudy'
+        elif self.parameters['white_balance'] == 3:
+            self.__capturing_white_balance = 'manual'
+        elif self.parameters['white_balance'] == 4:
+            self.__capturing_white_balance = 'tungsten'
+        elif self.parameters['white_balance'] == 5:
+            self.__capturing_white_balance = 'fluorescent'
+        elif self.parameters['white_balance'] == 6:
+            self.__capturing_white_balance = '"fluorescent h"'
+        elif self.parameters['white_balance'] == 7:
+            self.__capturing_white_balance = 'flash'
+        elif self.parameters['white_balance'] == 8:
+            self.__capturing_white_balance = 'manual'
+        elif self.parameters['white_balance'] == 9:
+            self.__capturing_white_balance = 'auto'
+        if self.parameters['saturation'] == 0:
+            self.__capturing_saturation = 'normal'
+        elif self.parameters['saturation'] < 0:
+            self.__capturing_saturation = 'low-saturation'
+        elif self.parameters['saturation'] > 0:
+            self.__capturing_saturation = 'high-saturation'
+        if self.parameters['sharpness'] == 0:
+            self.__capturing_sharpness = 'normal'
+        elif self.parameters['sharpness'] < 0:
+            self.__capturing_sharpness = 'soft'
+        elif self.parameters['sharpness'] > 0:
+            self.__capturing_sharpness = 'hard'
+        if parameters['shutter_speed'] == 0:
+            self.__capturing_shutter_speed = '0/1'
+        else:
+            exposure_time = parameters['shutter_speed'] / 1000000
+            if int(exposure_time) == 0:
+                self.__capturing_shutter_speed = '1/'+str(int(1/exposure_time))
+            else:
+                self.__capturing_shutter_speed = str(int(exposure_time)) + '/1'
+
+        self.__pipeline = Gst.parse_launch(
+            'rpicamsrc name=source preview=false fullscreen=false sensor-mode=3' +
+            ' annotation-text-size=' + str(self.parameters['annotation_text_size']) +
+            ' annotation-mode=' + str(self.parameters['annotation_mode']) +
+            ' sharpness=' + str(self.parameters['sharpness']) +
+            ' shutter-speed=' + str(self.parameters['shutter_speed']) +
+            ' analog-gain=' + str(self.parameters['iso']) +
+            ' contrast=' + str(self.parameters['contrast']) +
+            ' awb-mode=' + str(self.parameters['white_balance']) +
+            ' saturation=' + str(self.parameters['saturation']) +
+            ' ! capsfilter name=source-caps caps=video/x-raw' +
+            ',width=' + str(self.parameters['width']) +
+            ',height=' + str(self.parameters['height']) +
+            ' ! tee name=t ! valve name=preview drop=false ! queue ! videoconvert ! videoscale' +
+            ' ! video/x-raw,width=640,height=480' +
+            ' ! autovideosink sync=false t. ! queue leaky=downstream max-size-buffers=1' +
+            ' ! appsink name=tap sync=false drop=true max-buffers=1 emit-signals=false' +
+            ' t. ! queue name=capture-queue ! jpegenc quality=100' +
+            ' ! taginject name=exif tags="capturing-source=dsc' +
+            ',capturing-contrast=' + self.__capturing_contrast +
+            ',capturing-white-balance=' + self.__capturing_white_balance +
+            ',capturing-sharpness=' + self.__capturing_sharpness +
+            ',capturing-saturation=' + self.__capturing_saturation +
+            ',capturing-shutter-speed=' + self.__capturing_shutter_speed +
+            ',capturing-iso-speed=0" ! jifmux name=setter' +
+            ' ! multifilesink name=filesink post-messages=true sync=false ' +
+            'max-files=1 location=' + tempfile.gettempdir() + '/DSCFTEMP.JPG')
+        self.source = self.__pipeline.get_by_name('source')
+        self.__source_caps = self.__pipeline.get_by_name('source-caps')
+        self.__exif = self.__pipeline.get_by_name('exif')
+        Gst.TagSetter.set_tag_merge_mode(
+            self.__pipeline.get_by_name('setter'), Gst.TagMergeMode.REPLACE)
+        self.__filesink = self.__pipeline.get_by_name('filesink')
+        self.__preview = self.__pipeline.get_by_name('preview')
+        self.__source_caps.get_static_pad('src').add_probe(
+            Gst.PadProbeType.BUFFER, self.__on_frame_probe)
+        self.__pipeline.get_by_name('capture-queue').get_static_pad('sink').add_probe(
+            Gst.PadProbeType.BUFFER, self.__on_capture_probe)
+
+        self.frame_tap.set_sink(self.__pipeline.get_by_name('tap'))
+        if self.parameters['capture_mode'] == 'burst':
+            self.frame_tap.subscribe(self.__burst.on_frame)
+        elif self.parameters['capture_mode'] == 'focus':
+            self.__focus.start()
+            self.frame_tap.subscribe(self.__focus.on_frame)
+
+        bus =  self.__pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.enable_sync_message_emission()
+        bus.connect('sync-message::element', self.__on_sync_message)
+
+        self.__panel_control_stream_info_label_set_text()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def start(self):
+        """Start the video stream from the camera
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__pipeline.set_state(Gst.State.PLAYING)
+
+        GLib.timeout_add_seconds(1, self.__on_stats)
+
+        parameters['photo_camera'] = not parameters['photo_camera']
+        self.__on_control_menu_photo_gallery_button_clicked()
+
+        awb_mode = self.source.get_property('awb-mode') - 1
+        if awb_mode <= 0:
+            awb_mode = 9
+        self.source.set_property('awb-mode', awb_mode)
+        self.__on_panel_control_white_balance_button_clicked()
+
+        if self.__interrupted_session is not None:
+            plan, done, mode = self.__interrupted_session
+            self.__interrupted_session = None
+            self.parameters['capture_mode'] = mode
+            if mode == 'trails' and not self.__trails.resume():
+                # power was lost before the first checkpoint
+                self.__trails.start()
+            self.__shutter_clicked = True
+            self.control_shutter_button.setToolTip('Taking a picture')
+            self.control_shutter_button.setIcon(
+                QIcon(self.parameters['icons'] + 'circle_FILL1_wght400_GRAD0_opsz48.svg'))
+            self.__start_sequence(plan, done)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def gallery_pixmap(self, index, full=False):
+        """Gets pixmap of the image file selected by index, the processed one if it has been
+        saved, with the gradient of the sky removed if enabled
+
+        Args:
+            index (int): index of the image file
+            full (bool, optional): True to load full resolution image, False to load the
+                image reduced by the JPEG decoder for the display. Defaults to False.
+
+        Returns:
+            QPixmap: pixmap of the image
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index) + ', full=' + str(full)
+        logging.info(log)
+
+        file = image_file(self.parameters['media'], index)
+        if self.parameters['gradient_removal']:
+            image = self.__gradients.remove(file, None if full else (640, 480))
+            height, width = image.shape[:2]
+            result = QPixmap.fromImage(
+                QImage(image.data, width, height, 3*width, QImage.Format_RGB888))
+        else:
+            result = QPixmap(file)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+        return result
+
+
+    def panel_control_file_info_label_set_text(self, index):
+        """Sets File Info Label based on meta information of the image file selected by index
+
+        Args:
+            index (int): index of the image file
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        image = PIL.Image.open(image_file(self.parameters['media'], index))
+
+        if image._getexif() is None:
+            exif = {}
+        else:
+            exif = {
+                PIL.ExifTags.TAGS[k]: v
+                for k, v in image._getexif().items()
+                if k in PIL.ExifTags.TAGS
+            }
+
+        log = function_name + ': exif=' + str(exif)
+        logging.info(log)
+
+        if 'ExposureTime' in exif:
+            if str(exif['ExposureTime']) == '0.0':
+                shutter_speed = 'Auto"'
+            elif int(exif['ExposureTime']) == 0:
+                shutter_speed = '1/'+str(int(1/exif['ExposureTime']))+'"'
+            else:
+                shutter_speed = str(int(exif['ExposureTime'])) + '/1"'
+        else:
+            shutter_speed = ''
+        if 'ISOSpeedRatings' in exif:
+            iso = 'ISO '+str(exif['ISOSpeedRatings'])
+            if iso == 'ISO 0':
+                iso = 'ISO Auto'
+        else:
+            iso = ''
+        file = 'DSCF'+str(index).zfill(4) + '.JPG'
+        if BayerDecoder.contains(self.parameters['media'] + file):
+            file = file + '+RAW'
+        streaks = len(self.__meteors.segments(index))
+        self.panel_control_info_label.setText(
+            file + '\n'+str(image.width) + 'x' + str(image.height) +
+            '\n'+shutter_speed+'\n' + iso +
+            ('' if streaks == 0 else '\nStreaks ' + str(streaks)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def resolution_up(self):
+        """Handles Resolution increase
+
+        160x120 QQVGA -> 160x128
+        320x240 QVGA
+        640x480 VGA
+        800x600 SVGA -> 800x608
+        1024x768 XGA
+        1280x960 SXGA
+        1600x1200 UXGA
+        2048x1536 QXGA
+        3200x2400 QUXGA
+        4056x3040 MAX
+
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__clear_roi()
+
+        structure = self.__source_caps.get_property('caps').get_structure(0)
+        width = structure.get_value('width')
+        height = structure.get_value('height')
+
+        if (
+            (width < 4056 and self.__gpu_mem >= 512 and self.__sv_mem >= 2048-512-256) or
+            (width < 3200 and self.__gpu_mem >= 256 and self.__sv_mem >= 1024-256-128) or
+            (width < 2048 and self.__gpu_mem >= 128 and self.__sv_mem >= 512-128-64)):
+            if width == 3200:
+                width = 4056
+                height = 3040
+            elif width == 2048:
+                width = 3200
+                height = 2400
+            elif width == 1600:
+                width = 2048
+                height = 1536
+            elif width == 1280:
+                width = 1600
+                height = 1200
+            elif width == 1024:
+                width = 1280
+                height = 960
+            elif width == 800:
+                width = 1024
+                height = 768
+            elif width == 640:
+                width = 800
+                height = 608 # rounded to multiple of 16
+            elif width == 320:
+                width = 640
+                height = 480
+            elif width == 160:
+                width = 320
+                height = 240
+
+            log = function_name + ': width=' + str(width) + ', height=' + str(height)
+            logging.info(log)
+
+            self.__pipeline.set_state(Gst.State.NULL)
+            caps = Gst.Caps.new_empty_simple('video/x-raw')
+            caps.set_value('width', width)
+            caps.set_value('height', height)
+            self.__source_caps.set_property('caps', caps)
+            self.source.set_property('annotation-text-size', int(height/16))
+            self.__pipeline.set_state(Gst.State.PLAYING)
+            self.__panel_control_stream_info_label_set_text()
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+
+    def resolution_down(self):
+        """Handles resolution decrease
+
+        160x120 QQVGA -> 160x128
+        320x240 QVGA
+        640x480 VGA
+        800x608 SVGA -> 800x608
+        1024x768 XGA
+        1280x960 SXGA
+        1600x1200 UXGA
+        2048x1536 QXGA
+        3200x2400 QUXGA
+        4056x3040 MAX
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__clear_roi()
+
+        structure = self.__source_caps.get_property('caps').get_structure(0)
+        width = structure.get_value('width')
+        height = structure.get_value('height')
+
+        if width > 160:
+            if width == 320:
+                width = 160
+                height = 128 # rounded to multiple of 16
+            elif width == 640:
+                width = 320
+                height = 240
+            elif width == 800:
+                width = 640
+                height = 480
+            elif width == 1024:
+                width = 800
+                height = 608 # rounded to multiple of 16
+            elif width == 1280:
+                width = 1024
+                height = 768
+            elif width == 1600:
+                width = 1280
+                height = 960
+            elif width == 2048:
+                width = 1600
+                height = 1200
+            elif width == 3200:
+                width = 2048
+                height = 1536
+            elif width == 4056:
+                width = 3200
+                height = 2400
+
+            log = function_name + ': width=' + str(width) + ', height=' + str(height)
+            logging.info(log)
+
+            self.__pipeline.set_state(Gst.State.NULL)
+            caps = Gst.Caps.new_empty_simple('video/x-raw')
+            caps.set_value('width', width)
+            caps.set_value('height', height)
+            self.__source_caps.set_property('caps', caps)
+            self.source.set_property('annotation-text-size', int(height/16))
+            self.__pipeline.set_state(Gst.State.PLAYING)
+            self.__panel_control_stream_info_label_set_text()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def capture_mode_up(self):
+        """Selects next capture mode
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        modes = list(CameraScreen.CAPTURE_MODES)
+        self.__set_capture_mode(
+            modes[(modes.index(self.parameters['capture_mode']) + 1) % len(modes)])
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def capture_mode_down(self):
+        """Selects previous capture mode
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        modes = list(CameraScreen.CAPTURE_MODES)
+        self.__set_capture_mode(
+            modes[(modes.index(self.parameters['capture_mode']) - 1) % len(modes)])
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __set_capture_mode(self, mode):
+        """Sets capture mode
+
+        Args:
+            mode (str): capture mode
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': mode=' + mode
+        logging.info(log)
+
+        if not self.__shutter_clicked:
+            self.parameters['capture_mode'] = mode
+            if mode == 'burst':
+                self.frame_tap.subscribe(self.__burst.on_frame)
+            else:
+                self.frame_tap.unsubscribe(self.__burst.on_frame)
+                self.__burst.release()
+            if mode == 'focus':
+                self.__focus.start()
+                self.frame_tap.subscribe(self.__focus.on_frame)
+            else:
+                self.frame_tap.unsubscribe(self.__focus.on_frame)
+                self.__focus.stop()
+            if mode not in CameraScreen.ROI_MODES:
+                self.__clear_roi()
+                self.panel_display.setToolTip(
+                    'Swipe left or right to change resolution, up or down to change capture' +
+                    ' mode or double tap to toggle debug mode')
+            else:
+                self.panel_display.setToolTip(
+                    'Swipe left or right to change resolution, up or down to change capture' +
+                    ' mode or double tap to select region of interest')
+            self.panel_control_info_label.setText(
+                'Capture mode\n' + CameraScreen.CAPTURE_MODES[mode])
+            GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def select_roi(self, x, y):
+        """Crops the sensor to the region of interest centered at the tapped point
+
+        Output resolution is reduced in proportion to the region so that the pixel scale
+        is kept and the encoder and the frame tap process only the region.
+
+        Args:
+            x (int): horizontal position on the display
+            y (int): vertical position on the display
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': x=' + str(x) + ', y=' + str(y)
+        logging.info(log)
+
+        if not self.__shutter_clicked:
+            if self.__roi is None:
+                structure = self.__source_caps.get_property('caps').get_structure(0)
+                self.__roi_resolution = (
+                    structure.get_value('width'), structure.get_value('height'))
+                roi_x, roi_y = 0.0, 0.0
+                size = 1.0
+            else:
+                roi_x, roi_y, size, _ = self.__roi
+            # tap is relative to the region currently shown
+            center_x = roi_x + size*x/640
+            center_y = roi_y + size*y/480
+            size = self.parameters['roi_size']
+            roi_x = round(min(max(center_x - size/2, 0.0), 1.0 - size), 4)
+            roi_y = round(min(max(center_y - size/2, 0.0), 1.0 - size), 4)
+            self.__set_roi((roi_x, roi_y, size, size))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __clear_roi(self):
+        """Restores full field of view
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.__roi is not None:
+            self.__set_roi(None)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __set_roi(self, roi):
+        """Sets region of interest of the sensor and matching output resolution
+
+        Args:
+            roi (tuple): normalized x, y, width and height of the region or None for full field
+                of view
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': roi=' + str(roi)
+        logging.info(log)
+
+        width, height = self.__roi_resolution
+        if roi is None:
+            roi_x, roi_y, roi_w, roi_h = 0.0, 0.0, 1.0, 1.0
+            self.__roi_resolution = None
+        else:
+            roi_x, roi_y, roi_w, roi_h = roi
+            width = max(32, int(width*roi_w)//32*32)
+            height = max(16, int(height*roi_h)//16*16)
+        self.__roi = roi
+        self.__pipeline.set_state(Gst.State.NULL)
+        self.source.set_property('roi-x', roi_x)
+        self.source.set_property('roi-y', roi_y)
+        self.source.set_property('roi-w', roi_w)
+        self.source.set_property('roi-h', roi_h)
+        caps = Gst.Caps.new_empty_simple('video/x-raw')
+        caps.set_value('width', width)
+        caps.set_value('height', height)
+        self.__source_caps.set_property('caps', caps)
+        self.source.set_property('annotation-text-size', max(6, int(height/16)))
+        self.__pipeline.set_state(Gst.State.PLAYING)
+        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        if roi is None:
+            self.__panel_control_stream_info_label_set_text()
+        else:
+            self.panel_control_info_label.setText(
+                'ROI\n' + str(width) + 'x' + str(height) + '\n' +
+                str(round(roi_x, 2)) + ', ' + str(round(roi_y, 2)))
+            GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __capture_metadata(self):
+        """Gets metadata of the image being captured
+
+        Returns:
+            dict: capture metadata
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        structure = self.__source_caps.get_property('caps').get_structure(0)
+        mode = self.parameters['capture_mode']
+        result = {
+            'kind': mode if mode in ('dark', 'flat', 'bias') else 'light',
+            'mode': mode,
+            'timestamp': time.time(),
+            'model': self.parameters['model'],
+            'width': structure.get_value('width'),
+            'height': structure.get_value('height'),
+            'shutter_speed': self.source.get_property('shutter-speed'),
+            'analog_gain': self.source.get_property('analog-gain'),
+            'iso': int(self.source.get_property('analog-gain')*100/256),
+            'white_balance': self.__capturing_white_balance,
+            'awb_mode': self.source.get_property('awb-mode'),
+            'contrast': self.source.get_property('contrast'),
+            'sharpness': self.source.get_property('sharpness'),
+            'saturation': self.source.get_property('saturation'),
+            'temperature': self.__temperature,
+            'roi': self.__roi,
+            'binning': self.parameters['binning']
+        }
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    def __on_capture_processed(self, file, metadata):
+        """Refreshes the image once it has been post-processed
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        if 'processed' in metadata and not self.parameters['photo_camera'] and \
+            file == self.parameters['media'] + 'DSCF' + \
+            str(self.panel_display.get_index()).zfill(4) + '.JPG':
+            self.panel_display.setPixmap(
+                self.gallery_pixmap(self.panel_display.get_index()).scaled(640,480))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def stack_images(self, index):
+        """Stacks sequence of images ending at index in the background or cancels stacking
+        if it is already in progress
+
+        Args:
+            index (int): index of the last image file of the sequence
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        if self.__stack_thread is not None and self.__stack_thread.isRunning():
+            self.__stack_worker.cancel()
+            self.panel_control_info_label.setText('Cancelling')
+        else:
+            self.__stack_thread = QThread()
+            # images with streaks of meteors and satellites are left out of stacks
+            self.__stack_worker = StackWorker(
+                self.parameters, index, self.__executor, self.__meteors.flagged())
+            self.__stack_worker.moveToThread(self.__stack_thread)
+            self.__stack_thread.started.connect(self.__stack_worker.run)
+            self.__stack_worker.progress.connect(self.__on_stack_progress)
+            self.__stack_worker.finished.connect(self.__on_stack_finished)
+            self.__stack_worker.finished.connect(self.__stack_thread.quit)
+            self.__stack_thread.start()
+            self.panel_control_info_label.setText('Stacking')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_stack_progress(self, done, total):
+        """Shows stacking progress
+
+        Args:
+            done (int): number of processed frames
+            total (int): total number of frames to process
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': done=' + str(done) + ', total=' + str(total)
+        logging.info(log)
+
+        self.panel_control_info_label.setText('Stacking\n' + str(done) + '/' + str(total))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_stack_finished(self, index):
+        """Shows stacked image
+
+        Args:
+            index (int): index of the stacked image file or -1 if there was nothing to stack
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        if index >= 0:
+            self.__index = index
+            self.control_menu_photo_gallery_button.setEnabled(True)
+            if not self.parameters['photo_camera']:
+                self.panel_display.setPixmap(self.gallery_pixmap(index).scaled(640,480))
+                self.panel_display.set_index(index)
+                self.panel_display.set_zoom(False)
+        if self.parameters['photo_camera']:
+            self.__panel_control_stream_info_label_set_text()
+        else:
+            self.panel_control_file_info_label_set_text(self.panel_display.get_index())
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def build_timelapse(self, index):
+        """Builds timelapse video of sequence of images ending at index in the background
+        or cancels building if it is already in progress
+
+        Args:
+            index (int): index of the last image file of the sequence
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        if self.__timelapse_thread is not None and self.__timelapse_thread.isRunning():
+            self.__timelapse_worker.cancel()
+            self.panel_control_info_label.setText('Cancelling')
+        else:
+            self.__timelapse_thread = QThread()
+            self.__timelapse_worker = TimelapseWorker(self.parameters, index)
+            self.__timelapse_worker.moveToThread(self.__timelapse_thread)
+            self.__timelapse_thread.started.connect(self.__timelapse_worker.run)
+            self.__timelapse_worker.progress.connect(self.__on_timelapse_progress)
+            self.__timelapse_worker.finished.connect(self.__on_timelapse_finished)
+            self.__timelapse_worker.finished.connect(self.__timelapse_thread.quit)
+            self.__timelapse_thread.start()
+            self.panel_control_info_label.setText('Timelapse')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_timelapse_progress(self, done, total):
+        """Shows timelapse progress
+
+        Args:
+            done (int): number of encoded frames
+            total (int): total number of frames to encode
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': done=' + str(done) + ', total=' + str(total)
+        logging.info(log)
+
+        self.panel_control_info_label.setText('Timelapse\n' + str(done) + '/' + str(total))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_timelapse_finished(self, file):
+        """Shows the name of the saved timelapse video
+
+        Args:
+            file (str): path of the video file or empty string if nothing has been saved
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
+        logging.info(log)
+
+        if file:
+            self.panel_control_info_label.setText('Timelapse\n' + path.basename(file))
+        else:
+            self.panel_control_info_label.setText('Timelapse\nnot saved')
+        if self.parameters['photo_camera']:
+            GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_contrast_button_down_clicked(self):
+        """Handles contrast decrease
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        contrast = int(self.source.get_property('contrast')) - 10
+
+        log = function_name + ': contrast=' + str(contrast)
+        logging.info(log)
+
+        if contrast > -110:
+            self.panel_control_contrast_button_up.setEnabled(True)
+            if contrast == -100:
+                self.panel_control_contrast_button_down.setEnabled(False)
+            self.panel_control_contrast_label.setText(str(contrast))
+            self.source.set_property('contrast', contrast)
+            if contrast == 0:
+                self.__capturing_contrast = 'normal'
+            elif contrast < 0:
+                self.__capturing_contrast = 'soft'
+            elif contrast > 0:
+                self.__capturing_contrast = 'hard'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_contrast_button_up_clicked(self):
+        """Handles contrast increase
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        contrast = int(self.source.get_property('contrast')) + 10
+
+        log = function_name + ': contrast=' + str(contrast)
+        logging.info(log)
+
+        if contrast < 110:
+            self.panel_control_contrast_button_down.setEnabled(True)
+            if contrast == 100:
+                self.panel_control_contrast_button_up.setEnabled(False)
+            self.panel_control_contrast_label.setText(str(contrast))
+            self.source.set_property('contrast', contrast)
+            if contrast == 0:
+                self.__capturing_contrast = 'normal'
+            elif contrast < 0:
+                self.__capturing_contrast = 'soft'
+            elif contrast > 0:
+                self.__capturing_contrast = 'hard'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_white_balance_button_clicked(self):
+        """Handles white balance control
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        awb_mode = self.source.get_property('awb-mode')
+
+        log = function_name + ': awb_mode=' + str(awb_mode)
+        logging.info(log)
+
+        if awb_mode == 1:
+            self.panel_control_white_balance_button.setToolTip(
+                'Sunlight white balance mode')
+            self.panel_control_white_balance_button.setIcon(
+                QIcon(self.parameters['icons'] + 'wb_sunny_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 2)
+            self.__capturing_white_balance = 'daylight'
+        elif awb_mode == 2:
+            self.panel_control_white_balance_button.setToolTip(
+                'Cloudy white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'cloudy_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 3)
+            self.__capturing_white_balance = 'cloudy'
+        elif awb_mode == 3:
+            self.panel_control_white_balance_button.setToolTip(
+                'Shade white balance mode')
+            self.panel_control_white_balance_button.setIcon(
+                QIcon(self.parameters['icons'] + 'wb_shade_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 4)
+            self.__capturing_white_balance = 'manual'
+        elif awb_mode == 4:
+            self.panel_control_white_balance_button.setToolTip(
+                'Tungsten white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'emoji_objects_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 5)
+            self.__capturing_white_balance = 'tungsten'
+        elif awb_mode == 5:
+            self.panel_control_white_balance_button.setToolTip(
+                'Fluorescent white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'fluorescent_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 6)
+            self.__capturing_white_balance = 'fluorescent'
+        elif awb_mode == 6:
+            self.panel_control_white_balance_button.setToolTip(
+                'Incadescent white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'wb_incandescent_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 7)
+            self.__capturing_white_balance = '"fluorescent h"'
+        elif awb_mode == 7:
+            self.panel_control_white_balance_button.setToolTip(
+                'Flash white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'flash_on_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 8)
+            self.__capturing_white_balance = 'flash'
+        elif awb_mode == 8:
+            self.panel_control_white_balance_button.setToolTip(
+                'Horizon white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'wb_twilight_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 9)
+            self.__capturing_white_balance = 'manual'
+        elif awb_mode == 9:
+            self.panel_control_white_balance_button.setToolTip(
+                'Auto white balance mode')
+            self.panel_control_white_balance_button.setIcon(QIcon(
+                self.parameters['icons'] + 'wb_auto_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.source.set_property('awb-mode', 1)
+            self.__capturing_white_balance = 'auto'
+
+        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_saturation_button_down_clicked(self):
+        """Handles sturation decrease
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        saturation = self.source.get_property('saturation') - 10
+
+        log = function_name + ': saturation=' + str(saturation)
+        logging.info(log)
+
+        if saturation > -110:
+            self.panel_control_saturation_button_up.setEnabled(True)
+            if saturation == -100:
+                self.panel_control_saturation_button_down.setEnabled(False)
+            self.panel_control_saturation_label.setText(str(saturation))
+            self.source.set_property('saturation', saturation)
+            if saturation == 0:
+                self.__capturing_saturation = 'normal'
+            elif saturation < 0:
+                self.__capturing_saturation = 'low-saturation'
+            elif saturation > 0:
+                self.__capturing_saturation = 'high-saturation'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_saturation_button_up_clicked(self):
+        """Handles saturation increase
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        saturation = self.source.get_property('saturation') + 10
+
+        log = function_name + ': saturation=' + str(saturation)
+        logging.info(log)
+
+        if saturation < 110:
+            self.panel_control_saturation_button_down.setEnabled(True)
+            if saturation == 100:
+                self.panel_control_saturation_button_up.setEnabled(False)
+            self.panel_control_saturation_label.setText(str(saturation))
+            self.source.set_property('saturation', saturation)
+            if saturation == 0:
+                self.__capturing_saturation = 'normal'
+            elif saturation < 0:
+                self.__capturing_saturation = 'low-saturation'
+            elif saturation > 0:
+                self.__capturing_saturation = 'high-saturation'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_panel_control_delete_button_clicked(self):
+        """Handles images delete
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if not self.parameters['photo_camera']:
+            self.__index = self.panel_display.get_index()
+        images = glob.glob(self.parameters['media'] + 'DSCF????.JPG')
+        images.sort()
+        index = images.index(self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.JPG')
+        for file in glob.glob(self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4)+'.*'):
+            os.remove(file)
+        if len(images) == 1:
+            self.__index = -1
+            if not self.parameters['photo_camera']:
+                self.panel_display.set_index(self.__index)
+                self.__on_control_menu_photo_gallery_button_clicked()
+            self.control_menu_photo_gallery_button.setEnabled(False)
+        else:
+            if index + 1 == len(images):
+                index = len(images) - 2
+            else:
+                index = index + 1
+            self.__index = int(re.search(r'\d+', images[index]).group())
+            if not self.parameters['photo_camera']:
+                self.panel_display.setPixmap(
+                    self.gallery_pixmap(self.__index).scaled(640,480))
+                self.panel_display.set_index(self.__index)
+                self.panel_display.set_zoom(False)
+            self.panel_control_file_info_label_set_text(self.__index)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_menu_photo_gallery_button_clicked(self):
+        """Toggles between Photo Gallery and Photo Camera
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.parameters['photo_camera']:
+            self.parameters['photo_camera'] = False
+            if self.__sequence_engine is None:
+                self.__pipeline.set_state(Gst.State.NULL)
+            else:
+                # a running sequence keeps capturing, only the preview stops painting
+                self.__preview.set_property('drop', True)
+            self.panel_display.setToolTip(
+                'Swipe left or right to select an image, swipe up to stack a sequence' +
+                ', down to build a timelapse or double tap to zoom in')
+            self.control_menu_photo_gallery_button.setToolTip('Photo camera')
+            self.control_menu_photo_gallery_button.setIcon(
+                QIcon(self.parameters['icons'] + 'photo_camera_FILL0_wght400_GRAD0_opsz48.svg'))
+
+            self.panel_display.setPixmap(self.gallery_pixmap(self.__index).scaled(640,480))
+            self.panel_display.set_index(self.__index)
+            self.panel_display.set_zoom(False)
+            self.control_shutter_button.setIcon(
+                QIcon(self.parameters['icons'] + 'delete_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.control_shutter_button.setToolTip('Delete a image')
+            CameraScreen.reconnect(
+                self.control_shutter_button.clicked,
+                self.__on_control_shutter_button_clicked,
+                self.__on_panel_control_delete_button_clicked)
+            self.panel_control_file_info_label_set_text(self.__index)
+        else:
+            self.parameters['photo_camera'] = True
+            self.__preview.set_property('drop', False)
+            self.__pipeline.set_state(Gst.State.PLAYING)
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+            self.panel_display.setToolTip(
+                'Swipe left or right to change resolution, up or down to change capture mode' +
+            ' or double tap to toggle debug mode')
+            self.control_menu_photo_gallery_button.setToolTip('Photo gallery')
+            self.control_menu_photo_gallery_button.setIcon(
+                QIcon(self.parameters['icons'] + 'photo_library_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.__index = self.panel_display.get_index()
+            if self.__shutter_clicked:
+                self.control_shutter_button.setIcon(
+                    QIcon(self.parameters['icons'] + 'circle_FILL1_wght400_GRAD0_opsz48.svg'))
+                self.control_shutter_button.setToolTip('Taking a picture')
+            else:
+                self.control_shutter_button.setIcon(
+                    QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+                self.control_shutter_button.setToolTip('Take a picture')
+            CameraScreen.reconnect(
+                self.control_shutter_button.clicked,
+                self.__on_panel_control_delete_button_clicked,
+                self.__on_control_shutter_button_clicked)
+            self.__panel_control_stream_info_label_set_text()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_menu_debug_mode_button_clicked(self):
+        """Toggles between Photo Gallery and Photo Camera
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        annotation_mode = self.source.get_property('annotation-mode')
+
+        log = function_name + ': annotation_mode=' + str(annotation_mode)
+        logging.info(log)
+
+        if annotation_mode == 0x00000000:
+            self.source.set_property('annotation-mode', 0x0000065D)
+            self.control_menu_exit_button.setIcon(
+                QIcon(self.parameters['icons'] + 'analytics_FILL1_wght400_GRAD0_opsz48.svg'))
+        else:
+            self.source.set_property('annotation-mode', 0x00000000)
+            self.control_menu_exit_button.setIcon(
+                QIcon(self.parameters['icons'] + 'analytics_FILL0_wght400_GRAD0_opsz48.svg'))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __write_parameters(self):
+        """Saves parameters to the config file
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.source is not None and self.__source_caps is not None:
+            structure = self.__source_caps.get_property('caps').get_structure(0)
+
+            if self.__roi_resolution is None:
+                self.parameters['width'] = structure.get_value('width')
+                self.parameters['height'] = structure.get_value('height')
+            else:
+                self.parameters['width'], self.parameters['height'] = self.__roi_resolution
+            self.parameters['sharpness'] = self.source.get_property('sharpness')
+            self.parameters['shutter_speed'] = self.source.get_property('shutter-speed')
+            self.parameters['iso'] = self.source.get_property('analog-gain')
+            self.parameters['contrast'] = self.source.get_property('contrast')
+            self.parameters['white_balance'] = self.source.get_property('awb-mode')
+            self.parameters['saturation'] = self.source.get_property('saturation')
+            self.parameters['annotation_mode'] = self.source.get_property('annotation-mode')
+            self.parameters['annotation_text_size'] = self.source.get_property(
+                'annotation-text-size')
+
+            with open(self.parameters['config'], 'w') as config:
+                config.write(json.dumps(self.parameters))
+            os.sync()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_menu_quit_button_clicked(self):
+        """Closes the application
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__write_parameters()
+        # stacks and composites are not journaled as captures
+        self.__journal.save_index(next_image_index(self.parameters['media']) - 1)
+        self.__journal_thread.quit()
+        self.__journal_thread.wait()
+
+        self.__executor.shutdown()
+
+        self.__parent.quit()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_menu_shutdown_button_clicked(self):
+        """Closes the application
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        self.__write_parameters()
+        self.__journal.save_index(next_image_index(self.parameters['media']) - 1)
+
+        os.system('sudo shutdown -h now')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_sharpness_button_down_clicked(self):
+        """Handles sharpness decrease
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        sharpness = int(self.source.get_property('sharpness')) - 10
+
+        log = function_name + ': sharpness=' + str(sharpness)
+        logging.info(log)
+
+        if sharpness > -110:
+            self.control_sharpness_button_up.setEnabled(True)
+            if sharpness == -100:
+                self.control_sharpness_button_down.setEnabled(False)
+            self.control_sharpness_label.setText(str(sharpness))
+            self.source.set_property('sharpness', sharpness)
+            if sharpness == 0:
+                self.__capturing_sharpness = 'normal'
+            elif sharpness < 0:
+                self.__capturing_sharpness = 'soft'
+            elif sharpness > 0:
+                self.__capturing_sharpness = 'hard'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_sharpness_button_up_clicked(self):
+        """Handles sharpness increase
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        sharpness = int(self.source.get_property('sharpness')) + 10
+
+        log = function_name + ': sharpness=' + str(sharpness)
+        logging.info(log)
+
+        if sharpness < 110:
+            self.control_sharpness_button_down.setEnabled(True)
+            if sharpness == 100:
+                self.control_sharpness_button_up.setEnabled(False)
+            self.control_sharpness_label.setText(str(sharpness))
+            self.source.set_property('sharpness', sharpness)
+            if sharpness == 0:
+                self.__capturing_sharpness = 'normal'
+            elif sharpness < 0:
+                self.__capturing_sharpness = 'soft'
+            elif sharpness > 0:
+                self.__capturing_sharpness = 'hard'
+            self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __panel_control_stream_info_label_set_text(self):
+        """Sets stream information
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+
+        if self.parameters['photo_camera']:
+            structure = self.__source_caps.get_property('caps').get_structure(0)
+
+            exposure_time = self.source.get_property('shutter-speed')
+            if exposure_time == 0:
+                shutter_speed = 'Auto'
+            else:
+                exposure_time = exposure_time / 1000000
+                if int(exposure_time) == 0:
+                    shutter_speed = '1/' + str(int(1/exposure_time))
+                else:
+                    shutter_speed = str(int(exposure_time)) + '/1'
+
+            analog_gain = self.source.get_property('analog-gain')
+            if analog_gain == 0:
+                iso = 'Auto'
+            else:
+                iso = str(int(analog_gain*100/256))
+            self.panel_control_info_label.setText(
+                self.parameters['model'] + '\n' + str(structure.get_value('width')) + 'x' +
+                str(structure.get_value('height')) + '\n' + shutter_speed + '"\nISO ' + iso)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_exposure_shutter_speed_button_up_clicked(self):
+        """Handles increase of shutter speed
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        shutter_speed = self.source.get_property('shutter-speed')
+        if shutter_speed < 100:
+            shutter_speed = 100
+            self.__capturing_shutter_speed = '1/10000'
+        elif shutter_speed < 111:
+            shutter_speed = 111
+            self.__capturing_shutter_speed = '1/9000'
+        elif shutter_speed < 125:
+            shutter_speed = 125
+            self.__capturing_shutter_speed = '1/8000'
+        elif shutter_speed < 143:
+            shutter_speed = 143
+            self.__capturing_shutter_speed = '1/7000'
+        elif shutter_speed < 167:
+            shutter_speed = 167
+            self.__capturing_shutter_speed = '1/6000'
+        elif shutter_speed < 200:
+            shutter_speed = 200
+            self.__capturing_shutter_speed = '1/5000'
+        elif shutter_speed < 250:
+            shutter_speed = 250
+            self.__capturing_shutter_speed = '1/4000'
+        elif shutter_speed < 333:
+            shutter_speed = 333
+            self.__capturing_shutter_speed = '1/3000'
+        elif shutter_speed < 500:
+            shutter_speed = 500
+            self.__capturing_shutter_speed = '1/2000'
+        elif shutter_speed < 1000:
+            shutter_speed = 1000
+            self.__capturing_shutter_speed = '1/1000'
+        elif shutter_speed < 1111:
+            shutter_speed = 1111
+            self.__capturing_shutter_speed = '1/900'
+        elif shutter_speed < 1250:
+            shutter_speed = 1250
+            self.__capturing_shutter_speed = '1/800'
+        elif shutter_speed < 1429:
+            shutter_speed = 1429
+            self.__capturing_shutter_speed = '1/700'
+        elif shutter_speed < 1667:
+            shutter_speed = 1667
+            self.__capturing_shutter_speed = '1/600'
+        elif shutter_speed < 2000:
+            shutter_speed = 2000
+            self.__capturing_shutter_speed = '1/500'
+        elif shutter_speed < 2500:
+            shutter_speed = 2500
+            self.__capturing_shutter_speed = '1/400'
+        elif shutter_speed < 3333:
+            shutter_speed = 3333
+            self.__capturing_shutter_speed = '1/300'
+        elif shutter_speed < 5000:
+            shutter_speed = 5000
+            self.__capturing_shutter_speed = '1/200'
+        elif shutter_speed < 10000:
+            shutter_speed = 10000
+            self.__capturing_shutter_speed = '1/100'
+        elif shutter_speed < 11111:
+            shutter_speed = 11111
+            self.__capturing_shutter_speed = '1/90'
+        elif shutter_speed < 12500:
+            shutter_speed = 12500
+            self.__capturing_shutter_speed = '1/80'
+        elif shutter_speed < 14286:
+            shutter_speed = 14286
+            self.__capturing_shutter_speed = '1/70'
+        elif shutter_speed < 16667:
+            shutter_speed = 16667
+            self.__capturing_shutter_speed = '1/60'
+        elif shutter_speed < 20000:
+            shutter_speed = 20000
+            self.__capturing_shutter_speed = '1/50'
+        elif shutter_speed < 25000:
+            shutter_speed = 25000
+            self.__capturing_shutter_speed = '1/40'
+        elif shutter_speed < 33333:
+            shutter_speed = 33333
+            self.__capturing_shutter_speed = '1/30'
+        elif shutter_speed < 50000:
+            shutter_speed = 50000
+            self.__capturing_shutter_speed = '1/20'
+        elif shutter_speed < 100000:
+            shutter_speed = 100000
+            self.__capturing_shutter_speed = '1/10'
+        elif shutter_speed < 111111:
+            shutter_speed = 111111
+            self.__capturing_shutter_speed = '1/9'
+            if self.parameters['photo_camera']:
+                self.__pipeline.set_state(Gst.State.NULL)
+                self.__pipeline.set_state(Gst.State.PLAYING)
+        elif shutter_speed < 125000:
+            shutter_speed = 125000
+            self.__capturing_shutter_speed = '1/8'
+        elif shutter_speed < 142857:
+            shutter_speed = 142857
+            self.__capturing_shutter_speed = '1/7'
+        elif shutter_speed < 166667:
+            shutter_speed = 166667
+            self.__capturing_shutter_speed = '1/6'
+        elif shutter_speed < 200000:
+            shutter_speed = 200000
+            self.__capturing_shutter_speed = '1/5'
+        elif shutter_speed < 250000:
+            shutter_speed = 250000
+            self.__capturing_shutter_speed = '1/4'
+        elif shutter_speed < 333333:
+            shutter_speed = 333333
+            self.__capturing_shutter_speed = '1/3'
+        elif shutter_speed < 500000:
+            shutter_speed = 500000
+            self.__capturing_shutter_speed = '1/2'
+        elif shutter_speed < 1000000:
+            shutter_speed = 1000000
+            self.__capturing_shutter_speed = '1/1'
+        elif shutter_speed < 22000000:
+            shutter_speed = shutter_speed + 1000000
+            self.__capturing_shutter_speed = \
+                str(int(shutter_speed/1000000)) + '/1'
+            if shutter_speed in (2000000, 7000000) and self.parameters['photo_camera']:
+                self.__pipeline.set_state(Gst.State.NULL)
+                self.__pipeline.set_state(Gst.State.PLAYING)
+        else:
+            self.control_exposure_shutter_speed_button_up.setEnabled(False)
+
+        log = function_name + ': shutter_speed=' + str(shutter_speed)
+        logging.info(log)
+
+        self.source.set_property('shutter-speed', shutter_speed)
+        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        self.control_exposure_shutter_speed_label.setText(
+            self.__capturing_shutter_speed + '"')
+        self.__panel_control_stream_info_label_set_text()
+        self.control_exposure_shutter_speed_button_down.setEnabled(True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_exposure_shutter_speed_button_down_clicked(self):
+        """Handles decrease of shutter speed
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        shutter_speed = self.source.get_property('shutter-speed')
+        if shutter_speed > 1000000:
+            shutter_speed = shutter_speed - 1000000
+            self.__capturing_shutter_speed = str(
+                int(shutter_speed/1000000)) + '/1'
+            if shutter_speed in (1000000, 6000000) and self.parameters['photo_camera']:
+                self.__pipeline.set_state(Gst.State.NULL)
+                self.__pipeline.set_state(Gst.State.PLAYING)
+        elif shutter_speed > 500000:
+            shutter_speed = 500000
+            self.__capturing_shutter_speed = '1/2'
+        elif shutter_speed > 333333:
+            shutter_speed = 333333
+            self.__capturing_shutter_speed = '1/3'
+        elif shutter_speed > 250000:
+            shutter_speed = 250000
+            self.__capturing_shutter_speed = '1/4'
+        elif shutter_speed > 200000:
+            shutter_speed = 200000
+            self.__capturing_shutter_speed = '1/5'
+        elif shutter_speed > 166667:
+            shutter_speed = 166667
+            self.__capturing_shutter_speed = '1/6'
+        elif shutter_speed > 142857:
+            shutter_speed = 142857
+            self.__capturing_shutter_speed = '1/7'
+        elif shutter_speed > 125000:
+            shutter_speed = 125000
+            self.__capturing_shutter_speed = '1/8'
+        elif shutter_speed > 111111:
+            shutter_speed = 111111
+            self.__capturing_shutter_speed = '1/9'
+        elif shutter_speed > 100000:
+            shutter_speed = 100000
+            self.__capturing_shutter_speed = '1/10'
+        elif shutter_speed > 50000:
+            shutter_speed = 50000
+            self.__capturing_shutter_speed = '1/20'
+        elif shutter_speed > 33333:
+            shutter_speed = 33333
+            self.__capturing_shutter_speed = '1/30'
+        elif shutter_speed > 25000:
+            shutter_speed = 25000
+            self.__capturing_shutter_speed = '1/40'
+        elif shutter_speed > 20000:
+            shutter_speed = 20000
+            self.__capturing_shutter_speed = '1/50'
+        elif shutter_speed > 16667:
+            shutter_speed = 16667
+            self.__capturing_shutter_speed = '1/60'
+        elif shutter_speed > 14286:
+            shutter_speed = 14286
+            self.__capturing_shutter_speed = '1/70'
+        elif shutter_speed > 12500:
+            shutter_speed = 12500
+            self.__capturing_shutter_speed = '1/80'
+        elif shutter_speed > 11111:
+            shutter_speed = 11111
+            self.__capturing_shutter_speed = '1/90'
+        elif shutter_speed > 10000:
+            shutter_speed = 10000
+            self.__capturing_shutter_speed = '1/100'
+        elif shutter_speed > 5000:
+            shutter_speed = 5000
+            self.__capturing_shutter_speed = '1/200'
+        elif shutter_speed > 3333:
+            shutter_speed = 3333
+            self.__capturing_shutter_speed = '1/300'
+        elif shutter_speed > 2500:
+            shutter_speed = 2500
+            self.__capturing_shutter_speed = '1/400'
+        elif shutter_speed > 2000:
+            shutter_speed = 2000
+            self.__capturing_shutter_speed = '1/500'
+        elif shutter_speed > 1667:
+            shutter_speed = 1667
+            self.__capturing_shutter_speed = '1/600'
+        elif shutter_speed > 1429:
+            shutter_speed = 1429
+            self.__capturing_shutter_speed = '1/700'
+        elif shutter_speed > 1250:
+            shutter_speed = 1250
+            self.__capturing_shutter_speed = '1/800'
+        elif shutter_speed > 1111:
+            shutter_speed = 1111
+            self.__capturing_shutter_speed = '1/900'
+        elif shutter_speed > 1000:
+            shutter_speed = 1000
+            self.__capturing_shutter_speed = '1/1000'
+        elif shutter_speed > 500:
+            shutter_speed = 500
+            self.__capturing_shutter_speed = '1/2000'
+        elif shutter_speed > 333:
+            shutter_speed = 333
+            self.__capturing_shutter_speed = '1/3000'
+        elif shutter_speed > 250:
+            shutter_speed = 250
+            self.__capturing_shutter_speed = '1/4000'
+        elif shutter_speed > 200:
+            shutter_speed = 200
+            self.__capturing_shutter_speed = '1/5000'
+        elif shutter_speed > 167:
+            shutter_speed = 167
+            self.__capturing_shutter_speed = '1/6000'
+        elif shutter_speed > 143:
+            shutter_speed = 143
+            self.__capturing_shutter_speed = '1/7000'
+        elif shutter_speed > 125:
+            shutter_speed = 125
+            self.__capturing_shutter_speed = '1/8000'
+        elif shutter_speed > 111:
+            shutter_speed = 111
+            self.__capturing_shutter_speed = '1/9000'
+        elif shutter_speed > 100:
+            shutter_speed = 100
+            self.__capturing_shutter_speed = '1/10000'
+        elif shutter_speed == 100:
+            shutter_speed = 0
+            self.__capturing_shutter_speed = '0/1'
+            self.control_exposure_shutter_speed_button_down.setEnabled(False)
+
+        log = function_name + ': shutter_speed=' + str(shutter_speed)
+        logging.info(log)
+
+        self.source.set_property('shutter-speed', shutter_speed)
+        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
+        self.__panel_control_stream_info_label_set_text()
+        if self.__capturing_shutter_speed == '0/1':
+            self.control_exposure_shutter_speed_label.setText('Auto"')
+        else:
+            self.control_exposure_shutter_speed_label.setText(
+                self.__capturing_shutter_speed+'"')
+        self.control_exposure_shutter_speed_button_up.setEnabled(True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_exposure_iso_button_up_clicked(self):
+        """Handles ISO increase
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        analog_gain = self.source.get_property('analog-gain') + 256
+
+        log = function_name + ': analog_gain=' + str(analog_gain)
+        logging.info(log)
+
+        if analog_gain == 4096:
+            self.control_exposure_iso_button_up.setEnabled(False)
+        self.source.set_property('analog-gain', analog_gain)
+        iso = str(int(analog_gain*100/256))
+        self.__set_exif(iso)
+        self.control_exposure_iso_label.setText('ISO ' + iso)
+        self.__panel_control_stream_info_label_set_text()
+        self.control_exposure_iso_button_down.setEnabled(True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_exposure_iso_button_down_clicked(self):
+        """Handles ISO decrease
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        analog_gain = self.source.get_property('analog-gain') - 256
+
+        log = function_name = ': analog_gain=' + str(analog_gain)
+        logging.info(log)
+
+        self.source.set_property('analog-gain', analog_gain)
+        if analog_gain == 0:
+            self.control_exposure_iso_label.setText('ISO Auto')
+            self.control_exposure_iso_button_down.setEnabled(False)
+            iso = '0'
+        else:
+            iso = str(int(analog_gain*100/256))
+            self.control_exposure_iso_label.setText('ISO ' + iso)
+
+        self.__set_exif(iso)
+        self.__panel_control_stream_info_label_set_text()
+        self.control_exposure_iso_button_up.setEnabled(True)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_control_shutter_button_clicked(self):
+        """Handles taking a picture
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.__sequence_engine is not None:
+            self.__sequence_engine.cancel()
+            self.panel_control_info_label.setText('Cancelling')
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.__ser.active:
+            self.__ser.stop()
+            self.panel_control_info_label.setText('Saving')
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.__planetary.active:
+            self.__planetary.stop()
+            self.panel_control_info_label.setText('Saving')
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.__shutter_clicked and self.parameters['capture_mode'] == 'exposure':
+            self.__exposure.stop()
+            self.frame_tap.unsubscribe(self.__exposure.on_frame)
+            self.__shutter_clicked = False
+            self.control_shutter_button.setToolTip('Take a picture')
+            self.control_shutter_button.setIcon(
+                QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.panel_control_info_label.setText('Auto exposure\ncancelled')
+            GLib.timeout_add_seconds(1, self.__on_toast)
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.__shutter_clicked:
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.parameters['capture_mode'] == 'focus':
+            self.__focus.start()
+            self.panel_control_info_label.setText('Focus assist\nBest reset')
+            GLib.timeout_add_seconds(1, self.__on_toast)
+            log = function_name + ': exit'
+            logging.info(log)
+            return
+        if self.parameters['capture_mode'] in ('dark', 'flat', 'bias'):
+            self.__capture_remaining = self.parameters['calibration_frames']
+        else:
+            self.__capture_remaining = 1
+        self.__shutter_clicked = True
+        if self.parameters['capture_mode'] == 'raw':
+            self.__capture_raw()
+        elif self.parameters['capture_mode'] in ('sequence', 'trails'):
+            if self.parameters['capture_mode'] == 'trails':
+                self.__trails.start()
+            self.__start_sequence(self.parameters['sequence'])
+        elif self.parameters['capture_mode'] == 'burst':
+            if not self.__burst.trigger(self.__capture_metadata()):
+                self.__shutter_clicked = False
+                log = function_name + ': exit'
+                logging.info(log)
+                return
+            self.panel_control_info_label.setText('Burst')
+        elif self.parameters['capture_mode'] == 'exposure':
+            # automatic settings are replaced by known ones the levels can be scaled from
+            shutter_speed = self.source.get_property('shutter-speed') or 1000000
+            analog_gain = self.source.get_property('analog-gain') or \
+                AutoExposure.MIN_ANALOG_GAIN
+            self.__apply_exposure(shutter_speed, analog_gain)
+            self.__exposure.start(shutter_speed, analog_gain)
+            self.frame_tap.subscribe(self.__exposure.on_frame)
+            self.panel_control_info_label.setText('Auto exposure\nTest frame 1')
+        elif self.parameters['capture_mode'] == 'planetary':
+            self.__planetary.start()
+            self.frame_tap.subscribe(self.__planetary.on_frame)
+            self.panel_control_info_label.setText('Planetary')
+        elif self.parameters['capture_mode'] == 'video':
+            videos = sorted(glob.glob(self.parameters['media'] + 'VID????.SER'))
+            index = 0
+            if len(videos) > 0:
+                index = (int(re.search(r'\d+', path.basename(videos[-1])).group()) + 1) % 10000
+            self.__ser_frames = self.__frames
+            self.__ser.start(
+                self.parameters['media'] + 'VID' + str(index).zfill(4) + '.SER',
+                str(self.parameters['model']))
+            self.frame_tap.subscribe(self.__ser.on_frame)
+            self.panel_control_info_label.setText('Recording')
+        else:
+            self.__arm_capture(self.__capture_remaining)
+        self.control_shutter_button.setToolTip('Taking a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL1_wght400_GRAD0_opsz48.svg'))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __apply_exposure(self, shutter_speed, analog_gain):
+        """Applies shutter speed and analog gain in one step
+
+        Args:
+            shutter_speed (int): shutter speed in microseconds
+            analog_gain (int): analog gain
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shutter_speed=' + str(shutter_speed) + \
+            ', analog_gain=' + str(analog_gain)
+        logging.info(log)
+
+        previous = self.source.get_property('shutter-speed')
+        self.source.set_property('analog-gain', analog_gain)
+        self.source.set_property('shutter-speed', shutter_speed)
+        if shutter_speed == 0:
+            self.__capturing_shutter_speed = '0/1'
+        elif shutter_speed < 1000000:
+            self.__capturing_shutter_speed = '1/' + str(int(1000000/shutter_speed))
+        else:
+            self.__capturing_shutter_speed = str(int(shutter_speed/1000000)) + '/1'
+        # camera switches sensor timing at these shutter speeds like the shutter buttons do
+        limits = (111111, 2000000, 7000000)
+        if (self.parameters['photo_camera'] or self.__sequence_engine is not None) and \
+            sum(previous >= limit for limit in limits) != \
+            sum(shutter_speed >= limit for limit in limits):
+            self.__pipeline.set_state(Gst.State.NULL)
+            self.__pipeline.set_state(Gst.State.PLAYING)
+        iso = str(int(analog_gain*100/256))
+        self.__set_exif(iso)
+        if shutter_speed == 0:
+            self.control_exposure_shutter_speed_label.setText('Auto"')
+        else:
+            self.control_exposure_shutter_speed_label.setText(
+                self.__capturing_shutter_speed + '"')
+        if analog_gain == 0:
+            self.control_exposure_iso_label.setText('ISO Auto')
+        else:
+            self.control_exposure_iso_label.setText('ISO ' + iso)
+        self.control_exposure_shutter_speed_button_up.setEnabled(shutter_speed < 22000000)
+        self.control_exposure_shutter_speed_button_down.setEnabled(shutter_speed > 0)
+        self.control_exposure_iso_button_up.setEnabled(analog_gain < 4096)
+        self.control_exposure_iso_button_down.setEnabled(analog_gain > 0)
+        self.__panel_control_stream_info_label_set_text()
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_exposure_solved(self, shutter_speed, analog_gain, done):
+        """Applies exposure solved from the test frame and measures the next one unless done
+
+        Args:
+            shutter_speed (int): shutter speed in microseconds
+            analog_gain (int): analog gain
+            done (bool): True if the exposure is final
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shutter_speed=' + str(shutter_speed) + \
+            ', analog_gain=' + str(analog_gain) + ', done=' + str(done)
+        logging.info(log)
+
+        if not self.__shutter_clicked or self.parameters['capture_mode'] != 'exposure':
+            log = function_name + ': cancelled'
+            logging.info(log)
+            return
+        self.__apply_exposure(shutter_speed, analog_gain)
+        if done:
+            self.frame_tap.unsubscribe(self.__exposure.on_frame)
+            self.__shutter_clicked = False
+            self.control_shutter_button.setToolTip('Take a picture')
+            self.control_shutter_button.setIcon(
+                QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+            self.panel_control_info_label.setText(
+                'Auto exposure\n' + self.__capturing_shutter_speed + '"\nISO ' +
+                str(int(analog_gain*100/256)))
+            GLib.timeout_add_seconds(2, self.__on_toast)
+        else:
+            self.__exposure.resume(shutter_speed, analog_gain)
+            self.panel_control_info_label.setText(
+                'Auto exposure\nTest frame ' + str(self.__exposure.trial + 1))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __capture_raw(self):
+        """Stops the pipeline and captures raw image in the background
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        metadata = self.__capture_metadata()
+        self.__index = next_image_index(self.parameters['media'])
+        file = self.parameters['media'] + 'DSCF' + str(self.__index).zfill(4) + '.JPG'
+        # camera can be opened only once the pipeline releases it
+        self.__pipeline.set_state(Gst.State.NULL)
+        self.__pipeline.get_state(Gst.CLOCK_TIME_NONE)
+        self.__raw_thread = QThread()
+        self.__raw_worker = RawCaptureWorker(file, metadata)
+        self.__raw_worker.moveToThread(self.__raw_thread)
+        self.__raw_thread.started.connect(self.__raw_worker.run)
+        self.__raw_worker.finished.connect(self.__on_raw_captured)
+        self.__raw_worker.finished.connect(self.__raw_thread.quit)
+        self.__raw_thread.start()
+        self.panel_control_info_label.setText('Capturing raw')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_raw_captured(self, file, metadata):
+        """Restarts the pipeline and shows raw image
+
+        Args:
+            file (str): path of the image file
+            metadata (dict): capture metadata
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file
         logging.info(log)
 
-        shutter_speed = self.source.get_property('shutter-speed')
-        if shutter_speed > 1000000:
-            shutter_speed = shutter_speed - 1000000
-            self.__capturing_shutter_speed = str(
-                int(shutter_speed/1000000)) + '/1'
-            if shutter_speed in (1000000, 6000000) and self.parameters['photo_camera']:
-                self.__pipeline.set_state(Gst.State.NULL)
-                self.__pipeline.set_state(Gst.State.PLAYING)
-        elif shutter_speed > 500000:
-            shutter_speed = 500000
-            self.__capturing_shutter_speed = '1/2'
-        elif shutter_speed > 333333:
-            shutter_speed = 333333
-            self.__capturing_shutter_speed = '1/3'
-        elif shutter_speed > 250000:
-            shutter_speed = 250000
-            self.__capturing_shutter_speed = '1/4'
-        elif shutter_speed > 200000:
-            shutter_speed = 200000
-            self.__capturing_shutter_speed = '1/5'
-        elif shutter_speed > 166667:
-            shutter_speed = 166667
-            self.__capturing_shutter_speed = '1/6'
-        elif shutter_speed > 142857:
-            shutter_speed = 142857
-            self.__capturing_shutter_speed = '1/7'
-        elif shutter_speed > 125000:
-            shutter_speed = 125000
-            self.__capturing_shutter_speed = '1/8'
-        elif shutter_speed > 111111:
-            shutter_speed = 111111
-            self.__capturing_shutter_speed = '1/9'
-        elif shutter_speed > 100000:
-            shutter_speed = 100000
-            self.__capturing_shutter_speed = '1/10'
-        elif shutter_speed > 50000:
-            shutter_speed = 50000
-            self.__capturing_shutter_speed = '1/20'
-        elif shutter_speed > 33333:
-            shutter_speed = 33333
-            self.__capturing_shutter_speed = '1/30'
-        elif shutter_speed > 25000:
-            shutter_speed = 25000
-            self.__capturing_shutter_speed = '1/40'
-        elif shutter_speed > 20000:
-            shutter_speed = 20000
-            self.__capturing_shutter_speed = '1/50'
-        elif shutter_speed > 16667:
-            shutter_speed = 16667
-            self.__capturing_shutter_speed = '1/60'
-        elif shutter_speed > 14286:
-            shutter_speed = 14286
-            self.__capturing_shutter_speed = '1/70'
-        elif shutter_speed > 12500:
-            shutter_speed = 12500
-            self.__capturing_shutter_speed = '1/80'
-        elif shutter_speed > 11111:
-            shutter_speed = 11111
-            self.__capturing_shutter_speed = '1/90'
-        elif shutter_speed > 10000:
-            shutter_speed = 10000
-            self.__capturing_shutter_speed = '1/100'
-        elif shutter_speed > 5000:
-            shutter_speed = 5000
-            self.__capturing_shutter_speed = '1/200'
-        elif shutter_speed > 3333:
-            shutter_speed = 3333
-            self.__capturing_shutter_speed = '1/300'
-        elif shutter_speed > 2500:
-            shutter_speed = 2500
-            self.__capturing_shutter_speed = '1/400'
-        elif shutter_speed > 2000:
-            shutter_speed = 2000
-            self.__capturing_shutter_speed = '1/500'
-        elif shutter_speed > 1667:
-            shutter_speed = 1667
-            self.__capturing_shutter_speed = '1/600'
-        elif shutter_speed > 1429:
-            shutter_speed = 1429
-            self.__capturing_shutter_speed = '1/700'
-        elif shutter_speed > 1250:
-            shutter_speed = 1250
-            self.__capturing_shutter_speed = '1/800'
-        elif shutter_speed > 1111:
-            shutter_speed = 1111
-            self.__capturing_shutter_speed = '1/900'
-        elif shutter_speed > 1000:
-            shutter_speed = 1000
-            self.__capturing_shutter_speed = '1/1000'
-        elif shutter_speed > 500:
-            shutter_speed = 500
-            self.__capturing_shutter_speed = '1/2000'
-        elif shutter_speed > 333:
-            shutter_speed = 333
-            self.__capturing_shutter_speed = '1/3000'
-        elif shutter_speed > 250:
-            shutter_speed = 250
-            self.__capturing_shutter_speed = '1/4000'
-        elif shutter_speed > 200:
-            shutter_speed = 200
-            self.__capturing_shutter_speed = '1/5000'
-        elif shutter_speed > 167:
-            shutter_speed = 167
-            self.__capturing_shutter_speed = '1/6000'
-        elif shutter_speed > 143:
-            shutter_speed = 143
-            self.__capturing_shutter_speed = '1/7000'
-        elif shutter_speed > 125:
-            shutter_speed = 125
-            self.__capturing_shutter_speed = '1/8000'
-        elif shutter_speed > 111:
-            shutter_speed = 111
-            self.__capturing_shutter_speed = '1/9000'
-        elif shutter_speed > 100:
-            shutter_speed = 100
-            self.__capturing_shutter_speed = '1/10000'
-        elif shutter_speed == 100:
-            shutter_speed = 0
-            self.__capturing_shutter_speed = '0/1'
-            self.control_exposure_shutter_speed_button_down.setEnabled(False)
+        self.__pipeline.set_state(Gst.State.PLAYING)
+        self.__capture_remaining = 0
+        self.__shutter_clicked = False
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        if path.exists(file):
+            self.panel_display.set_index(self.__index)
+            self.control_menu_photo_gallery_button.setEnabled(True)
+            self.panel_control_file_info_label_set_text(self.__index)
+            self.captured.emit(file, metadata)
+            self.__journal.record(self.__index, metadata)
+        GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __start_sequence(self, plan, done=-1):
+        """Starts capture sequence on the scheduler thread
+
+        Args:
+            plan (list): steps of the sequence
+            done (int, optional): number of exposures completed before the session has been
+                interrupted or -1 to begin new session. Defaults to -1.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': plan=' + str(plan) + ', done=' + str(done)
+        logging.info(log)
+
+        if done < 0:
+            self.__journal.begin(plan, self.parameters['capture_mode'])
+            remaining = plan
+        else:
+            remaining = []
+            for step in plan:
+                # completed steps are kept so that the progress counts the whole plan
+                remaining.append(dict(step, start=min(done, step['frames'])))
+                done = max(0, done - step['frames'])
+        self.__sequence_thread = QThread()
+        self.__sequence_engine = SequenceEngine(remaining, self.__trigger_sequence)
+        self.__sequence_engine.moveToThread(self.__sequence_thread)
+        self.__sequence_thread.started.connect(self.__sequence_engine.run)
+        self.__sequence_engine.progress.connect(self.__on_sequence_progress)
+        self.__sequence_engine.finished.connect(self.__on_sequence_finished)
+        self.__sequence_engine.finished.connect(self.__sequence_thread.quit)
+        self.__sequence_thread.start()
+        self.panel_control_info_label.setText('Sequence')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __trigger_sequence(self, frames, settings):
+        """Applies settings of the sequence step and arms frames, called from the scheduler
+        thread
+
+        Args:
+            frames (int): number of frames to capture
+            settings (dict): shutter speed and analog gain of the step or None
+
+        Returns:
+            float: duration of a frame in seconds
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': frames=' + str(frames) + ', settings=' + str(settings)
+        logging.info(log)
+
+        previous = max(self.source.get_property('shutter-speed')/1000000, self.__frame_interval)
+        if settings:
+            self.exposure_requested.emit(
+                int(settings.get('shutter_speed', self.source.get_property('shutter-speed'))),
+                int(settings.get('analog_gain', self.source.get_property('analog-gain'))))
+        result = max(self.source.get_property('shutter-speed')/1000000, self.__frame_interval)
+        if settings:
+            # frames in flight still carry previous settings, the sensor applies new ones
+            # from the frame after them
+            first = self.__frames + SequenceEngine.FRAMES_IN_FLIGHT
+            deadline = time.monotonic() + \
+                SequenceEngine.FRAMES_IN_FLIGHT*max(previous, result) + 10
+            while self.__frames < first and time.monotonic() < deadline:
+                time.sleep(0.05)
+        if frames > 0:
+            self.__capture_remaining = frames
+            self.__shutter_clicked = True
+        self.__arm_capture(frames)
+
+        log = function_name + ': result=' + str(result)
+        logging.info(log)
+
+        return result
+
+
+    def __on_sequence_progress(self, done, total, drift):
+        """Shows sequence progress
+
+        Args:
+            done (int): number of captured frames
+            total (int): total number of frames
+            drift (float): drift of the last capture from the plan in seconds
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': done=' + str(done) + ', total=' + str(total) + \
+            ', drift=' + str(drift)
+        logging.info(log)
+
+        self.panel_control_info_label.setText(
+            'Sequence\n' + str(done) + '/' + str(total) + '\nDrift ' + str(round(drift, 1)) + 's')
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_sequence_finished(self, done):
+        """Restores shutter once the sequence has finished
+
+        Args:
+            done (int): number of captured frames
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': done=' + str(done)
+        logging.info(log)
+
+        self.__sequence_engine = None
+        self.__journal.end()
+        self.__capture_remaining = 0
+        if not self.parameters['photo_camera']:
+            self.__pipeline.set_state(Gst.State.NULL)
+        if self.__trails.active:
+            # shutter is released once the composite has been saved
+            self.__trails.stop()
+            self.panel_control_info_label.setText('Saving')
+        else:
+            self.__shutter_clicked = False
+            self.control_shutter_button.setToolTip('Take a picture')
+            self.control_shutter_button.setIcon(
+                QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+            GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_meteor_detected(self, index, segments):
+        """Shows the image file a streak has been found in
+
+        Args:
+            index (int): index of the image file
+            segments (list): end points of the streaks
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index) + ', segments=' + str(segments)
+        logging.info(log)
+
+        if self.parameters['photo_camera']:
+            self.panel_control_info_label.setText(
+                'Streaks ' + str(len(segments)) + '\nDSCF' + str(index).zfill(4) + '.JPG')
+            GLib.timeout_add_seconds(1, self.__on_toast)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_trails_updated(self, preview, frames):
+        """Shows the star trail composite so far
+
+        Args:
+            preview (numpy.ndarray): reduced RGB composite
+            frames (int): number of composited frames
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': frames=' + str(frames)
+        logging.info(log)
+
+        self.panel_control_info_label.setText('Star trails\n' + str(frames) + ' frames')
+        if not self.parameters['photo_camera'] and self.panel_display.get_index() == self.__index:
+            height, width = preview.shape[:2]
+            self.panel_display.setPixmap(QPixmap.fromImage(QImage(
+                preview.data, width, height, 3*width, QImage.Format_RGB888)).scaled(640,480))
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def __on_trails_finished(self, index):
+        """Shows saved star trail composite and restores shutter
+
+        Args:
+            index (int): index of the composite image file or -1 if there was nothing to save
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        self.__shutter_clicked = False
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        if index >= 0:
+            self.__index = index
+            self.panel_display.set_index(self.__index)
+            self.control_menu_photo_gallery_button.setEnabled(True)
+            self.panel_control_file_info_label_set_text(self.__index)
+            if not self.parameters['photo_camera']:
+                self.panel_display.setPixmap(self.gallery_pixmap(index).scaled(640,480))
+        GLib.timeout_add_seconds(1, self.__on_toast)
 
-        log = function_name + ': shutter_speed=' + str(shutter_speed)
+        log = function_name + ': exit'
         logging.info(log)
 
-        self.source.set_property('shutter-speed', shutter_speed)
-        self.__set_exif(str(int(self.source.get_property('analog-gain')*100/256)))
-        self.__panel_control_stream_info_label_set_text()
-        if self.__capturing_shutter_speed == '0/1':
-            self.control_exposure_shutter_speed_label.setText('Auto"')
-        else:
-            self.control_exposure_shutter_speed_label.setText(
-                self.__capturing_shutter_speed+'"')
-        self.control_exposure_shutter_speed_button_up.setEnabled(True)
+
+    def __on_burst_saved(self, index, metadata):
+        """Post-processes and journals saved burst frame like any other capture
+
+        Args:
+            index (int): index of the image file
+            metadata (dict): capture metadata
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': index=' + str(index)
+        logging.info(log)
+
+        file = self.parameters['media'] + 'DSCF' + str(index).zfill(4) + '.JPG'
+        self.captured.emit(file, metadata)
+        self.__journal.record(index, metadata)
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_exposure_iso_button_up_clicked(self):
-        """Handles ISO increase
+    def __on_burst_flushed(self, first, count):
+        """Shows the last frame of the saved burst
+
+        Args:
+            first (int): index of the first saved image file
+            count (int): number of saved image files
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': first=' + str(first) + ', count=' + str(count)
         logging.info(log)
 
-        analog_gain = self.source.get_property('analog-gain') + 256
+        self.__shutter_clicked = False
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        if count > 0:
+            self.__index = (first + count - 1) % 10000
+            self.panel_display.set_index(self.__index)
+            self.control_menu_photo_gallery_button.setEnabled(True)
+            self.panel_control_info_label.setText('Burst\n' + str(count) + ' frames')
+        GLib.timeout_add_seconds(1, self.__on_toast)
 
-        log = function_name + ': analog_gain=' + str(analog_gain)
+        log = function_name + ': exit'
         logging.info(log)
 
-        if analog_gain == 4096:
-            self.control_exposure_iso_button_up.setEnabled(False)
-        self.source.set_property('analog-gain', analog_gain)
-        iso = str(int(analog_gain*100/256))
-        self.__set_exif(iso)
-        self.control_exposure_iso_label.setText('ISO ' + iso)
-        self.__panel_control_stream_info_label_set_text()
-        self.control_exposure_iso_button_down.setEnabled(True)
+
+    def __on_planetary_progress(self, frames, score):
+        """Shows planetary capture progress
+
+        Args:
+            frames (int): number of scored frames
+            score (float): sharpness of the worst kept frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': frames=' + str(frames) + ', score=' + str(score)
+        logging.info(log)
+
+        self.panel_control_info_label.setText(
+            'Planetary\n' + str(frames) + '/' + str(self.parameters['planetary_frames']) +
+            '\nScore ' + str(round(score, 1)))
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_exposure_iso_button_down_clicked(self):
-        """Handles ISO decrease
+    def __on_planetary_finished(self, folder, index):
+        """Shows the sharpest frame of the planetary capture
+
+        Args:
+            folder (str): folder with the best frames
+            index (int): index of the image file with the sharpest frame or -1 if no frame
+                has been kept
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': folder=' + folder + ', index=' + str(index)
         logging.info(log)
 
-        analog_gain = self.source.get_property('analog-gain') - 256
+        self.frame_tap.unsubscribe(self.__planetary.on_frame)
+        self.__shutter_clicked = False
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        if index >= 0:
+            self.__index = index
+            self.panel_display.set_index(self.__index)
+            self.control_menu_photo_gallery_button.setEnabled(True)
+            self.panel_control_file_info_label_set_text(self.__index)
+        GLib.timeout_add_seconds(1, self.__on_toast)
 
-        log = function_name = ': analog_gain=' + str(analog_gain)
+        log = function_name + ': exit'
         logging.info(log)
 
-        self.source.set_property('analog-gain', analog_gain)
-        if analog_gain == 0:
-            self.control_exposure_iso_label.setText('ISO Auto')
-            self.control_exposure_iso_button_down.setEnabled(False)
-            iso = '0'
-        else:
-            iso = str(int(analog_gain*100/256))
-            self.control_exposure_iso_label.setText('ISO ' + iso)
 
-        self.__set_exif(iso)
-        self.__panel_control_stream_info_label_set_text()
-        self.control_exposure_iso_button_up.setEnabled(True)
+    def __on_ser_finished(self, file, written, dropped):
+        """Restores shutter once SER recording has been finalized
+
+        Args:
+            file (str): path of the SER file
+            written (int): number of written frames
+            dropped (int): number of frames dropped by the writer
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': file=' + file + ', written=' + str(written) + \
+            ', dropped=' + str(dropped)
+        logging.info(log)
+
+        self.frame_tap.unsubscribe(self.__ser.on_frame)
+        self.__shutter_clicked = False
+        self.control_shutter_button.setToolTip('Take a picture')
+        self.control_shutter_button.setIcon(
+            QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+        self.panel_control_info_label.setText(
+            (path.basename(file) if file else 'SER video') + '\n' + str(written) +
+            ' frames\n' + str(dropped) + ' dropped')
+        GLib.timeout_add_seconds(3, self.__on_toast)
 
         log = function_name + ': exit'
         logging.info(log)
 
 
-    def __on_control_shutter_button_clicked(self):
-        """Handles taking a picture
+    def __arm_capture(self, frames):
+        """Lets given number of frames through the capture branch of the pipeline
+
+        Args:
+            frames (int): number of frames to be encoded
         """
 
         function_name = "'" + threading.currentThread().name + "'." + \
             type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
 
-        log = function_name + ': entry'
+        log = function_name + ': frames=' + str(frames)
         logging.info(log)
 
-        self.__shutter_clicked = True
-        self.control_shutter_button.setToolTip('Taking a picture')
-        self.control_shutter_button.setIcon(
-            QIcon(self.parameters['icons'] + 'circle_FILL1_wght400_GRAD0_opsz48.svg'))
+        with self.__capture_lock:
+            self.__capture_frames = frames
 
         log = function_name + ': exit'
         logging.info(log)
 
 
+    def __on_frame_probe(self, _, __):
+        """Counts frames produced by the camera
+
+        Args:
+            _ (Gst.Pad): pad
+            __ (Gst.PadProbeInfo): probe info
+
+        Returns:
+            Gst.PadProbeReturn: OK
+        """
+
+        self.__frames = self.__frames + 1
+
+        return Gst.PadProbeReturn.OK
+
+
+    def __on_capture_probe(self, _, __):
+        """Gates the capture branch so that only armed frames reach the encoder
+
+        Args:
+            _ (Gst.Pad): pad
+            __ (Gst.PadProbeInfo): probe info
+
+        Returns:
+            Gst.PadProbeReturn: OK if frame should be encoded, DROP otherwise
+        """
+
+        with self.__capture_lock:
+            if self.__capture_frames == 0:
+                return Gst.PadProbeReturn.DROP
+            self.__capture_frames = self.__capture_frames - 1
+
+        self.__encoded_frames = self.__encoded_frames + 1
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': encoded_frames=' + str(self.__encoded_frames)
+        logging.info(log)
+
+        return Gst.PadProbeReturn.OK
+
+
     def __on_toast(self):
         """Hides toast
 
@@ -2295,27 +8534,35 @@ class CameraScreen(QMainWindow):
         if name == 'prepare-window-handle':
             message.src.set_window_handle(self.__win_id)
         if name == 'GstMultiFileSink' and self.__shutter_clicked:
-            images = glob.glob(self.parameters['media'] + 'DSCF????.JPG')
-            images.sort()
-            if len(images) == 0:
-                self.__index = 0
+            metadata = self.__capture_metadata()
+            self.__capture_remaining = self.__capture_remaining - 1
+            if metadata['kind'] == 'light':
+                self.__index = next_image_index(self.parameters['media'])
+                file = self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4) + '.JPG'
+                shutil.copyfile(self.__filesink.get_property("location"), file)
+                self.control_menu_photo_gallery_button.setEnabled(True)
+                if self.parameters['photo_camera']:
+                    # the gallery browsed during a sequence keeps the selected image
+                    self.panel_display.set_index(self.__index)
+                    self.panel_control_file_info_label_set_text(self.__index)
             else:
-                self.__index = int(
-                    re.search(r'\d+', images[len(images) - 1]).group()) + 1
-                if self.__index == 10000:
-                    self.__index = 0
-
-            shutil.copyfile(
-                self.__filesink.get_property("location"),
-                self.parameters['media'] + 'DSCF'+str(self.__index).zfill(4) + '.JPG')
-            self.panel_display.set_index(self.__index)
-            self.control_menu_photo_gallery_button.setEnabled(True)
-            self.__shutter_clicked = False
-            self.control_shutter_button.setToolTip('Take a picture')
-            self.control_shutter_button.setIcon(
-                QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
-            self.panel_control_file_info_label_set_text(self.__index)
-            GLib.timeout_add_seconds(1, self.__on_toast)
+                file = self.__library.frame_path(metadata['kind'], metadata)
+                shutil.copyfile(self.__filesink.get_property("location"), file)
+                self.panel_control_info_label.setText(
+                    CameraScreen.CAPTURE_MODES[metadata['kind']] + '\n' +
+                    str(self.parameters['calibration_frames'] - self.__capture_remaining) +
+                    '/' + str(self.parameters['calibration_frames']))
+            self.captured.emit(file, metadata)
+            if metadata['kind'] == 'light':
+                self.__journal.record(self.__index, metadata)
+            if self.__sequence_engine is not None:
+                self.__sequence_engine.notify()
+            elif self.__capture_remaining <= 0:
+                self.__shutter_clicked = False
+                self.control_shutter_button.setToolTip('Take a picture')
+                self.control_shutter_button.setIcon(
+                    QIcon(self.parameters['icons'] + 'circle_FILL0_wght400_GRAD0_opsz48.svg'))
+                GLib.timeout_add_seconds(1, self.__on_toast)
 
         log = function_name + ': exit'
         logging.info(log)
@@ -2331,10 +8578,11 @@ class CameraScreen(QMainWindow):
         log = function_name + ': entry'
         logging.info(log)
 
+        self.__temperature = CPUTemperature().temperature
         annotation_text = \
             'CPU: ' + str(psutil.cpu_percent()) + \
             '% MEM: ' + str(psutil.virtual_memory().percent) + \
-            '% TMP: ' + str(round(CPUTemperature().temperature, 1)) + \
+            '% TMP: ' + str(round(self.__temperature, 1)) + \
             'C\n DSK: ' + str(round(DiskUsage().usage, 1)) + \
             '% THR: ' + subprocess.check_output(
                 ['vcgencmd', 'get_throttled']).decode('utf-8').replace('throttled=','').strip() + \
@@ -2362,8 +8610,33 @@ class CameraScreen(QMainWindow):
                 log = function_name + ': battery_voltage=' + str(battery_voltage)
                 logging.warning(log)
             annotation_text = annotation_text + '\n'
+        timestamp = time.time()
+        elapsed = timestamp - self.__stats_timestamp
+        if elapsed > 0:
+            annotation_text = annotation_text + \
+                'FPS: ' + str(round((self.__frames - self.__stats_frames)/elapsed, 1)) + \
+                ' ENC: ' + str(round(
+                    (self.__encoded_frames - self.__stats_encoded_frames)/elapsed, 1)) + ' '
+        if self.__frames > self.__stats_frames:
+            self.__frame_interval = elapsed/(self.__frames - self.__stats_frames)
+        if self.__ser.active:
+            # frames the tap did not deliver are dropped as well as frames the writer skipped
+            annotation_text = annotation_text + \
+                'SER: ' + str(self.__ser.written) + ' DROP: ' + str(
+                    self.__frames - self.__ser_frames - self.__ser.received +
+                    self.__ser.dropped) + ' '
+        self.__stats_timestamp = timestamp
+        self.__stats_frames = self.__frames
+        self.__stats_encoded_frames = self.__encoded_frames
         annotation_text = annotation_text + 'VER: ' + __version__ + ' '
-        self.source.set_property('annotation-text', annotation_text)
+        self.__annotation_text = annotation_text
+        # histogram is measured only while the annotation is shown
+        if self.source.get_property('annotation-mode') != 0x00000000:
+            self.frame_tap.subscribe(self.__histogram.on_frame)
+        else:
+            self.frame_tap.unsubscribe(self.__histogram.on_frame)
+            self.__histogram_text = ''
+        self.__set_annotation()
 
         log = function_name + ': result=True'
         logging.info(log)
@@ -2371,6 +8644,70 @@ class CameraScreen(QMainWindow):
         return True
 
 
+    def __on_histogram_updated(self, backgrounds, saturated, black):
+        """Shows background level and clipping of the channels in the annotation
+
+        Args:
+            backgrounds (list): median values of the red, green and blue channels
+            saturated (list): percentages of saturated red, green and blue values
+            black (list): percentages of black red, green and blue values
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': backgrounds=' + str(backgrounds) + \
+            ', saturated=' + str(saturated) + ', black=' + str(black)
+        logging.debug(log)
+
+        self.__histogram_text = \
+            '\nBKG: ' + '/'.join(str(value) for value in backgrounds) + \
+            ' SAT: ' + '/'.join(str(round(value, 2)) for value in saturated) + \
+            '% BLK: ' + '/'.join(str(round(value, 1)) for value in black) + '% '
+        self.__set_annotation()
+
+        log = function_name + ': exit'
+        logging.debug(log)
+
+
+    def __set_annotation(self):
+        """Sets annotation text of the statistics followed by focus and histogram lines
+        """
+
+        annotation_text = self.__annotation_text
+        if self.__focus.active:
+            annotation_text = annotation_text + self.__focus_text
+        annotation_text = annotation_text + self.__histogram_text
+        self.source.set_property('annotation-text', annotation_text)
+
+
+    def __on_focus_measured(self, hfr, fwhm, best, stars):
+        """Shows focus metrics in the annotation
+
+        Args:
+            hfr (float): median half-flux radius in pixels or NaN if no star has been found
+            fwhm (float): median FWHM in pixels or NaN if no star has been found
+            best (float): best half-flux radius since the focus assist has been started
+            stars (int): number of measured stars
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': hfr=' + str(hfr) + ', fwhm=' + str(fwhm) + \
+            ', best=' + str(best) + ', stars=' + str(stars)
+        logging.debug(log)
+
+        if self.__focus.active:
+            self.__focus_text = '\nHFR: ' + str(round(hfr, 2)) + ' BEST: ' + \
+                str(round(best, 2)) + ' FWHM: ' + str(round(fwhm, 2)) + \
+                ' STARS: ' + str(stars) + ' '
+            self.__set_annotation()
+
+        log = function_name + ': exit'
+        logging.debug(log)
+
+
     def __set_exif(self, iso):
         """Sets exif metadata
 
@@ -2390,12 +8727,29 @@ class CameraScreen(QMainWindow):
             ',capturing-saturation=' + self.__capturing_saturation +
             ',capturing-sharpness=' + self.__capturing_sharpness +
             ',capturing-shutter-speed=' + self.__capturing_shutter_speed +
-            ',capturing-iso-speed=' + iso)
+            ',capturing-iso-speed=' + iso + self.__exif_description())
 
         log = function_name + ': exit'
         logging.info(log)
 
 
+    def __exif_description(self):
+        """Gets EXIF description tag recording region of interest
+
+        Binning is not recorded since it is applied only to the processed and output files.
+
+        Returns:
+            str: description tag or empty string if there is nothing to record
+        """
+
+        description = []
+        if self.__roi is not None:
+            description.append('roi=' + ' '.join(str(value) for value in self.__roi))
+        if len(description) == 0:
+            return ''
+        return ',description="' + ' '.join(description) + '"'
+
+
     @staticmethod
     def reconnect(pyqt_signal, old_handler=None, new_handler=None):
         """Reconnects signal from old handler to new handler
@@ -2471,6 +8825,246 @@ class CameraScreen(QMainWindow):
 
 
 
+def frame_to_rgb(frame_format, planes):
+    """Converts planes of the frame to RGB
+
+    YUV frames are converted with BT.601 limited range coefficients. Chroma planes at half
+    resolution are upsampled, chroma sampled at the points of luma is used as is.
+
+    Args:
+        frame_format (str): format of the frame
+        planes (list): planes of the frame
+
+    Returns:
+        numpy.ndarray: RGB image
+    """
+
+    if frame_format in ('I420', 'YV12'):
+        y, u, v = planes
+        if frame_format == 'YV12':
+            u, v = v, u
+        height, width = y.shape
+        luma = y.astype(np.float32)
+        luma -= 16
+        luma *= 1.164
+        if u.shape != y.shape:
+            u = np.repeat(np.repeat(u, 2, axis=0), 2, axis=1)[:height, :width]
+            v = np.repeat(np.repeat(v, 2, axis=0), 2, axis=1)[:height, :width]
+        u = u.astype(np.float32)
+        v = v.astype(np.float32)
+        u -= 128
+        v -= 128
+        result = np.empty((height, width, 3), dtype=np.float32)
+        np.add(luma, 1.596*v, out=result[:, :, 0])
+        np.subtract(luma, 0.392*u + 0.813*v, out=result[:, :, 1])
+        np.add(luma, 2.017*u, out=result[:, :, 2])
+        np.clip(result + 0.5, 0, 255, out=result)
+        return result.astype(np.uint8)
+    if frame_format == 'RGB':
+        return np.ascontiguousarray(planes[0])
+    if frame_format == 'BGR':
+        return np.ascontiguousarray(planes[0][:, :, ::-1])
+    if frame_format in ('RGBx', 'RGBA'):
+        return np.ascontiguousarray(planes[0][:, :, :3])
+    if frame_format in ('BGRx', 'BGRA'):
+        return np.ascontiguousarray(planes[0][:, :, 2::-1])
+    return np.repeat(planes[0][:, :, np.newaxis], 3, axis=2)
+
+
+def bin_image(image, factor, method='average', maximum=255, rows=256):
+    """Bins blocks of pixels by reshaping strips of rows and reducing the blocks
+
+    Sums keep the unit of the image, so the white level becomes 65535 if the sums fit in
+    16 bits, otherwise it is scaled with the block size.
+
+    Args:
+        image (numpy.ndarray): image of height x width or height x width x channels
+        factor (int): size of the block
+        method (str, optional): sum or average. Defaults to 'average'.
+        maximum (int, optional): white level of the image. Defaults to 255.
+        rows (int, optional): number of rows reduced at once. Defaults to 256.
+
+    Returns:
+        tuple: float32 binned image and its white level
+    """
+
+    function_name = "'" + threading.currentThread().name + "'." + \
+        inspect.currentframe().f_code.co_name
+
+    log = function_name + ': shape=' + str(image.shape) + ', factor=' + str(factor) + \
+        ', method=' + method
+    logging.info(log)
+
+    height = image.shape[0]//factor*factor
+    width = image.shape[1]//factor*factor
+    tail = image.shape[2:]
+    result = np.empty((height//factor, width//factor) + tail, dtype=np.float32)
+    step = max(1, rows//factor)*factor
+    for start in range(0, height, step):
+        end = min(start + step, height)
+        strip = image[start:end, :width].astype(np.float32).reshape(
+            (end - start)//factor, factor, width//factor, factor, *tail)
+        np.sum(strip, axis=(1, 3), out=result[start//factor:end//factor])
+    if method == 'average':
+        result *= 1/factor**2
+    else:
+        maximum = maximum*factor**2
+        if maximum <= 65535:
+            maximum = 65535
+
+    log = function_name + ': shape=' + str(result.shape) + ', maximum=' + str(maximum)
+    logging.info(log)
+
+    return result, maximum
+
+
+def describe_capture(metadata):
+    """Describes exposure of the captured image
+
+    Args:
+        metadata (dict): capture metadata
+
+    Returns:
+        str: description of the exposure
+    """
+
+    return 'shutter_speed=' + str(metadata['shutter_speed']) + \
+        ', iso=' + str(metadata['iso']) + \
+        ', white_balance=' + str(metadata['white_balance']) + \
+        ', contrast=' + str(metadata['contrast']) + \
+        ', sharpness=' + str(metadata['sharpness']) + \
+        ', saturation=' + str(metadata['saturation']) + \
+        ', temperature=' + str(round(metadata['temperature'], 1)) + \
+        ('' if metadata.get('roi') is None else
+         ', roi=' + ' '.join(str(value) for value in metadata['roi'])) + \
+        ('' if metadata.get('binning', 1) == 1 else
+         ', binning=' + str(metadata['binning']) + 'x' + str(metadata['binning'])) + \
+        ('' if 'calibrated' not in metadata else
+         ', calibrated=' + str(metadata['calibrated']))
+
+
+def image_file(media, index):
+    """Gets path of the image file selected by index, the processed one if it has been saved
+
+    Args:
+        media (str): media folder
+        index (int): index of the image file
+
+    Returns:
+        str: path of the calibrated, corrected or binned image file if it exists, the captured
+            image file otherwise
+    """
+
+    name = media + 'DSCF' + str(index).zfill(4)
+    if path.exists(name + '.PROCESSED.JPG'):
+        return name + '.PROCESSED.JPG'
+    return name + '.JPG'
+
+
+def tag_exif(exif, kind):
+    """Tags EXIF of an image file which has not been captured by the shutter with its kind
+
+    Args:
+        exif (bytes): EXIF of the image file or empty bytes
+        kind (str): 'burst' for frames of the frame tap or 'stack', 'trails' or 'planetary'
+            for images derived from other image files
+
+    Returns:
+        bytes: EXIF with image description set to the kind
+    """
+
+    result = PIL.Image.Exif()
+    if exif:
+        result.load(exif)
+    result[0x010E] = 'AstroBerry ' + kind
+    return result.tobytes()
+
+
+def next_image_index(media):
+    """Gets index of the next image file in the media folder
+
+    Args:
+        media (str): media folder
+
+    Returns:
+        int: index of the next image file
+    """
+
+    function_name = "'" + threading.currentThread().name + "'." + \
+        inspect.currentframe().f_code.co_name
+
+    log = function_name + ': media=' + media
+    logging.info(log)
+
+    images = glob.glob(media + 'DSCF????.JPG')
+    images.sort()
+    if len(images) == 0:
+        result = 0
+    else:
+        result = int(re.search(r'\d+', images[len(images) - 1]).group()) + 1
+        if result == 10000:
+            result = 0
+
+    log = function_name + ': result=' + str(result)
+    logging.info(log)
+
+    return result
+
+
+def select_sequence(media, index, excluded=()):
+    """Selects consecutive images ending at index which were taken with the same
+    resolution, shutter speed and ISO, skipping stacks and composites which are never
+    selected and excluded images
+
+    Args:
+        media (str): media folder
+        index (int): index of the last image file of the sequence
+        excluded (collection, optional): indexes of the image files which are skipped.
+            Defaults to ().
+
+    Returns:
+        list: indexes of the image files in the sequence
+    """
+
+    function_name = "'" + threading.currentThread().name + "'." + \
+        inspect.currentframe().f_code.co_name
+
+    log = function_name + ': index=' + str(index) + ', excluded=' + str(len(excluded))
+    logging.info(log)
+
+    def signature(index):
+        # binned frames are stacked at the size of their processed image files
+        with PIL.Image.open(image_file(media, index)) as image:
+            exif = image.getexif()
+            description = exif.get(0x010E)
+            exif = exif.get_ifd(0x8769)
+            return (image.size, exif.get(0x829A), exif.get(0x8827), description)
+
+    derived = tuple('AstroBerry ' + kind for kind in ('stack', 'trails', 'planetary'))
+    reference = signature(index)
+    result = []
+    if reference[3] not in derived:
+        # an excluded image still defines the sequence it ends
+        if index not in excluded:
+            result.append(index)
+        while index > 0 and \
+            path.exists(media + 'DSCF' + str(index - 1).zfill(4) + '.JPG'):
+            index = index - 1
+            if index in excluded:
+                continue
+            current = signature(index)
+            if current[3] in derived:
+                continue
+            if current != reference:
+                break
+            result.insert(0, index)
+
+    log = function_name + ': result=' + str(result)
+    logging.info(log)
+
+    return result
+
+
 def get_parameters(arguments):
     """Gets parameters
 
@@ -2484,32 +9078,86 @@ def get_parameters(arguments):
     log = function_name + ': arguments=' + str(arguments)
     logging.info(log)
 
+    defaults = {
+        'config': arguments.config,
+        'icons': 'share/icons/',
+        'media': arguments.media + '/',
+        'model': 'Unknown',
+        'width': 800,
+        'height': 608,
+        'sharpness': 0,
+        'contrast': 0,
+        'white_balance': 1,
+        'saturation': 0,
+        'shutter_speed': 0,
+        'iso': 0,
+        'annotation_mode': 0x00000000,
+        'annotation_text_size': 38,
+        'photo_camera': True,
+        'exit_action': 'QUIT',
+        'exit_icon': 'close_FILL0_wght400_GRAD0_opsz48.svg',
+        'logo_icon': 'auto_awesome_FILL0_wght400_GRAD0_opsz48.svg',
+        'stacking_method': 'sigma',
+        'stacking_kappa': 3.0,
+        'memory_budget': 64,
+        'processes': 3,
+        'niceness': 10,
+        'registration': True,
+        'capture_mode': 'photo',
+        'calibration': True,
+        'calibration_frames': 10,
+        'calibration_temperature_step': 5,
+        'hot_pixel_correction': True,
+        'hot_pixel_sigma': 8.0,
+        'bayer_order': 'BGGR',
+        'demosaic_method': 'malvar',
+        'output_formats': [],
+        'fits_bitpix': 16,
+        'compression_level': 6,
+        'sequence': [{'frames': 10, 'gap': 0.0, 'dither_every': 0, 'dither_pause': 0.0}],
+        'burst_memory': 128,
+        'burst_post_ratio': 0.5,
+        'planetary_region': 256,
+        'planetary_keep': 50,
+        'planetary_frames': 1000,
+        'ser_memory': 64,
+        'ser_color': False,
+        'ser_frames': 3000,
+        'roi_size': 0.25,
+        'binning': 1,
+        'binning_method': 'average',
+        'trails_decay': 1.0,
+        'trails_checkpoint': 10,
+        'timelapse_width': 1920,
+        'timelapse_framerate': 25,
+        'meteor_detection': False,
+        'meteor_history': 8,
+        'meteor_sigma': 5.0,
+        'meteor_length': 0.1,
+        'gradient_removal': False,
+        'gradient_degree': 2,
+        'focus_stars': 20,
+        'focus_interval': 0.2,
+        'focus_radius': 8,
+        'focus_sigma': 5.0,
+        'histogram_samples': 65536,
+        'exposure_background': 40,
+        'exposure_peak': 240,
+        'exposure_black': 16,
+        'exposure_max_shutter_speed': 10000000,
+        'exposure_trials': 3
+    }
+
     try:
         with open(arguments.config, 'r') as config:
             params = json.load(config)
+        for key, value in defaults.items():
+            if key not in params:
+                params[key] = value
     except FileNotFoundError:
         log = "'" + arguments.config + "' not found"
         logging.warning(log)
-        params = {
-            'config': arguments.config,
-            'icons': 'share/icons/',
-            'media': arguments.media + '/',
-            'model': 'Unknown',
-            'width': 800,
-            'height': 608,
-            'sharpness': 0,
-            'contrast': 0,
-            'white_balance': 1,
-            'saturation': 0,
-            'shutter_speed': 0,
-            'iso': 0,
-            'annotation_mode': 0x00000000,
-            'annotation_text_size': 38,
-            'photo_camera': True,
-            'exit_action': 'QUIT',
-            'exit_icon': 'close_FILL0_wght400_GRAD0_opsz48.svg',
-            'logo_icon': 'auto_awesome_FILL0_wght400_GRAD0_opsz48.svg'
-        }
+        params = defaults
         with open(params['config'], 'w') as config:
             config.write(json.dumps(params))
         os.sync()
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+
+"""
+MIT License
+
+Copyright (c) 2022-2023 Marcin Sielski <marcin.sielski@gmail.com>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# Tile functions run by the worker processes of the processing executor. The module imports
+# only what the tiles need, so that the workers do not load the user interface, the camera and
+# the GStreamer pipeline.
+
+import sys
+import os
+import logging
+import inspect
+import threading
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.managers import SyncManager
+import numpy as np
+
+
+# kernels correlated with the mosaic: green at red or blue sites, red or blue at green
+# sites in rows and in columns of the colour and at the sites of the opposite colour
+DEMOSAIC_KERNELS = {
+    'bilinear': {
+        'g': ((-1, 0, 0.25), (0, -1, 0.25), (0, 1, 0.25), (1, 0, 0.25)),
+        'row': ((0, -1, 0.5), (0, 1, 0.5)),
+        'column': ((-1, 0, 0.5), (1, 0, 0.5)),
+        'diagonal': ((-1, -1, 0.25), (-1, 1, 0.25), (1, -1, 0.25), (1, 1, 0.25))
+    },
+    'malvar': {
+        'g': (
+            (-2, 0, -0.125), (-1, 0, 0.25), (0, -2, -0.125), (0, -1, 0.25),
+            (0, 0, 0.5), (0, 1, 0.25), (0, 2, -0.125), (1, 0, 0.25), (2, 0, -0.125)),
+        'row': (
+            (-2, 0, 0.0625), (-1, -1, -0.125), (-1, 1, -0.125), (0, -2, -0.125),
+            (0, -1, 0.5), (0, 0, 0.625), (0, 1, 0.5), (0, 2, -0.125), (1, -1, -0.125),
+            (1, 1, -0.125), (2, 0, 0.0625)),
+        'column': (
+            (-2, 0, -0.125), (-1, -1, -0.125), (-1, 0, 0.5), (-1, 1, -0.125),
+            (0, -2, 0.0625), (0, 0, 0.625), (0, 2, 0.0625), (1, -1, -0.125),
+            (1, 0, 0.5), (1, 1, -0.125), (2, 0, -0.125)),
+        'diagonal': (
+            (-2, 0, -0.1875), (-1, -1, 0.25), (-1, 1, 0.25), (0, -2, -0.1875),
+            (0, 0, 0.75), (0, 2, -0.1875), (1, -1, 0.25), (1, 1, 0.25), (2, 0, -0.1875))
+    }
+}
+
+
+class FrameStacker:
+    """Frame Stacker
+
+    Accumulates frames incrementally with Welford running mean and variance so memory
+    does not depend on the number of frames. Sigma clipping requires second pass over
+    the same frames once the statistics of the first pass are known.
+    """
+
+
+    def __init__(self, kappa=3.0):
+        """Initializes Frame Stacker
+
+        Args:
+            kappa (float, optional): clipping threshold in standard deviations.
+                Defaults to 3.0.
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': kappa=' + str(kappa)
+        logging.info(log)
+
+        self.__kappa = kappa
+        self.count = 0
+        self.__mean = None
+        self.__m2 = None
+        self.__delta = None
+        self.__scratch = None
+        self.__threshold = None
+        self.__sum = None
+        self.__clipped_count = None
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def add(self, image):
+        """Adds frame to the running mean and variance (first pass)
+
+        Args:
+            image (numpy.ndarray): frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': count=' + str(self.count)
+        logging.info(log)
+
+        if self.__mean is None:
+            self.__mean = np.zeros(image.shape, dtype=np.float32)
+            self.__m2 = np.zeros(image.shape, dtype=np.float32)
+            self.__delta = np.empty(image.shape, dtype=np.float32)
+            self.__scratch = np.empty(image.shape, dtype=np.float32)
+        elif image.shape != self.__mean.shape:
+            raise ValueError('Frame shape ' + str(image.shape) + ' does not match ' +
+                str(self.__mean.shape))
+
+        self.count = self.count + 1
+        np.subtract(image, self.__mean, out=self.__delta)
+        np.multiply(self.__delta, 1.0/self.count, out=self.__scratch)
+        np.add(self.__mean, self.__scratch, out=self.__mean)
+        np.subtract(image, self.__mean, out=self.__scratch)
+        np.multiply(self.__delta, self.__scratch, out=self.__scratch)
+        np.add(self.__m2, self.__scratch, out=self.__m2)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def add_clipped(self, image):
+        """Adds frame to the sigma clipped sum (second pass)
+
+        Args:
+            image (numpy.ndarray): frame already passed to add()
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.__threshold is None:
+            # variance is no longer needed so its buffer is reused for the threshold
+            self.__threshold = self.__m2
+            self.__m2 = None
+            np.multiply(self.__threshold, 1.0/max(self.count - 1, 1), out=self.__threshold)
+            np.sqrt(self.__threshold, out=self.__threshold)
+            np.multiply(self.__threshold, self.__kappa, out=self.__threshold)
+            self.__sum = np.zeros(self.__mean.shape, dtype=np.float32)
+            self.__clipped_count = np.zeros(self.__mean.shape, dtype=np.uint16)
+
+        np.subtract(image, self.__mean, out=self.__delta)
+        np.abs(self.__delta, out=self.__delta)
+        mask = self.__delta <= self.__threshold
+        np.add(self.__sum, image, out=self.__sum, where=mask)
+        np.add(self.__clipped_count, 1, out=self.__clipped_count, where=mask)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+
+    def result(self):
+        """Gets stacked frame
+
+        Returns:
+            numpy.ndarray: sigma clipped mean if second pass was made, mean otherwise
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            type(self).__name__ + '.' + inspect.currentframe().f_code.co_name
+
+        log = function_name + ': entry'
+        logging.info(log)
+
+        if self.__sum is None:
+            result = self.__mean
+        else:
+            result = self.__mean.copy()
+            np.divide(
+                self.__sum, self.__clipped_count, out=result, where=self.__clipped_count > 0)
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def median(images, rows=64):
+        """Computes median of frames in horizontal strips
+
+        Args:
+            images (numpy.ndarray): frames stacked along the first axis
+            rows (int, optional): strip height. Defaults to 64.
+
+        Returns:
+            numpy.ndarray: median frame
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': shape=' + str(images.shape) + ', rows=' + str(rows)
+        logging.info(log)
+
+        result = np.empty(images.shape[1:], dtype=np.float32)
+        for row in range(0, images.shape[1], rows):
+            np.median(images[:, row:row + rows], axis=0, out=result[row:row + rows])
+
+        log = function_name + ': exit'
+        logging.info(log)
+
+        return result
+
+
+    @staticmethod
+    def combine(store, method, kappa, budget):
+        """Combines frames from the frame store strip by strip
+
+        Args:
+            store (FrameStore): frame store
+            method (str): mean, sigma or median
+            kappa (float): clipping threshold in standard deviations
+            budget (int): memory budget in bytes
+
+        Yields:
+            tuple: first row, row after the last row and combined strip
+        """
+
+        function_name = "'" + threading.currentThread().name + "'." + \
+            inspect.currentframe().f_code.co_name
+
+        log = function_name + ': method=' + method + ', count=' + str(store.count)
+        logging.info(log)
+
+        if method == 'median':
+            overhead = store.count*store.frames.itemsize + 8
+        else:
+            overhead = 24
+        for start, end, frames in store.strips(budget, overhead):
+            yield start, end, FrameStacker.combine_frames(frames, method, kappa)
+
+
+    @staticmethod
+    def combine_frames(frames, method, kappa):
+        """Combines frames
+
+        Args:
+            frames (numpy.ndarray): frames stacked along the first axis
+            method (str): mean, sigma or median
+            kappa (float): clipping threshold in standard deviations
+
+        Returns:
+            numpy.ndarray: combined frame
+        """
+
+        if method == 'median':
+            result = FrameStacker.median(frames, frames.shape[1])
+        else:
+            stacker = FrameStacker(kappa)
+            for frame in frames:
+                stacker.add(frame)
+            if method == 'sigma':
+                for frame in frames:
+                    stacker.add_clipped(frame)
+            result = stacker.result()
+        return result
+
+
+
+def correlate(padded, taps, rows, columns):
+    """Correlates padded mosaic with a sparse kernel
+
+    Args:
+        padded (numpy.ndarray): mosaic padded by 2 pixels
+        taps (tuple): row offset, column offset and weight of the kernel taps
+        rows (int): number of output rows
+        columns (int): number of output columns
+
+    Returns:
+        numpy.ndarray: correlated mosaic
+    """
+
+    result = np.zeros((rows, columns), dtype=np.float32)
+    for y, x, weight in taps:
+        result += weight*padded[2 + y:2 + y + rows, 2 + x:2 + x + columns]
+    return result
+
+
+def demosaic(mosaic, order='BGGR', method='bilinear', start=0, end=None):
+    """Demosaics rows of the Bayer mosaic
+
+    Args:
+        mosaic (numpy.ndarray): Bayer mosaic
+        order (str, optional): colours of the top-left 2x2 block. Defaults to 'BGGR'.
+        method (str, optional): bilinear or malvar. Defaults to 'bilinear'.
+        start (int, optional): first row. Defaults to 0.
+        end (int, optional): row after the last row. Defaults to height of mosaic.
+
+    Returns:
+        numpy.ndarray: float32 RGB rows
+    """
+
+    height, width = mosaic.shape
+    if end is None:
+        end = height
+    kernels = DEMOSAIC_KERNELS[method]
+    top = max(start - 2, 0)
+    bottom = min(end + 2, height)
+    # reflection keeps the colour of mirrored sites at the edges of the mosaic
+    padded = np.pad(
+        mosaic[top:bottom].astype(np.float32),
+        ((2 - (start - top), 2 - (bottom - end)), (2, 2)), mode='reflect')
+    rows = end - start
+
+    result = np.empty((rows, width, 3), dtype=np.float32)
+    result[:, :, 1] = padded[2:2 + rows, 2:2 + width]
+    # colour sites are given relative to the first row of the tile
+    sites = {}
+    for i, colour in enumerate(order.upper()):
+        y = (i//2 + start) % 2
+        x = i % 2
+        if colour == 'G':
+            sites.setdefault('G', []).append((y, x))
+        else:
+            sites[colour] = (y, x)
+    g = correlate(padded, kernels['g'], rows, width)
+    for colour, opposite, channel in (('R', 'B', 0), ('B', 'R', 2)):
+        y, x = sites[colour]
+        opposite_y, opposite_x = sites[opposite]
+        result[y::2, x::2, channel] = result[y::2, x::2, 1]
+        result[y::2, x::2, 1] = g[y::2, x::2]
+        row = correlate(padded, kernels['row'], rows, width)
+        result[y::2, 1 - x::2, channel] = row[y::2, 1 - x::2]
+        column = correlate(padded, kernels['column'], rows, width)
+        result[1 - y::2, x::2, channel] = column[1 - y::2, x::2]
+        diagonal = correlate(padded, kernels['diagonal'], rows, width)
+        result[opposite_y::2, opposite_x::2, channel] = \
+            diagonal[opposite_y::2, opposite_x::2]
+    return result
+
+
+def attach_array(descriptor):
+    """Attaches to an array described by descriptor in a worker process
+
+    Args:
+        descriptor (tuple): kind ('shm' or 'file'), name, shape and type of the array
+
+    Returns:
+        tuple: array and shared memory block or None for memory-mapped files
+    """
+
+    kind, name, shape, dtype = descriptor
+    if kind == 'shm':
+        memory = shared_memory.SharedMemory(name=name)
+        # the block belongs to the processing executor, the resource tracker of the tiles
+        # server would unlink it when the server exits
+        resource_tracker.unregister(
+            memory._name, 'shared_memory') # pylint: disable=protected-access
+        result = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+    else:
+        memory = None
+        result = np.memmap(name, dtype=np.dtype(dtype), mode='r+', shape=shape)
+    return result, memory
+
+
+def process_tile(task):
+    """Processes a tile in a worker process
+
+    Args:
+        task (tuple): function, source and destination descriptors, first row, row after
+            the last row and additional arguments
+
+    Returns:
+        int: number of processed rows
+    """
+
+    function_name = "'" + threading.currentThread().name + "'." + \
+        inspect.currentframe().f_code.co_name
+
+    function, source, destination, start, end, arguments = task
+
+    log = function_name + ': function=' + function.__name__ + ', start=' + str(start) + \
+        ', end=' + str(end)
+    logging.info(log)
+
+    source_array, source_memory = attach_array(source)
+    destination_array, destination_memory = attach_array(destination)
+    try:
+        function(source_array, destination_array, start, end, *arguments)
+    finally:
+        del source_array
+        del destination_array
+        for memory in (source_memory, destination_memory):
+            if memory is not None:
+                memory.close()
+
+    return end - start
+
+
+def combine_tile(source, destination, start, end, count, method, kappa):
+    """Combines rows of the frames from a frame store into 8-bit image
+
+    Args:
+        source (numpy.ndarray): frames of the frame store
+        destination (numpy.ndarray): combined image
+        start (int): first row
+        end (int): row after the last row
+        count (int): number of stored frames
+        method (str): mean, sigma or median
+        kappa (float): clipping threshold in standard deviations
+    """
+
+    result = FrameStacker.combine_frames(source[:count, start:end], method, kappa)
+    np.add(result, 0.5, out=result)
+    np.clip(result, 0, 255, out=result)
+    destination[start:end] = result
+
+
+def demosaic_tile(source, destination, start, end, order, method):
+    """Demosaics rows of the Bayer mosaic into 12-bit RGB
+
+    Args:
+        source (numpy.ndarray): Bayer mosaic
+        destination (numpy.ndarray): RGB image
+        start (int): first row
+        end (int): row after the last row
+        order (str): colours of the top-left 2x2 block
+        method (str): bilinear or malvar
+    """
+
+    result = demosaic(source, order, method, start, end)
+    np.clip(result + 0.5, 0, 4095, out=result)
+    destination[start:end] = result
+
+
+def measure_stars_tile(source, destination, start, end, radius, sigma):
+    """Finds stars peaking in a tile of rows and measures their flux, half-flux radius and
+    FWHM in a worker process
+
+    Every row of the destination tile receives one star, brightest first, and the rows left
+    are filled with NaN.
+
+    Args:
+        source (numpy.ndarray): luminance
+        destination (numpy.ndarray): flux, half-flux radius and FWHM per row
+        start (int): first row of the tile
+        end (int): row after the last row of the tile
+        radius (int): radius of a star in pixels
+        sigma (float): threshold of stars above the background in noise deviations
+    """
+
+    height, width = source.shape
+    top = max(0, start - radius)
+    region = source[top:min(height, end + radius)].astype(np.float32)
+    sample = region[::4, ::4]
+    background = float(np.median(sample))
+    noise = max(1.0, 1.4826*float(np.median(np.abs(sample - background))))
+    # peaks are maxima of their 5x5 neighbourhood computed separably
+    columns = region.copy()
+    for shift in (1, 2):
+        np.maximum(columns[shift:], region[:-shift], out=columns[shift:])
+        np.maximum(columns[:-shift], region[shift:], out=columns[:-shift])
+    neighbourhood = columns.copy()
+    for shift in (1, 2):
+        np.maximum(neighbourhood[:, shift:], columns[:, :-shift], out=neighbourhood[:, shift:])
+        np.maximum(neighbourhood[:, :-shift], columns[:, shift:], out=neighbourhood[:, :-shift])
+    y, x = np.nonzero(
+        (region == neighbourhood) & (region > background + sigma*noise) & (region < 250))
+    del columns, neighbourhood
+    y = y + top
+    inside = (y >= max(start, radius)) & (y < min(end, height - radius)) & \
+        (x >= radius) & (x < width - radius)
+    y = y[inside]
+    x = x[inside]
+
+    destination[start:end] = np.nan
+    count = min(len(y), end - start)
+    if count == 0:
+        return
+    brightest = np.argsort(source[y, x])[::-1][:count]
+    y = y[brightest]
+    x = x[brightest]
+    offsets = np.arange(-radius, radius + 1)
+    cutouts = source[
+        y[:, np.newaxis, np.newaxis] + offsets[np.newaxis, :, np.newaxis],
+        x[:, np.newaxis, np.newaxis] + offsets[np.newaxis, np.newaxis, :]].astype(np.float32)
+    # noise clipped at zero would widen the wings
+    cutouts -= background + noise
+    np.maximum(cutouts, 0, out=cutouts)
+    flux = cutouts.sum(axis=(1, 2))
+    center_y = (cutouts.sum(axis=2)*offsets).sum(axis=1)/flux
+    center_x = (cutouts.sum(axis=1)*offsets).sum(axis=1)/flux
+    distance = (offsets[np.newaxis, :, np.newaxis] - center_y[:, np.newaxis, np.newaxis])**2 + \
+        (offsets[np.newaxis, np.newaxis, :] - center_x[:, np.newaxis, np.newaxis])**2
+    destination[start:start + count, 0] = flux
+    destination[start:start + count, 1] = (cutouts*np.sqrt(distance)).sum(axis=(1, 2))/flux
+    # FWHM of a Gaussian with the same second moment
+    destination[start:start + count, 2] = 2.3548*np.sqrt(
+        (cutouts*distance).sum(axis=(1, 2))/(2*flux))
+
+
+def serve(address, authkey):
+    """Serves pools of worker processes to the processing executor
+
+    The processing executor starts this module as a program, so workers of the pools, including
+    the ones started again to replace exited workers, are spawned with this module as main.
+    Serving stops when the standard input is closed, also when the processing executor exits.
+
+    Args:
+        address (str): path of the Unix socket
+        authkey (bytes): authentication key
+    """
+
+    function_name = "'" + threading.currentThread().name + "'." + \
+        inspect.currentframe().f_code.co_name
+
+    log = function_name + ': address=' + address
+    logging.info(log)
+
+    multiprocessing.set_start_method('spawn')
+    server = SyncManager(address, authkey).get_server() # pylint: disable=no-member
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sys.stdout.write(address + '\n')
+    sys.stdout.flush()
+    sys.stdin.buffer.read()
+
+    log = function_name + ': exit'
+    logging.info(log)
+
+
+if __name__ == '__main__':
+
+    serve(sys.argv[1], bytes.fromhex(os.environ['ASTROBERRY_TILES_AUTHKEY']))